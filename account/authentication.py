@@ -0,0 +1,175 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, \
+    TokenAuthentication, get_authorization_header
+
+from account import tokens
+from app import metrics
+from app.db import routers
+
+
+class TokenCache:
+    """In-process map of token key to token, bounded in size and age
+
+    Entries expire after ttl seconds and the least recently used ones are
+    dropped once max_size is reached. The signal receivers in
+    account.signals evict the entries of a user as soon as the user or the
+    token changes in this process; the ttl bounds how long other processes
+    may keep using them.
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        # user id -> keys of that user, to evict them all at once
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return a copy of the cached token or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= self.clock():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # callers may change the user, never hand out the cached instance
+        return copy.deepcopy(entry[0])
+
+    def set(self, key, token):
+        token = copy.deepcopy(token)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (token, self.clock() + self.ttl)
+            self._keys_by_user.setdefault(token.user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def evict(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def evict_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        """Return the counters of this process"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def _remove(self, key):
+        token, expires = self._entries.pop(key)
+        keys = self._keys_by_user.get(token.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[token.user_id]
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+)
+
+
+@metrics.register
+def token_cache_metrics():
+    stats = token_cache.stats()
+
+    return [
+        ('token_cache_requests_total', (('result', 'hit'),), stats['hits']),
+        ('token_cache_requests_total', (('result', 'miss'),),
+         stats['misses']),
+        ('token_cache_evictions_total', (), stats['evictions']),
+        ('token_cache_entries', (), stats['size']),
+    ]
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication that caches the token lookups
+
+    A hit skips the SELECT on authtoken_token joined with the user table.
+    """
+    cache = token_cache
+
+    def authenticate_credentials(self, key):
+        token = self.cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            self.cache.set(key, token)
+        routers.authenticated(token.user_id)
+
+        return (token.user, token)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authenticates the signed access tokens issued by account.tokens
+
+    Clients send them as "Authorization: Bearer <token>". Checking one is
+    pure CPU work: the signature, the expiry and the in-memory deny list.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            msg = _('Invalid token header.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            claims = tokens.verify_token(auth[1].decode(), tokens.ACCESS)
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        except tokens.InvalidToken as exc:
+            raise exceptions.AuthenticationFailed(exc.args[0])
+
+        user = tokens.user_from_claims(claims)
+        routers.authenticated(user.pk)
+
+        return (user, claims)
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+# accepted by every authenticated API view
+API_AUTHENTICATION_CLASSES = (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
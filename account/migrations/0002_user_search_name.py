@@ -0,0 +1,54 @@
+import re
+import unicodedata
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def normalize(value):
+    """Copy of geo.search.normalize as of this migration"""
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+
+    return re.sub(r'[\W_]+', ' ', value.lower()).strip()
+
+
+# users read and updated per query
+BATCH_SIZE = 1000
+
+
+def fill_search_name(apps, schema_editor):
+    User = apps.get_model('account', 'User')
+    batch = []
+    for user in User.objects.only('id', 'email', 'name') \
+            .iterator(chunk_size=BATCH_SIZE):
+        user.search_name = normalize('%s %s' % (user.email, user.name))
+        batch.append(user)
+        if len(batch) == BATCH_SIZE:
+            User.objects.bulk_update(batch, ['search_name'])
+            batch = []
+    if batch:
+        User.objects.bulk_update(batch, ['search_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='user',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=511),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='account_user_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,7 +1,10 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 
+from geo.search import normalize
+
 
 # class UserManager - provides the helper function for creating a user or
 # creating a superuser
@@ -45,9 +48,21 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # unaccented, lower-cased email and name used by ?search= on the user list
+    search_name = models.CharField(max_length=511, editable=False)
 
     # assign the user manager to the objects attribute
     objects = UserManager()
 
     # by default the username is not the email, this changes to be the email
     USERNAME_FIELD = 'email'
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_name'], name='account_user_search_trgm',
+                     opclasses=['gin_trgm_ops']),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.search_name = normalize('%s %s' % (self.email, self.name))
+        super().save(*args, **kwargs)
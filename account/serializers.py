@@ -3,6 +3,8 @@ from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
 
+from account import tokens
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user object"""
@@ -77,3 +79,49 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for exchanging a signed refresh token"""
+    refresh = serializers.CharField(trim_whitespace=False)
+
+    def validate(self, attrs):
+        """Check the refresh token, its user and use it up"""
+        try:
+            claims = tokens.verify_token(attrs['refresh'], tokens.REFRESH)
+        except tokens.InvalidToken as exc:
+            raise serializers.ValidationError(exc.args[0],
+                                              code='authentication')
+
+        # refreshing is rare, this is the one place the database is checked
+        user = get_user_model().objects.filter(
+            pk=claims['uid'], is_active=True).first()
+        if user is None:
+            msg = _('User inactive or deleted.')
+            raise serializers.ValidationError(msg, code='authentication')
+        # the deny list only knows the revocations of this process
+        if not tokens.matches(claims, user) or not tokens.use_once(claims):
+            msg = _('Token has been revoked.')
+            raise serializers.ValidationError(msg, code='authentication')
+
+        attrs['claims'] = claims
+        attrs['user'] = user
+        return attrs
+
+
+class RevokeTokenSerializer(serializers.Serializer):
+    """Serializer for revoking a signed access or refresh token"""
+    token = serializers.CharField(trim_whitespace=False)
+
+    def validate(self, attrs):
+        """Check that the token is a valid signed token"""
+        for token_type in (tokens.ACCESS, tokens.REFRESH):
+            try:
+                attrs['claims'] = tokens.verify_token(attrs['token'],
+                                                      token_type)
+                return attrs
+            except tokens.InvalidToken as exc:
+                error = exc
+
+        raise serializers.ValidationError(error.args[0],
+                                          code='authentication')
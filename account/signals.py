@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from account import tokens
+from account.authentication import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Stop accepting a deleted token"""
+    token_cache.evict(instance.key)
+
+
+# any save may be a deactivation or a password change, reload the user
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    """Drop the cached tokens of a changed user"""
+    token_cache.evict_user(instance.pk)
+
+
+@receiver(pre_save, sender=get_user_model())
+def user_credentials_changed(sender, instance, **kwargs):
+    """Revoke the signed tokens of a user whose password changed or that
+    was deactivated"""
+    # set_password keeps the raw password in _password until the save
+    if instance.pk and (instance._password is not None or
+                        not instance.is_active):
+        tokens.deny_list.revoke_user(instance.pk)
@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from account.authentication import TokenCache, token_cache
+
+ME_URL = reverse('account:me')
+
+
+class FakeClock:
+    """Clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='123',
+            name='test name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_second_request_skips_token_lookup(self):
+        """Test that a cached token doesn't query authtoken_token"""
+        self.client.get(ME_URL)
+        hits = token_cache.stats()['hits']
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertFalse(
+            [q for q in queries if 'authtoken_token' in q['sql']])
+        self.assertEqual(token_cache.stats()['hits'], hits + 1)
+
+    def test_deleted_token_rejected(self):
+        """Test that deleting the token invalidates the cache"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test that deactivating the user invalidates the cache"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_reloads_user(self):
+        """Test that a password change drops the cached user"""
+        self.client.get(ME_URL)
+        self.user.set_password('456')
+        self.user.save()
+
+        self.assertEqual(token_cache.stats()['size'], 0)
+
+
+class TokenCacheTests(TestCase):
+    """Test the bounds of the token cache"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('test@test.com', '123')
+        self.tokens = [Token(key='key%d' % i, user=user) for i in range(3)]
+
+    def test_expires_after_ttl(self):
+        """Test that entries expire"""
+        clock = FakeClock()
+        cache = TokenCache(max_size=10, ttl=60, clock=clock)
+        cache.set('key0', self.tokens[0])
+
+        clock.now = 59
+        self.assertIsNotNone(cache.get('key0'))
+        clock.now = 60
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_evicts_least_recently_used(self):
+        """Test that the cache never grows past max_size"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('key0', self.tokens[0])
+        cache.set('key1', self.tokens[1])
+        cache.get('key0')
+        cache.set('key2', self.tokens[2])
+
+        self.assertIsNotNone(cache.get('key0'))
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 2)
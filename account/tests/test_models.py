@@ -1,5 +1,13 @@
+from importlib import import_module
+from unittest import mock
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+search_name_migration = import_module(
+    'account.migrations.0002_user_search_name')
 
 
 class ModelTests(TestCase):
@@ -40,3 +48,25 @@ class ModelTests(TestCase):
 
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
+
+
+class SearchNameMigrationTests(TestCase):
+    """Test filling the search name of the existing users"""
+
+    def test_fill_search_name(self):
+        """Test that every user is filled, batch after batch"""
+        for number in range(5):
+            get_user_model().objects.create_user(
+                'user%d@test.com' % number, '123', name='João %d' % number)
+        get_user_model().objects.update(search_name='')
+
+        apps = MigrationExecutor(connection).loader.project_state(
+            ('account', '0002_user_search_name')).apps
+        with mock.patch.object(search_name_migration, 'BATCH_SIZE', 2):
+            search_name_migration.fill_search_name(apps, None)
+
+        self.assertEqual(
+            sorted(get_user_model().objects.values_list('search_name',
+                                                        flat=True)),
+            ['user%d test com joao %d' % (number, number)
+             for number in range(5)])
@@ -0,0 +1,180 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from account import tokens
+from account.authentication import SignedTokenAuthentication
+
+TOKEN_URL = reverse('account:token')
+REFRESH_URL = reverse('account:token-refresh')
+REVOKE_URL = reverse('account:token-revoke')
+ME_URL = reverse('account:me')
+
+
+@override_settings(ACCOUNT_TOKEN_MODE='signed')
+class SignedTokenTests(TestCase):
+    """Test the signed token mode"""
+
+    def setUp(self):
+        tokens.deny_list.clear()
+        caches['default'].clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='123',
+            name='test name'
+        )
+        self.client = APIClient()
+        res = self.client.post(TOKEN_URL, {'email': 'test@test.com',
+                                           'password': '123'})
+        self.tokens = res.data
+
+    def authenticate(self, token):
+        """Authenticate a request carrying token"""
+        request = APIRequestFactory().get(
+            ME_URL, HTTP_AUTHORIZATION='Bearer ' + token)
+
+        return SignedTokenAuthentication().authenticate(request)
+
+    def test_issue_signed_tokens(self):
+        """Test that the token endpoint issues a signed pair"""
+        self.assertIn('token', self.tokens)
+        self.assertIn('refresh', self.tokens)
+        self.assertEqual(self.tokens['expires_in'], 300)
+
+    def test_authenticate_without_database(self):
+        """Test that checking an access token runs no queries"""
+        with self.assertNumQueries(0):
+            user, claims = self.authenticate(self.tokens['token'])
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, self.user.email)
+
+    def test_retrieve_profile_with_signed_token(self):
+        """Test using a signed token on the API"""
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.tokens['token'])
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'name': 'test name',
+                                    'email': 'test@test.com'})
+
+    def test_tampered_and_expired_tokens_rejected(self):
+        """Test that bad signatures, refresh tokens and old tokens fail"""
+        expired = tokens.make_token(self.user, tokens.ACCESS,
+                                    clock=lambda: 0)
+
+        for token in (self.tokens['token'] + 'x', self.tokens['refresh'],
+                      expired):
+            self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+            res = self.client.get(ME_URL)
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_token(self):
+        """Test that a refresh token can be used once"""
+        res = self.client.post(REFRESH_URL,
+                               {'refresh': self.tokens['refresh']})
+        again = self.client.post(REFRESH_URL,
+                                 {'refresh': self.tokens['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+        self.assertEqual(again.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_once_across_processes(self):
+        """Test that a used refresh token is rejected by other processes"""
+        res = self.client.post(REFRESH_URL,
+                               {'refresh': self.tokens['refresh']})
+        # another process doesn't share the deny list
+        tokens.deny_list.clear()
+        again = self.client.post(REFRESH_URL,
+                                 {'refresh': self.tokens['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_after_password_change(self):
+        """Test that changing the password voids the refresh tokens"""
+        self.user.set_password('456')
+        self.user.save()
+        tokens.deny_list.clear()
+
+        res = self.client.post(REFRESH_URL,
+                               {'refresh': self.tokens['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_inactive_user(self):
+        """Test that deactivated users can't refresh"""
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.post(REFRESH_URL,
+                               {'refresh': self.tokens['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_token(self):
+        """Test that revoked tokens are rejected"""
+        res = self.client.post(REVOKE_URL, {'token': self.tokens['token']})
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.tokens['token'])
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_token_across_processes(self):
+        """Test that a revoked token is rejected by other processes"""
+        self.client.post(REVOKE_URL, {'token': self.tokens['token']})
+        # another process doesn't share the in-memory revocations
+        tokens.deny_list.clear()
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.tokens['token'])
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_tokens_across_processes(self):
+        """Test that a password change is seen by other processes"""
+        self.user.set_password('456')
+        self.user.save()
+        tokens.deny_list.clear()
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.tokens['token'])
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_tokens(self):
+        """Test that changing the password revokes the issued tokens"""
+        self.user.set_password('456')
+        self.user.save()
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer ' + self.tokens['token'])
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class DenyListTests(TestCase):
+    """Test that the deny list forgets expired tokens"""
+
+    def test_prunes_expired_entries(self):
+        now = [0]
+        deny_list = tokens.DenyList(clock=lambda: now[0])
+        deny_list.revoke({'jti': 'a', 'exp': 10, 'uid': 1, 'iat': 0})
+        now[0] = 20
+        deny_list.revoke({'jti': 'b', 'exp': 30, 'uid': 1, 'iat': 0})
+
+        self.assertEqual(len(deny_list), 1)
+        self.assertTrue(deny_list.is_revoked({'jti': 'b', 'uid': 1,
+                                              'iat': 0}))
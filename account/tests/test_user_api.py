@@ -1,10 +1,17 @@
+from unittest import skipUnless
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from account import tokens
+from app.pagination import estimate_count
+
 CREATE_USER_URL = reverse('account:users')
 TOKEN_URL = reverse('account:token')
 ME_URL = reverse('account:me')
@@ -174,3 +181,91 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class UserListApiTests(TestCase):
+    """Test listing the users"""
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@test.com', '123')
+        for email, name in (('joao@test.com', 'João Silva'),
+                            ('maria@test.com', 'Maria Souza'),
+                            ('ana@test.com', 'Ana Joana')):
+            create_user(email=email, password='123', name=name)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_staff_required(self):
+        """Test that only staff may list the users"""
+        self.client.force_authenticate(None)
+        res = self.client.get(CREATE_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(
+            get_user_model().objects.get(email='joao@test.com'))
+        res = self.client.get(CREATE_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_with_signed_token(self):
+        """Test that signed tokens carry the staff flag"""
+        for user, code in (
+                (self.admin, status.HTTP_200_OK),
+                (get_user_model().objects.get(email='joao@test.com'),
+                 status.HTTP_403_FORBIDDEN)):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION='Bearer %s' %
+                               tokens.issue_tokens(user)['token'])
+            res = client.get(CREATE_USER_URL)
+            self.assertEqual(res.status_code, code)
+
+    def test_list_paged_by_email(self):
+        """Test following the pages of users in email order"""
+        res = self.client.get(CREATE_USER_URL, {'page_size': 3})
+
+        self.assertEqual([user['email'] for user in res.data['results']],
+                         ['admin@test.com', 'ana@test.com', 'joao@test.com'])
+        self.assertNotIn('count', res.data)
+        self.assertNotIn('password', res.data['results'][0])
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual([user['email'] for user in res.data['results']],
+                         ['maria@test.com'])
+        self.assertIsNone(res.data['next'])
+
+    def test_search(self):
+        """Test searching the email and name, accents and case ignored"""
+        res = self.client.get(CREATE_USER_URL, {'search': 'JOA'})
+
+        self.assertEqual([user['name'] for user in res.data['results']],
+                         ['Ana Joana', 'João Silva'])
+
+    def test_estimated_count(self):
+        """Test that the estimated count doesn't run a COUNT(*)"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(CREATE_USER_URL, {'count': 'estimated'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.data['count'], int)
+        if connection.vendor == 'postgresql':
+            self.assertFalse(any('COUNT(' in query['sql']
+                                 for query in queries))
+
+        res = self.client.get(CREATE_USER_URL, {'count': 'exact'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == 'postgresql',
+                'reltuples is read on PostgreSQL')
+    def test_estimate_count_reltuples(self):
+        """Test that an analyzed table is counted from pg_class"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE account_user')
+
+        with CaptureQueriesContext(connection) as queries:
+            count = estimate_count(get_user_model().objects.all())
+
+        self.assertEqual(count, 4)
+        self.assertIn('pg_class', queries[0]['sql'])
+        self.assertGreater(estimate_count(
+            get_user_model().objects.filter(search_name__contains='joa')), 0)
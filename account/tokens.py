@@ -0,0 +1,196 @@
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.translation import ugettext_lazy as _
+
+SALT = 'account.tokens'
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+class InvalidToken(Exception):
+    """Raised when a signed token is malformed, expired or revoked"""
+
+
+class DenyList:
+    """List of revoked signed tokens, shared by the processes
+
+    Only tokens that haven't expired yet are kept, so the list stays small:
+    single tokens are stored by id until their expiry and a user can have
+    every token issued before a given time revoked with a single entry.
+
+    Revocations are written to the SIGNED_TOKEN_CACHE, which every process
+    reads, and kept in memory too: the revocations made by this process
+    are found without a cache lookup.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._tokens = {}
+        self._users = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[settings.SIGNED_TOKEN_CACHE]
+
+    def revoke(self, claims):
+        """Revoke a single token"""
+        with self._lock:
+            self._prune()
+            self._tokens[claims['jti']] = claims['exp']
+        self.cache.set('revoked:%s' % claims['jti'], True,
+                       max(int(claims['exp'] - self.clock()), 1))
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to a user until now"""
+        now = self.clock()
+        with self._lock:
+            self._prune()
+            self._users[user_id] = (
+                now, now + settings.SIGNED_TOKEN_REFRESH_TTL)
+        self.cache.set('revoked-user:%s' % user_id, now,
+                       settings.SIGNED_TOKEN_REFRESH_TTL)
+
+    def is_revoked(self, claims):
+        # dict lookups are atomic, no need for the lock on the read path
+        if claims['jti'] in self._tokens:
+            return True
+        revoked = self._users.get(claims['uid'])
+        if revoked is not None and claims['iat'] <= revoked[0]:
+            return True
+
+        # revoked by another process
+        token_key = 'revoked:%s' % claims['jti']
+        user_key = 'revoked-user:%s' % claims['uid']
+        shared = self.cache.get_many([token_key, user_key])
+        if token_key in shared:
+            return True
+        revoked = shared.get(user_key)
+
+        return revoked is not None and claims['iat'] <= revoked
+
+    def clear(self):
+        """Forget the revocations kept in memory"""
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+
+    def __len__(self):
+        return len(self._tokens) + len(self._users)
+
+    def _prune(self):
+        now = self.clock()
+        for jti, expires in list(self._tokens.items()):
+            if expires <= now:
+                del self._tokens[jti]
+        for user_id, (revoked, expires) in list(self._users.items()):
+            if expires <= now:
+                del self._users[user_id]
+
+
+deny_list = DenyList()
+
+
+def fingerprint(user):
+    """Return a digest of the credentials of user
+
+    Carried by the refresh tokens, it stops matching once the password
+    changes or the user is deactivated, like the password reset tokens.
+    """
+    return salted_hmac(SALT, '%s%s%s' % (
+        user.pk, user.password, user.is_active)).hexdigest()[:16]
+
+
+def matches(claims, user):
+    """Return whether the refresh token claims were issued to user as is"""
+    return constant_time_compare(claims.get('fp', ''), fingerprint(user))
+
+
+def use_once(claims, clock=time.time):
+    """Mark a refresh token used, return False if it already was
+
+    Kept in the SIGNED_TOKEN_CACHE until the token expires; cache.add is
+    atomic, so a token refreshed twice at once still succeeds only once.
+    """
+    timeout = max(int(claims['exp'] - clock()), 1)
+
+    return caches[settings.SIGNED_TOKEN_CACHE].add(
+        'refresh-used:%s' % claims['jti'], True, timeout)
+
+
+def make_token(user, token_type, clock=time.time):
+    """Return a signed token of the given type for user"""
+    now = clock()
+    if token_type == ACCESS:
+        ttl = settings.SIGNED_TOKEN_ACCESS_TTL
+    else:
+        ttl = settings.SIGNED_TOKEN_REFRESH_TTL
+    claims = {
+        'uid': user.pk,
+        'email': user.email,
+        'staff': user.is_staff,
+        'typ': token_type,
+        'iat': now,
+        'exp': now + ttl,
+        'jti': secrets.token_urlsafe(12),
+    }
+    if token_type == REFRESH:
+        claims['fp'] = fingerprint(user)
+
+    return signing.dumps(claims, salt=SALT)
+
+
+def issue_tokens(user):
+    """Return a new access and refresh token pair for user"""
+    return {
+        'token': make_token(user, ACCESS),
+        'refresh': make_token(user, REFRESH),
+        'expires_in': settings.SIGNED_TOKEN_ACCESS_TTL,
+    }
+
+
+def verify_token(token, token_type, clock=time.time):
+    """Check the signature, type, expiry and revocation of a token
+
+    Returns the claims. The database is never queried, the revocations
+    are looked up in the SIGNED_TOKEN_CACHE.
+    """
+    try:
+        claims = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        raise InvalidToken(_('Invalid token.'))
+
+    if not isinstance(claims, dict) or claims.get('typ') != token_type:
+        raise InvalidToken(_('Invalid token.'))
+    if claims['exp'] <= clock():
+        raise InvalidToken(_('Token has expired.'))
+    if deny_list.is_revoked(claims):
+        raise InvalidToken(_('Token has been revoked.'))
+
+    return claims
+
+
+def user_from_claims(claims):
+    """Build the user of an access token without querying the database
+
+    The instance only carries the id, email and staff flag; it can be used
+    to filter, assign related objects and check IsAdminUser, views that
+    need the whole user (or save it) must reload it first.
+    from_signed_token marks such instances.
+    """
+    user = get_user_model()(pk=claims['uid'], email=claims['email'],
+                            is_staff=claims.get('staff', False),
+                            is_active=True)
+    user._state.adding = False
+    user._state.db = 'default'
+    user.from_signed_token = True
+
+    return user
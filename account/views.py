@@ -1,16 +1,53 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from account.serializers import UserSerializer, AuthTokenSerializer
+from account import tokens
+from account.authentication import API_AUTHENTICATION_CLASSES
+from app.pagination import KeysetPagination
+from geo.search import normalize
+from account.serializers import UserSerializer, AuthTokenSerializer, \
+    RefreshTokenSerializer, RevokeTokenSerializer
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
 
+class UserPagination(KeysetPagination):
+    """Keyset pages of users, served by the unique index on email"""
+    ordering = ('email',)
+
+
 class ListCreateUserView(generics.ListCreateAPIView):
-    """List the users in the system"""
+    """Create a user, or list the users in the system
+
+    Anyone may create a user; only staff may list them. The list is paged
+    by email and filtered with ?search=, accents and case ignored, on the
+    email and name (served by the trigram index on search_name).
+    ?count=estimated adds an estimate of the number of users that doesn't
+    run a COUNT(*).
+    """
+    authentication_classes = API_AUTHENTICATION_CLASSES
+    pagination_class = UserPagination
     queryset = get_user_model().objects.all()
     serializer_class = UserSerializer
 
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            return [permissions.AllowAny()]
+
+        return [permissions.IsAdminUser()]
+
+    def get_queryset(self):
+        """Retrieve the users matching ?search="""
+        queryset = self.queryset.only('id', 'email', 'name')
+        term = normalize(self.request.query_params.get('search', ''))
+        if term:
+            queryset = queryset.filter(search_name__contains=term)
+
+        return queryset
+
 
 class CreateTokenView(ObtainAuthToken):
     """Create new auth token for user"""
@@ -18,6 +55,46 @@ class CreateTokenView(ObtainAuthToken):
     # sets the renderer to view in the browser
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        """Return a database token or, in signed mode, a signed pair"""
+        if settings.ACCOUNT_TOKEN_MODE != 'signed':
+            return super().post(request, *args, **kwargs)
+
+        serializer = self.serializer_class(data=request.data,
+                                           context={'request': request})
+        serializer.is_valid(raise_exception=True)
+
+        return Response(tokens.issue_tokens(serializer.validated_data['user']))
+
+
+class RefreshTokenView(APIView):
+    """Exchange a signed refresh token for a new token pair"""
+    serializer_class = RefreshTokenSerializer
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        # refresh tokens are single use, validating uses it up
+        serializer.is_valid(raise_exception=True)
+
+        return Response(tokens.issue_tokens(serializer.validated_data['user']))
+
+
+class RevokeTokenView(APIView):
+    """Revoke a signed access or refresh token"""
+    serializer_class = RevokeTokenSerializer
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        claims = serializer.validated_data['claims']
+        tokens.deny_list.revoke(claims)
+        if claims['typ'] == tokens.REFRESH:
+            tokens.use_once(claims)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
@@ -26,7 +103,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     # this could be cookie authentication or we're going to use token
     # authentication
     # it takes the authenticated user and assign it to request
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = API_AUTHENTICATION_CLASSES
     # permissions are the level of access that the user has. the only
     # permission we're going to add is that the user must be authenticated
     # to use the API
@@ -39,4 +116,9 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     # And we're just going to return the user that is authenticated.
     def get_object(self):
         """Retrieve and return authentication user"""
-        return self.request.user
+        user = self.request.user
+        # signed tokens only carry the id and email of the user
+        if getattr(user, 'from_signed_token', False):
+            return get_user_model().objects.get(pk=user.pk)
+
+        return user
@@ -0,0 +1,207 @@
+"""
+ASGI config for app project.
+
+Django 2.2 has no ASGI handler nor async views, so this adapter does the
+network I/O on the event loop and runs Django in a bounded thread pool:
+request bodies are read and responses written asynchronously, and a thread
+is only taken for the time the view works. Slow clients on the list and
+retrieve endpoints hold a coroutine instead of a thread; streaming
+responses (the exports) keep their thread until they're sent, since their
+database cursor belongs to it.
+
+Run it with e.g. ``uvicorn app.asgi:application``.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+# bytes per http.response.body message
+CHUNK_SIZE = 64 * 1024
+
+
+class ASGIHandler:
+    """Serves a WSGI application to an ASGI server"""
+
+    def __init__(self, wsgi_application, max_threads):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers=max_threads,
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError('Unsupported ASGI scope %r' % scope['type'])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            # the client went away before sending the whole request
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            status, headers, content = await loop.run_in_executor(
+                self.executor, self.run_application,
+                self.build_environ(scope, body))
+        finally:
+            body.close()
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        if isinstance(content, bytes):
+            for start in range(0, len(content), CHUNK_SIZE):
+                await send({
+                    'type': 'http.response.body',
+                    'body': content[start:start + CHUNK_SIZE],
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body', 'body': b''})
+        else:
+            await self.stream(content, loop, send)
+
+    @staticmethod
+    async def read_body(receive):
+        """Buffer the request body, spooled to disk when it's large"""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    @staticmethod
+    def build_environ(scope, body):
+        """Translate an ASGI HTTP scope to a WSGI environ"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI strings are bytes decoded as latin-1
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', ()):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+                key = name
+            else:
+                key = 'HTTP_%s' % name
+            if key in environ:
+                value = '%s,%s' % (environ[key], value)
+            environ[key] = value
+
+        return environ
+
+    def run_application(self, environ):
+        """Run Django, in a pool thread
+
+        Returns the status, the headers and either the whole body or, for
+        streaming responses, the response still to be iterated.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers]
+
+        response = self.wsgi_application(environ, start_response)
+        if getattr(response, 'streaming', False):
+            return started['status'], started['headers'], response
+        try:
+            content = b''.join(response)
+        finally:
+            # fires request_finished, which releases the database connection
+            # of this thread
+            if hasattr(response, 'close'):
+                response.close()
+
+        return started['status'], started['headers'], content
+
+    async def stream(self, response, loop, send):
+        """Send a streaming response as a pool thread produces it"""
+        # a few chunks ahead at most, the thread waits for slow clients
+        queue = asyncio.Queue(maxsize=4)
+        done = object()
+        cancelled = []
+
+        def produce():
+            try:
+                for chunk in response:
+                    if cancelled:
+                        break
+                    asyncio.run_coroutine_threadsafe(
+                        queue.put(chunk), loop).result()
+            finally:
+                response.close()
+                asyncio.run_coroutine_threadsafe(
+                    queue.put(done), loop).result()
+
+        producer = loop.run_in_executor(self.executor, produce)
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is done:
+                    break
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body', 'body': b''})
+        except BaseException:
+            cancelled.append(True)
+            # let the producer finish its last put and close the response
+            while not producer.done():
+                if (await queue.get()) is done:
+                    break
+            raise
+        await producer
+
+
+application = ASGIHandler(get_wsgi_application(),
+                          max_threads=settings.ASGI_THREADS)
@@ -0,0 +1,180 @@
+"""PostgreSQL backend with connection health checks and pooling
+
+Two ways to avoid paying a new connection per request:
+
+- persistent connections (CONN_MAX_AGE): with CONN_HEALTH_CHECKS, a
+  connection kept from an earlier request is pinged before its first use
+  in the next one and replaced if the server dropped it;
+- an in-process pool (POOL with MAX_SIZE > 0): connections closed by
+  Django go back to a pool shared by the threads of the process instead
+  of being closed. CONN_MAX_AGE is then ignored, the connections go back
+  at the end of each request so the other threads can use them.
+"""
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+from django.db.backends.postgresql import base
+
+from app import metrics
+from app.db.backends.postgresql.creation import DatabaseCreation
+from app.db.pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connect(conn_params, isolation_level):
+    connection = psycopg2.connect(**conn_params)
+    if isolation_level is not None and \
+            isolation_level != connection.isolation_level:
+        connection.set_session(isolation_level=isolation_level)
+
+    return connection
+
+
+def check(connection):
+    """Ping a connection that was idle in the pool"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+    return True
+
+
+def reset(connection):
+    """Make a connection given back to the pool clean for the next user"""
+    if connection.closed:
+        return False
+    status = connection.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+
+    return True
+
+
+def get_pool(conn_params, options, isolation_level):
+    """Return the pool of this process for these connection parameters"""
+    key = (os.getpid(), tuple(sorted(conn_params.items())))
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                lambda: connect(conn_params, isolation_level),
+                min_size=options.get('MIN_SIZE', 0),
+                max_size=options['MAX_SIZE'],
+                timeout=options.get('TIMEOUT', 5.0),
+                check=check,
+                check_after=options.get('CHECK_AFTER', 30.0),
+                reset=reset)
+
+    return pool
+
+
+def close_pools(database=None):
+    """Close the idle connections of the pools, of one database or all"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    for (pid, params), pool in pools:
+        if database is None or dict(params).get('database') == database:
+            pool.close()
+
+
+def pool_stats():
+    """Return the stats of the pools of this process by database"""
+    with _pools_lock:
+        pools = list(_pools.items())
+
+    return {dict(params).get('database'): pool.stats()
+            for (pid, params), pool in pools if pid == os.getpid()}
+
+
+@metrics.register
+def pool_metrics():
+    values = []
+    for database, stats in pool_stats().items():
+        labels = (('database', database),)
+        for state in ('idle', 'in_use'):
+            values.append(('db_pool_connections',
+                           labels + (('state', state),), stats[state]))
+        values.append(('db_pool_waiting', labels, stats['waiting']))
+        for event in ('acquired', 'waited', 'timeouts',
+                      'connections_created', 'connections_closed',
+                      'checks_failed'):
+            values.append(('db_pool_events_total',
+                           labels + (('event', event),), stats[event]))
+        values.append(('db_pool_wait_seconds_total', labels,
+                       stats['wait_seconds']))
+
+    return values
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the pool the current connection comes from, if any
+        self.pool = None
+        self.health_check_done = False
+
+    @property
+    def pool_options(self):
+        options = self.settings_dict.get('POOL') or {}
+        if options.get('MAX_SIZE', 0) > 0:
+            return options
+
+        return None
+
+    def get_new_connection(self, conn_params):
+        pool_options = self.pool_options
+        if pool_options is None:
+            self.pool = None
+            return super().get_new_connection(conn_params)
+
+        options = self.settings_dict['OPTIONS']
+        self.pool = get_pool(conn_params, pool_options,
+                             options.get('isolation_level'))
+        connection = self.pool.acquire()
+        # as with CONN_MAX_AGE=0: a connection kept for later requests would
+        # sit idle out of the pool, leaving the other threads to time out
+        self.close_at = time.time()
+        # as the parent does for new connections
+        self.isolation_level = options.get('isolation_level',
+                                           connection.isolation_level)
+
+        return connection
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            self.pool.release(self.connection)
+
+    def connect(self):
+        # a new connection needs no check, and connect() itself goes through
+        # ensure_connection()
+        self.health_check_done = True
+        super().connect()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # check the connection again before its first use in this request
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if self.connection is not None and not self.health_check_done and \
+                not self.in_atomic_block:
+            self.health_check_done = True
+            if self.settings_dict.get('CONN_HEALTH_CHECKS') and \
+                    not self.is_usable():
+                self.close()
+        super().ensure_connection()
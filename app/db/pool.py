@@ -0,0 +1,193 @@
+"""Thread-safe pool of database connections
+
+Generic over the connection type: the pool only calls the given connect,
+close, reset and check functions, see app.db.backends.postgresql for the
+psycopg2 ones.
+"""
+import collections
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection is released within the timeout"""
+
+
+class ConnectionPool:
+    """Keeps between min_size and max_size connections open
+
+    acquire() hands out the most recently released idle connection, opens a
+    new one while there are fewer than max_size, or waits up to timeout
+    seconds for one to be released. Connections that stayed idle for
+    check_after seconds or more go through check() before being handed
+    out, and release() runs reset() on them; a connection failing either is
+    closed and replaced.
+    """
+
+    def __init__(self, connect, min_size=0, max_size=10, timeout=5.0,
+                 check=None, check_after=30.0, reset=None,
+                 close=lambda connection: connection.close(),
+                 clock=time.monotonic):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError('Expected 0 <= min_size <= max_size and '
+                             'max_size >= 1.')
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check = check
+        self.check_after = check_after
+        self.reset = reset
+        self.close_connection = close
+        self.clock = clock
+
+        self._condition = threading.Condition()
+        # (connection, released at), the most recent last
+        self._idle = collections.deque()
+        self._size = 0
+        self._waiting = 0
+        self._filled = False
+        self._counters = dict.fromkeys((
+            'connections_created', 'connections_closed', 'acquired',
+            'waited', 'timeouts', 'checks_failed'), 0)
+        self._wait_seconds = 0.0
+
+    def acquire(self, timeout=None):
+        """Return a connection, waiting at most timeout seconds for it"""
+        timeout = self.timeout if timeout is None else timeout
+        self._fill()
+        start = self.clock()
+        deadline = start + timeout
+        waited = False
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            'No connection available within %.1fs '
+                            '(max_size=%d).' % (timeout, self.max_size))
+                    waited = True
+                    self._waiting += 1
+                    try:
+                        self._condition.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    connection, released = self._idle.pop()
+                else:
+                    connection, released = None, None
+                    self._size += 1
+
+            if connection is None:
+                connection = self._open()
+            elif self.check is not None and \
+                    self.clock() - released >= self.check_after and \
+                    not self._checked(connection):
+                continue
+            break
+
+        with self._condition:
+            self._counters['acquired'] += 1
+            if waited:
+                self._counters['waited'] += 1
+                self._wait_seconds += self.clock() - start
+
+        return connection
+
+    def release(self, connection, discard=False):
+        """Give a connection back, or close it when discard is true"""
+        if not discard and self.reset is not None:
+            try:
+                discard = not self.reset(connection)
+            except Exception:
+                discard = True
+        if discard:
+            self._discard(connection)
+            return
+
+        with self._condition:
+            self._idle.append((connection, self.clock()))
+            self._condition.notify()
+
+    def close(self):
+        """Close the idle connections; those in use are closed on release"""
+        with self._condition:
+            idle = [connection for connection, released in self._idle]
+            self._idle.clear()
+        for connection in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._counters)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'wait_seconds': round(self._wait_seconds, 6),
+            })
+
+            return stats
+
+    def _open(self):
+        # the slot is already counted in _size
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._counters['connections_created'] += 1
+
+        return connection
+
+    def _checked(self, connection):
+        try:
+            usable = self.check(connection)
+        except Exception:
+            usable = False
+        if not usable:
+            with self._condition:
+                self._counters['checks_failed'] += 1
+            self._discard(connection)
+
+        return usable
+
+    def _discard(self, connection):
+        try:
+            self.close_connection(connection)
+        except Exception:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._counters['connections_closed'] += 1
+            self._condition.notify()
+
+    def _fill(self):
+        """Open min_size connections the first time the pool is used"""
+        if self._filled:
+            return
+        with self._condition:
+            if self._filled:
+                return
+            self._filled = True
+            missing = max(0, self.min_size - self._size)
+            self._size += missing
+        for opened in range(missing):
+            try:
+                connection = self._open()
+            except Exception:
+                # give back the slots of the connections not opened
+                with self._condition:
+                    self._size -= missing - opened - 1
+                raise
+            with self._condition:
+                self._idle.append((connection, self.clock()))
+                self._condition.notify()
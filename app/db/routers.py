@@ -0,0 +1,109 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+class RoutingState:
+    """How the queries of the current request are routed"""
+    __slots__ = ('use_replica', 'replica', 'wrote', 'user_id')
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.replica = None
+        self.wrote = False
+        self.user_id = None
+
+
+def current():
+    """Return the routing state of the current thread, None outside requests
+    """
+    return getattr(_state, 'routing', None)
+
+
+@contextmanager
+def routing(use_replica):
+    """Route the reads of the enclosed code to a replica, if use_replica
+
+    Yields the RoutingState, whose wrote flag tells whether anything was
+    written meanwhile.
+    """
+    previous = current()
+    state = _state.routing = RoutingState(use_replica)
+    try:
+        yield state
+    finally:
+        _state.routing = previous
+
+
+def _pin_key(user_id):
+    return 'primary_until:%s' % user_id
+
+
+def authenticated(user_id):
+    """Record the user of the current request
+
+    Keeps the request on the primary if the user wrote less than
+    DATABASE_PRIMARY_STICKINESS seconds ago, from any client or worker.
+    Called by the API authentication classes.
+    """
+    state = current()
+    if state is None:
+        return
+    state.user_id = user_id
+    if state.use_replica and \
+            (caches[settings.DATABASE_PRIMARY_STICKINESS_CACHE]
+             .get(_pin_key(user_id)) or 0) > time.time():
+        state.use_replica = False
+
+
+def pin(user_id):
+    """Keep the reads of the user on the primary for a while"""
+    until = time.time() + settings.DATABASE_PRIMARY_STICKINESS
+    caches[settings.DATABASE_PRIMARY_STICKINESS_CACHE].set(
+        _pin_key(user_id), until, settings.DATABASE_PRIMARY_STICKINESS)
+
+
+class PrimaryReplicaRouter:
+    """Sends the reads of safe requests to the DATABASE_REPLICAS
+
+    Everything else reads from and writes to the primary: requests that may
+    write, code running outside a request (commands, shell, tests), reads
+    inside a transaction and every read following a write in the same
+    request. A request sticks to one replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current()
+        if state is None or not state.use_replica or \
+                not settings.DATABASE_REPLICAS or \
+                connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        if state.replica is None:
+            state.replica = random.choice(settings.DATABASE_REPLICAS)
+
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current()
+        if state is not None:
+            # read-your-writes for the rest of the request
+            state.use_replica = False
+            state.wrote = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replicas get the schema through replication
+        return db not in settings.DATABASE_REPLICAS
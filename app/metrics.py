@@ -0,0 +1,313 @@
+"""Request metrics shared by the worker processes
+
+Each process keeps its counters, gauges and histograms in memory, behind a
+lock held for a few dictionary updates per request, and a background thread
+writes them to its own file in METRICS_DIR every METRICS_FLUSH_INTERVAL
+seconds when they changed. The
+metrics endpoint adds up the files of every process, so the figures cover
+all the workers; the in-flight gauges of processes that are gone are
+dropped. Empty METRICS_DIR when the server starts.
+
+Without METRICS_DIR only the current process is reported.
+
+The caches and pools that keep their own counters register a collector
+(see register) read with every snapshot.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+METRICS = {
+    'http_request_duration_seconds': (
+        HISTOGRAM, 'Request latency by view'),
+    'http_requests_total': (
+        COUNTER, 'Requests by view, method and status code'),
+    'http_requests_in_flight': (
+        GAUGE, 'Requests being handled by view'),
+    'db_queries_per_request': (
+        HISTOGRAM, 'SQL queries per request by view'),
+    'geo_response_cache_requests_total': (
+        COUNTER, 'Geo response cache lookups by result (hit or miss)'),
+    'token_cache_requests_total': (
+        COUNTER, 'Token cache lookups by result (hit or miss)'),
+    'token_cache_evictions_total': (
+        COUNTER, 'Tokens dropped from the token cache to make room'),
+    'token_cache_entries': (
+        GAUGE, 'Tokens held by the token cache'),
+    'db_pool_connections': (
+        GAUGE, 'Pooled connections by database and state (idle or in_use)'),
+    'db_pool_waiting': (
+        GAUGE, 'Threads waiting for a pooled connection by database'),
+    'db_pool_events_total': (
+        COUNTER, 'Pool events by database: acquired, waited, timeouts, '
+                 'connections_created, connections_closed, checks_failed'),
+    'db_pool_wait_seconds_total': (
+        COUNTER, 'Time spent waiting for a pooled connection by database'),
+}
+
+# functions returning the (name, labels, value) of their metrics
+_collectors = []
+
+
+def register(collector):
+    """Report the metrics returned by collector() with this process
+
+    For the counters kept by the caches and pools themselves. collector
+    returns (name, labels, value) tuples, name one of METRICS and labels a
+    tuple of (label, value) pairs. Usable as a decorator.
+    """
+    _collectors.append(collector)
+
+    return collector
+
+
+class MetricsStore:
+    """Metrics of the current process, written to METRICS_DIR"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        # tells apart a process that reuses the pid of a dead one
+        self.started = time.time()
+        self._values = {}
+        self._histograms = {}
+        self._dirty = False
+        self._writer = None
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self._touch()
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        with self._lock:
+            self._touch()
+            self._observe(name, labels, value, buckets)
+
+    def record_request(self, view, method, status, duration, queries):
+        """Account a finished request under a single lock"""
+        with self._lock:
+            self._touch()
+            key = ('http_requests_total',
+                   (('view', view), ('method', method),
+                    ('status', str(status))))
+            self._values[key] = self._values.get(key, 0) + 1
+            self._observe('http_request_duration_seconds',
+                          (('view', view),), duration, LATENCY_BUCKETS)
+            if queries is not None:
+                self._observe('db_queries_per_request', (('view', view),),
+                              queries, QUERY_BUCKETS)
+
+    def _observe(self, name, labels, value, buckets):
+        # one count per bucket, then +Inf, then the sum
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = \
+                [0] * (len(buckets) + 1) + [0.0]
+        position = 0
+        while position < len(buckets) and value > buckets[position]:
+            position += 1
+        histogram[position] += 1
+        histogram[-1] += value
+
+    def _touch(self):
+        """Mark the metrics as changed, called with the lock held"""
+        # a worker forked from a process that already had metrics
+        if os.getpid() != self.pid:
+            self._reset()
+        self._dirty = True
+        if self._writer is None and settings.METRICS_DIR:
+            self._writer = threading.Thread(target=self._write_loop,
+                                            name='metrics-writer',
+                                            daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        pid = self.pid
+        while os.getpid() == pid:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            if self._dirty:
+                self.flush()
+
+    def snapshot(self):
+        """Return the metrics of this process as JSON-friendly data"""
+        # outside the lock, the collectors take their own
+        collected = [[name, labels, value] for collector in _collectors
+                     for name, labels, value in collector()]
+        with self._lock:
+            if os.getpid() != self.pid:
+                self._reset()
+            return {
+                'pid': self.pid,
+                'values': [[name, labels, value] for (name, labels), value
+                           in self._values.items()] + collected,
+                'histograms': [[name, labels, list(histogram)]
+                               for (name, labels), histogram
+                               in self._histograms.items()],
+            }
+
+    def path(self):
+        return os.path.join(settings.METRICS_DIR, '%d-%d.json' % (
+            self.pid, self.started * 1000))
+
+    def flush(self):
+        """Write the metrics of this process to METRICS_DIR"""
+        if not settings.METRICS_DIR:
+            return
+        self._dirty = False
+        data = self.snapshot()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=settings.METRICS_DIR,
+                                             suffix='.tmp')
+        with os.fdopen(handle, 'w') as metrics_file:
+            json.dump(data, metrics_file)
+        os.replace(temporary, self.path())
+
+    def clear(self):
+        with self._lock:
+            writer = self._writer
+            self._reset()
+            self._writer = writer
+
+
+store = MetricsStore()
+
+
+@atexit.register
+def flush_at_exit():
+    """Write what happened since the last write"""
+    if store._dirty:
+        store.flush()
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+def collect():
+    """Add up the metrics of every process"""
+    snapshots = [store.snapshot()]
+    own = os.path.basename(store.path()) if settings.METRICS_DIR else None
+    if settings.METRICS_DIR and os.path.isdir(settings.METRICS_DIR):
+        for filename in os.listdir(settings.METRICS_DIR):
+            if not filename.endswith('.json') or filename == own:
+                continue
+            try:
+                with open(os.path.join(settings.METRICS_DIR,
+                                       filename)) as metrics_file:
+                    snapshots.append(json.load(metrics_file))
+            except (OSError, ValueError):
+                # removed or being replaced in the meantime
+                continue
+
+    values = {}
+    histograms = {}
+    for snapshot in snapshots:
+        alive = snapshot['pid'] == store.pid or pid_alive(snapshot['pid'])
+        for name, labels, value in snapshot['values']:
+            if METRICS[name][0] == GAUGE and not alive:
+                continue
+            key = (name, tuple(tuple(label) for label in labels))
+            values[key] = values.get(key, 0) + value
+        for name, labels, histogram in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            total = histograms.get(key)
+            if total is None:
+                histograms[key] = list(histogram)
+            else:
+                histograms[key] = [a + b for a, b in zip(total, histogram)]
+
+    return values, histograms
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n') \
+        .replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    return '{%s}' % ','.join('%s="%s"' % (name, escape(value))
+                             for name, value in labels)
+
+
+def format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+
+    return repr(value)
+
+
+def render(values, histograms):
+    """Return metrics in the Prometheus text exposition format"""
+    buckets = {
+        'http_request_duration_seconds': LATENCY_BUCKETS,
+        'db_queries_per_request': QUERY_BUCKETS,
+    }
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        full_name = '%s_%s' % (settings.METRICS_NAMESPACE, name)
+        lines.append('# HELP %s %s' % (full_name, description))
+        lines.append('# TYPE %s %s' % (full_name, kind))
+        if kind != HISTOGRAM:
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append('%s%s %s' % (
+                        full_name, format_labels(labels),
+                        format_number(value)))
+            continue
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            bounds = [format_number(bound) for bound in buckets[name]]
+            for bound, count in zip(bounds + ['+Inf'], histogram[:-1]):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (
+                    full_name, format_labels(labels + (('le', bound),)),
+                    cumulative))
+            lines.append('%s_sum%s %s' % (
+                full_name, format_labels(labels),
+                format_number(histogram[-1])))
+            lines.append('%s_count%s %d' % (
+                full_name, format_labels(labels), cumulative))
+
+    return '\n'.join(lines) + '\n'
+
+
+def view_name(view_func, method):
+    """Name a view after its class and, for viewsets, its action"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower())
+    if action:
+        return '%s-%s' % (cls.__name__, action)
+
+    return cls.__name__
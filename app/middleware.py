@@ -0,0 +1,203 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from app import metrics
+from app.db import routers
+
+logger = logging.getLogger('app.timing')
+
+
+class QueryTimer:
+    """Database execute wrapper counting the queries and their time"""
+    __slots__ = ('queries', 'duration')
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.queries += 1
+
+
+class RequestTiming:
+    """Timings of a request, kept on request.timing"""
+    __slots__ = ('start', 'view_start', 'view_start_db', 'view_end',
+                 'view_end_db', 'render_end', 'queries')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.view_start_db = 0.0
+        self.view_end = None
+        self.view_end_db = None
+        self.render_end = None
+        self.queries = QueryTimer()
+
+    def metrics(self, end):
+        """Return the (name, milliseconds) pairs of the request"""
+        total = end - self.start
+        db = self.queries.duration
+        metrics = [('db', db), ('total', total)]
+        if self.view_start is not None:
+            view_end = self.view_end or end
+            view_end_db = db if self.view_end_db is None \
+                else self.view_end_db
+            # what the view spends outside the database, mostly serializing
+            metrics.append(('serialize', max(
+                0.0, view_end - self.view_start -
+                (view_end_db - self.view_start_db))))
+        if self.view_end is not None and self.render_end is not None:
+            metrics.append(('render', self.render_end - self.view_end))
+
+        return [(name, round(value * 1000, 3)) for name, value in metrics]
+
+
+class TimingMiddleware:
+    """Records the SQL queries, database, serializer and render time of each
+    request
+
+    The figures go to the Server-Timing header (unless
+    REQUEST_TIMING_HEADER is off) and to one JSON line per request on the
+    app.timing logger. The queries are counted with a database execute
+    wrapper, so it works with DEBUG off and costs two clock reads per
+    query.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = request.timing = RequestTiming()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timing.queries))
+            response = self.get_response(request)
+        end = time.perf_counter()
+
+        metrics = timing.metrics(end)
+        if settings.REQUEST_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join(
+                '%s;dur=%s' % (name, value) if name != 'db' else
+                '%s;dur=%s;desc="%d queries"' % (
+                    name, value, timing.queries.queries)
+                for name, value in metrics)
+        if logger.isEnabledFor(logging.INFO):
+            match = request.resolver_match
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'queries': timing.queries.queries,
+            }
+            record.update(('%s_ms' % name, value) for name, value in metrics)
+            logger.info(json.dumps(record))
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = request.timing
+        timing.view_start = time.perf_counter()
+        timing.view_start_db = timing.queries.duration
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook
+        timing = request.timing
+        timing.view_end = time.perf_counter()
+        timing.view_end_db = timing.queries.duration
+        response.add_post_render_callback(self._rendered(timing))
+
+        return response
+
+    @staticmethod
+    def _rendered(timing):
+        def callback(response):
+            timing.render_end = time.perf_counter()
+
+        return callback
+
+
+class MetricsMiddleware:
+    """Feeds the request metrics of app.metrics
+
+    Goes right after TimingMiddleware, whose query count it reuses.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        request.metrics_view = None
+        try:
+            response = self.get_response(request)
+        finally:
+            view = request.metrics_view
+            if view is not None:
+                metrics.store.inc('http_requests_in_flight',
+                                  (('view', view),), -1)
+        duration = time.perf_counter() - start
+
+        timing = getattr(request, 'timing', None)
+        metrics.store.record_request(
+            view or 'unresolved', request.method, response.status_code,
+            duration, timing.queries.queries if timing else None)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = request.metrics_view = metrics.view_name(view_func,
+                                                        request.method)
+        metrics.store.inc('http_requests_in_flight', (('view', view),))
+
+
+class ReplicaRoutingMiddleware:
+    """Lets safe requests read from the replicas (see app.db.routers)
+
+    After a request that writes, the following requests of the same user
+    read from the primary for DATABASE_PRIMARY_STICKINESS seconds, long
+    enough for the replicas to catch up, so they read their writes. The pin
+    is kept in the DATABASE_PRIMARY_STICKINESS_CACHE cache, keyed on the
+    user, as the API clients authenticate with tokens and seldom keep
+    cookies; a cookie pins the clients that do keep them, anonymous ones
+    included.
+    """
+    cookie_name = 'primary_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replica = request.method in ('GET', 'HEAD', 'OPTIONS') and \
+            not self.pinned(request)
+        with routers.routing(use_replica) as state:
+            response = self.get_response(request)
+
+        if state.wrote and settings.DATABASE_PRIMARY_STICKINESS > 0:
+            if state.user_id is not None:
+                routers.pin(state.user_id)
+            response.set_cookie(
+                self.cookie_name,
+                str(int(time.time()) + settings.DATABASE_PRIMARY_STICKINESS),
+                max_age=settings.DATABASE_PRIMARY_STICKINESS, httponly=True,
+                samesite='Lax')
+
+        return response
+
+    def pinned(self, request):
+        """Tell whether the client wrote less than the window ago"""
+        try:
+            return int(request.COOKIES[self.cookie_name]) > time.time()
+        except (KeyError, ValueError):
+            return False
@@ -0,0 +1,234 @@
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections, models
+from django.db.models import Q
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, Cursor, \
+    CursorPagination, _reverse_ordering
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param
+
+
+def estimate_count(queryset):
+    """Return the number of rows of queryset as estimated by PostgreSQL
+
+    An unfiltered queryset is counted with the reltuples of its table in
+    pg_class, kept up to date by (auto)vacuum and analyze. A filtered one,
+    or a table that was never analyzed, with the row estimate of the plan.
+    Both cost a catalog lookup instead of a COUNT(*) scan, at the price of
+    being off by a few percent. Other databases run the COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)])
+            reltuples = cursor.fetchone()[0]
+            # -1 until the table is first analyzed (0 before PostgreSQL 14)
+            if reltuples > 0:
+                return int(reltuples)
+
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination keyed on every column of a unique ordering
+
+    DRF's CursorPagination only stores the first ordering field in the cursor
+    and skips ties with an OFFSET. Here the cursor carries the whole key (for
+    example name plus id), so every page is a single index range scan with a
+    LIMIT, no matter how deep the client goes, and no COUNT(*) is ever run.
+
+    ?count=estimated adds the estimated number of rows to the response (see
+    estimate_count).
+    """
+    # the last field must be unique so the key identifies a single row
+    ordering = ('name', 'id')
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    count = None
+
+    def get_page_size(self, request):
+        """Return the requested page size, capped by the settings"""
+        self.page_size = settings.API_PAGE_SIZE
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
+
+        return super().get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        count = request.query_params.get(self.count_query_param)
+        if count == 'estimated':
+            self.count = estimate_count(queryset)
+        elif count is not None:
+            raise ValidationError({self.count_query_param: [
+                _('Only "estimated" is supported.')]})
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = self.ordering
+        if reverse:
+            ordering = _reverse_ordering(ordering)
+        queryset = queryset.order_by(*ordering)
+
+        if self.cursor is not None and self.cursor.position is not None:
+            key = self._decode_key(self.cursor.position, queryset.model)
+            queryset = queryset.filter(self._after(ordering, key))
+
+        # fetch one extra row to know whether there is a following page
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = self.cursor.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # a backwards cursor ran past the first row, start over
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        position = self._encode_key(self.page[-1])
+        return self.encode_cursor(Cursor(0, False, position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # a forwards cursor ran past the last row, go back to the end
+            return self.encode_cursor(Cursor(0, True, None))
+
+        position = self._encode_key(self.page[0])
+        return self.encode_cursor(Cursor(0, True, position))
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data['count'] = self.count
+            response.data.move_to_end('count', last=False)
+
+        return response
+
+    def _get_key(self, instance):
+        """Return the values of the ordering fields for a row"""
+        key = []
+        for field in self.ordering:
+            field = field.lstrip('-')
+            if isinstance(instance, dict):
+                key.append(instance[field])
+            else:
+                key.append(getattr(instance, field))
+
+        return key
+
+    def _encode_key(self, instance):
+        return json.dumps(self._get_key(instance), separators=(',', ':'))
+
+    def _decode_key(self, position, model):
+        try:
+            key = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(key, list) or len(key) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # the values end up in the filters, a tampered one must not reach
+        # the database
+        for field, value in zip(self.ordering, key):
+            field = model._meta.get_field(field.lstrip('-'))
+            if isinstance(value, bool) or \
+                    not isinstance(value, self._key_type(field)):
+                raise NotFound(self.invalid_cursor_message)
+
+        return key
+
+    @staticmethod
+    def _key_type(field):
+        """Return the type of the JSON value of an ordering field"""
+        if isinstance(field, (models.AutoField, models.IntegerField)):
+            return int
+
+        return str
+
+    def _after(self, ordering, key):
+        """Build the filter for the rows strictly after key in ordering
+
+        (a, b) > (x, y) is expanded to a >= x AND (a > x OR (a = x AND b > y))
+        so the leading column stays usable as an index range condition.
+        """
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, key):
+            name = field.lstrip('-')
+            lookup_name = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{'%s__%s' % (name, lookup_name): value})
+            equal[name] = value
+
+        return Q(**{'%s__%s' % (first.lstrip('-'), lookup): key[0]}) & \
+            condition
+
+
+class RankedPagination(BasePagination):
+    """Return only the first page of a queryset ranked by relevance
+
+    Used for search results, where the ordering is a computed score and
+    clients only look at the best matches. The response keeps the same
+    shape as KeysetPagination, with no next or previous page, so at most
+    API_MAX_PAGE_SIZE results can be had: a larger ?page_size= is rejected
+    rather than silently cut.
+    """
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = settings.API_PAGE_SIZE
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            pass
+        if page_size > settings.API_MAX_PAGE_SIZE:
+            raise ValidationError({self.page_size_query_param: [
+                _('Search results have a single page of at most %d.')
+                % settings.API_MAX_PAGE_SIZE]})
+        page_size = max(1, page_size)
+
+        return list(queryset[:page_size])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', None),
+            ('previous', None),
+            ('results', data),
+        ]))
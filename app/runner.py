@@ -0,0 +1,26 @@
+import logging
+
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Run the tests without the request timing log lines
+
+    Every request made by the tests would write one and bury the output;
+    the tests checking the lines turn the logger back on with assertLogs.
+    """
+    quiet_loggers = ('app.timing',)
+
+    def run_suite(self, suite, **kwargs):
+        # not in setup_test_environment: importing the tests may configure
+        # the logging again (app.asgi sets Django up)
+        levels = {}
+        for name in self.quiet_loggers:
+            logger = logging.getLogger(name)
+            levels[name] = logger.level
+            logger.setLevel(logging.WARNING)
+        try:
+            return super().run_suite(suite, **kwargs)
+        finally:
+            for name, level in levels.items():
+                logging.getLogger(name).setLevel(level)
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'account',
@@ -44,6 +45,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its timings cover the rest of the stack
+    'app.middleware.TimingMiddleware',
+    'app.middleware.MetricsMiddleware',
+    'app.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,16 +82,81 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# app.db.backends.postgresql adds health checks and pooling to the Django
+# backend: either keep connections open between requests (DB_CONN_MAX_AGE)
+# or pool them (DB_POOL_MAX_SIZE > 0, DB_CONN_MAX_AGE is then ignored and
+# they go back to the pool at the end of each request)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'app.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # seconds a connection is reused for, 0 closes it after each request;
+        # unused with the pool
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # ping reused connections before their first query of a request
+        'CONN_HEALTH_CHECKS': os.environ.get(
+            'DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 0)),
+            # 0 disables the pool
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 0)),
+            # seconds to wait for a connection when all are in use
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+            # idle seconds after which a connection is pinged before reuse
+            'CHECK_AFTER': float(os.environ.get('DB_POOL_CHECK_AFTER', 30)),
+        },
     }
 }
 
+# read replicas, comma separated hosts sharing the name and credentials of
+# the primary; safe requests read from them (see app.db.routers)
+replica_hosts = os.environ.get('DB_REPLICA_HOSTS', '')
+for index, host in enumerate(replica_hosts.split(',')):
+    if host.strip():
+        DATABASES['replica%d' % (index + 1)] = dict(
+            DATABASES['default'], HOST=host.strip(),
+            TEST={'MIRROR': 'default'})
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['app.db.routers.PrimaryReplicaRouter']
+
+# seconds a client reads from the primary after a request that wrote
+DATABASE_PRIMARY_STICKINESS = int(
+    os.environ.get('DB_PRIMARY_STICKINESS', 5))
+
+# cache holding which users wrote within the window; must be shared by every
+# worker (e.g. memcached) for the users to read their writes everywhere
+DATABASE_PRIMARY_STICKINESS_CACHE = os.environ.get(
+    'DB_PRIMARY_STICKINESS_CACHE', 'default')
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # versions and rendered responses of the geo endpoints (see geo.caching)
+    # LocMemCache is per process and evicts the least recently used entries
+    # once MAX_ENTRIES is reached; in production point it to a shared cache,
+    # e.g. GEO_CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+    'geo': {
+        'BACKEND': os.environ.get(
+            'GEO_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('GEO_CACHE_LOCATION', 'geo'),
+        'TIMEOUT': int(os.environ.get('GEO_CACHE_TIMEOUT', 600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('GEO_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -126,5 +196,137 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'static'))
+
 # indicates the custom user model
 AUTH_USER_MODEL = 'account.User'
+
+
+# API pagination (see app.pagination)
+# clients may ask for a different page size with ?page_size=, up to the max
+
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+
+
+# Token authentication (see account.authentication)
+# resolved tokens are cached per process for up to TOKEN_CACHE_TTL seconds
+
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 60))
+
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000))
+
+# 'db' issues rest_framework.authtoken tokens from /api/user/token/, 'signed'
+# issues short lived signed tokens (see account.tokens) that are checked
+# without touching the database; both kinds are always accepted
+ACCOUNT_TOKEN_MODE = os.environ.get('ACCOUNT_TOKEN_MODE', 'db')
+
+# lifetime of the signed tokens, in seconds
+SIGNED_TOKEN_ACCESS_TTL = int(os.environ.get('SIGNED_TOKEN_ACCESS_TTL', 300))
+
+SIGNED_TOKEN_REFRESH_TTL = int(
+    os.environ.get('SIGNED_TOKEN_REFRESH_TTL', 24 * 60 * 60))
+
+# cache holding the revoked signed tokens and the refresh tokens already
+# used; must be shared by every worker (e.g. memcached) for the revocations
+# to apply everywhere
+SIGNED_TOKEN_CACHE = os.environ.get('SIGNED_TOKEN_CACHE', 'default')
+
+
+# Request timing (see app.middleware.TimingMiddleware)
+
+# send the Server-Timing header; the app.timing log lines are always written
+REQUEST_TIMING_HEADER = os.environ.get('REQUEST_TIMING_HEADER', '1') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {
+            'format': '%(message)s',
+        },
+    },
+    'handlers': {
+        'timing': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'app.timing': {
+            'handlers': ['timing'],
+            # WARNING turns the lines off; the tests do it (see app.runner)
+            'level': os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# runs the tests with the request timing lines off
+TEST_RUNNER = 'app.runner.TestRunner'
+
+# ASGI (see app.asgi)
+
+# threads running Django per ASGI worker; the connections waiting on slow
+# clients don't take one
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
+# Metrics (see app.metrics)
+
+# directory shared by the worker processes; empty it when the server starts.
+# Without it /metrics only reports the process that answers
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+# seconds between two writes of the metrics of a process
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+
+# prefix of the metric names
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'brlegal')
+
+# when set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Geo API
+
+# maximum number of rows accepted by POST /api/geo/court-districts/bulk/
+GEO_BULK_MAX_ROWS = int(os.environ.get('GEO_BULK_MAX_ROWS', 10000))
+
+# maximum number of values of the list filters, like ?state=1,2,3 or ?ids=
+GEO_FILTER_MAX_VALUES = int(os.environ.get('GEO_FILTER_MAX_VALUES', 100))
+
+# rows fetched per round trip by the server-side cursor of the export actions
+GEO_EXPORT_CHUNK_SIZE = int(os.environ.get('GEO_EXPORT_CHUNK_SIZE', 2000))
+
+# court district entries kept by the in-process autocomplete index, about
+# 200 bytes each; least recently used states are dropped beyond it
+GEO_AUTOCOMPLETE_MAX_ENTRIES = int(
+    os.environ.get('GEO_AUTOCOMPLETE_MAX_ENTRIES', 100000))
+
+# maximum number of suggestions returned by the autocomplete action
+GEO_AUTOCOMPLETE_MAX_LIMIT = int(
+    os.environ.get('GEO_AUTOCOMPLETE_MAX_LIMIT', 50))
+
+# geo responses of at least this many bytes are compressed, once per version,
+# for the clients accepting gzip or br (the latter needs the brotli package)
+GEO_COMPRESS_MIN_SIZE = int(os.environ.get('GEO_COMPRESS_MIN_SIZE', 1024))
+
+GEO_GZIP_LEVEL = int(os.environ.get('GEO_GZIP_LEVEL', 6))
+
+GEO_BROTLI_QUALITY = int(os.environ.get('GEO_BROTLI_QUALITY', 5))
+
+# content-hashed snapshots of the canonical geo data, written by the
+# publish_geo_snapshot command (see geo.snapshots). Point a static server or
+# a CDN at GEO_SNAPSHOT_DIR and set GEO_SNAPSHOT_URL to its URL, ending in a
+# slash, to keep the downloads off Django; unset, Django serves them
+GEO_SNAPSHOT_DIR = os.environ.get('GEO_SNAPSHOT_DIR',
+                                  os.path.join(STATIC_ROOT, 'geo'))
+
+GEO_SNAPSHOT_URL = os.environ.get('GEO_SNAPSHOT_URL', '')
+
+# snapshots kept for the clients still reading an older manifest
+GEO_SNAPSHOT_KEEP = int(os.environ.get('GEO_SNAPSHOT_KEEP', 3))
+
+# seconds clients and proxies may cache the snapshot manifest
+GEO_SNAPSHOT_MANIFEST_MAX_AGE = int(
+    os.environ.get('GEO_SNAPSHOT_MANIFEST_MAX_AGE', 60))
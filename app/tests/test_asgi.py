@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from app.asgi import ASGIHandler, application
+from geo.models import State
+
+
+def request(app, method, path, query_string=b'', headers=(), body=b'',
+            chunks=1):
+    """Run one request through an ASGI application
+
+    The body is sent in the given number of chunks. Returns the status, the
+    headers and the body of the response and the number of body messages.
+    """
+    size = -(-len(body) // chunks) if body else 0
+    messages = [{
+        'type': 'http.request',
+        'body': body[start:start + size],
+        'more_body': start + size < len(body),
+    } for start in range(0, len(body), size)] if body else [
+        {'type': 'http.request', 'body': b'', 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': query_string,
+        'headers': [(name.encode(), value.encode())
+                    for name, value in headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 12345),
+    }
+    asyncio.run(app(scope, receive, send))
+
+    start, bodies = sent[0], sent[1:]
+
+    return (start['status'], dict(start['headers']),
+            b''.join(message['body'] for message in bodies), len(bodies))
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    """Test serving the API through the ASGI adapter
+
+    The views run in pool threads with their own database connections, so
+    the test data has to be committed.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        caches['geo'].clear()
+        State.objects.create(user=self.user, name='Acre', initials='AC')
+        self.handler = ASGIHandler(application.wsgi_application,
+                                   max_threads=1)
+
+    def tearDown(self):
+        # persistent connections of the pool thread would outlive the test
+        self.handler.executor.submit(connections.close_all).result()
+        self.handler.executor.shutdown()
+
+    def test_token_authentication(self):
+        """Test a list with token authentication"""
+        status, headers, body, messages = request(
+            self.handler, 'GET', reverse('geo:state-list'),
+            headers=[('host', 'testserver'),
+                     ('authorization', 'Token %s' % self.token.key)])
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        self.assertEqual([state['name']
+                          for state in json.loads(body)['results']],
+                         ['Acre'])
+
+    def test_query_string_and_unauthenticated(self):
+        """Test that the query string and missing credentials get through"""
+        status, headers, body, messages = request(
+            self.handler, 'GET', reverse('geo:state-list'),
+            query_string=b'page_size=1', headers=[('host', 'testserver')])
+
+        self.assertEqual(status, 401)
+
+    def test_request_body(self):
+        """Test that a body sent in several messages is put together"""
+        body = json.dumps({'email': 'teste@teste.com',
+                           'password': '123'}).encode()
+
+        status, headers, content, messages = request(
+            self.handler, 'POST', reverse('account:token'),
+            headers=[('host', 'testserver'),
+                     ('content-type', 'application/json'),
+                     ('content-length', str(len(body)))],
+            body=body, chunks=3)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(content)['token'], self.token.key)
+
+    def test_streaming_response(self):
+        """Test that streaming responses are sent as they are produced"""
+        for number in range(3):
+            State.objects.create(user=self.user, name='State %d' % number,
+                                 initials='XX')
+        status, headers, body, messages = request(
+            self.handler, 'GET', reverse('geo:state-export'),
+            query_string=b'format=csv',
+            headers=[('host', 'testserver'),
+                     ('authorization', 'Token %s' % self.token.key)])
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body.decode().splitlines()[0], 'id,name,initials')
+        self.assertEqual(len(body.decode().splitlines()), 5)
+        self.assertGreaterEqual(messages, 2)
+
+    def test_lifespan(self):
+        """Test that startup and shutdown are acknowledged"""
+        handler = ASGIHandler(application.wsgi_application, max_threads=1)
+        messages = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(handler({'type': 'lifespan'}, receive, send))
+
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from account.authentication import token_cache
+from app import metrics
+from geo import views as geo_views
+from geo.caching import response_cache
+
+METRICS_URL = reverse('metrics')
+STATES_URL = reverse('geo:state-list')
+
+
+def dead_pid():
+    """Return the pid of a process that has already exited"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+
+    return process.pid
+
+
+def write_snapshot(directory, pid, values=(), histograms=()):
+    path = os.path.join(directory, '%d-1.json' % pid)
+    with open(path, 'w') as metrics_file:
+        json.dump({
+            'pid': pid,
+            'values': list(values),
+            'histograms': list(histograms),
+        }, metrics_file)
+
+
+class MetricsTests(TestCase):
+    """Test the request metrics"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        caches['geo'].clear()
+        metrics.store.clear()
+
+    def test_view_name(self):
+        """Test that views are named after their class and action"""
+        view = geo_views.StateViewSet.as_view({'get': 'list'})
+
+        self.assertEqual(metrics.view_name(view, 'GET'),
+                         'StateViewSet-list')
+
+    def test_request_metrics(self):
+        """Test that requests are counted by view and status"""
+        self.client.get(STATES_URL)
+        self.client.get(STATES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        lines = res.content.decode().splitlines()
+        self.assertIn('brlegal_http_requests_total{view="StateViewSet-list",'
+                      'method="GET",status="200"} 2', lines)
+        self.assertIn('brlegal_http_request_duration_seconds_count'
+                      '{view="StateViewSet-list"} 2', lines)
+        self.assertIn('brlegal_http_request_duration_seconds_bucket'
+                      '{view="StateViewSet-list",le="+Inf"} 2', lines)
+        self.assertIn('brlegal_db_queries_per_request_count'
+                      '{view="StateViewSet-list"} 2', lines)
+        # the request for /metrics itself is still in flight
+        self.assertIn('brlegal_http_requests_in_flight'
+                      '{view="StateViewSet-list"} 0', lines)
+        self.assertIn('brlegal_http_requests_in_flight{view="metrics"} 1',
+                      lines)
+
+    def test_cache_metrics(self):
+        """Test that the counters of the caches are exported"""
+        self.client.get(STATES_URL)
+        self.client.get(STATES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        lines = res.content.decode().splitlines()
+        cache = response_cache.stats()
+        self.assertGreater(cache['hits'], 0)
+        self.assertIn('brlegal_geo_response_cache_requests_total'
+                      '{result="hit"} %d' % cache['hits'], lines)
+        self.assertIn('brlegal_geo_response_cache_requests_total'
+                      '{result="miss"} %d' % cache['misses'], lines)
+        tokens = token_cache.stats()
+        self.assertIn('brlegal_token_cache_requests_total{result="hit"} %d'
+                      % tokens['hits'], lines)
+        self.assertIn('brlegal_token_cache_entries %d' % tokens['size'],
+                      lines)
+
+    def test_aggregates_processes(self):
+        """Test that the metrics of other workers are added up"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        labels = [['view', 'StateViewSet-list'], ['method', 'GET'],
+                  ['status', '200']]
+        gauge = ['http_requests_in_flight', [['view', 'StateViewSet-list']],
+                 1]
+        write_snapshot(directory, os.getppid(), values=[
+            ['http_requests_total', labels, 3], gauge])
+        write_snapshot(directory, dead_pid(), values=[
+            ['http_requests_total', labels, 4], gauge])
+
+        with override_settings(METRICS_DIR=directory):
+            self.client.get(STATES_URL)
+            metrics.store.flush()
+            res = self.client.get(METRICS_URL)
+
+        lines = res.content.decode().splitlines()
+        self.assertIn('brlegal_http_requests_total{view="StateViewSet-list",'
+                      'method="GET",status="200"} 8', lines)
+        # only the live worker is still handling a request
+        self.assertIn('brlegal_http_requests_in_flight'
+                      '{view="StateViewSet-list"} 1', lines)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required(self):
+        """Test that the endpoint can be protected with a token"""
+        res = self.client.get(METRICS_URL)
+        authorized = self.client.get(METRICS_URL,
+                                     HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(authorized.status_code, status.HTTP_200_OK)
@@ -0,0 +1,74 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from geo.models import State
+
+STATES_URL = reverse('geo:state-list')
+
+
+def parse_server_timing(header):
+    """Return the Server-Timing metrics as {name: {param: value}}"""
+    metrics = {}
+    for metric in header.split(','):
+        name, *params = [part.strip() for part in metric.split(';')]
+        metrics[name] = dict(param.split('=', 1) for param in params)
+
+    return metrics
+
+
+class TimingMiddlewareTests(TestCase):
+    """Test the request timing middleware"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        caches['geo'].clear()
+        State.objects.create(user=self.user, name='Acre', initials='AC')
+
+    def test_server_timing_header(self):
+        """Test that the queries and timings are sent to the client"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(STATES_URL)
+
+        metrics = parse_server_timing(res['Server-Timing'])
+        self.assertEqual(set(metrics),
+                         {'db', 'serialize', 'render', 'total'})
+        self.assertEqual(metrics['db']['desc'],
+                         '"%d queries"' % len(queries))
+        for name, params in metrics.items():
+            self.assertGreaterEqual(float(params['dur']), 0)
+        self.assertLessEqual(float(metrics['db']['dur']),
+                             float(metrics['total']['dur']))
+
+    def test_log_line(self):
+        """Test that every request is logged as a JSON line"""
+        with self.assertLogs('app.timing', 'INFO') as logs:
+            res = self.client.get(STATES_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['method'], 'GET')
+        self.assertEqual(record['path'], STATES_URL)
+        self.assertEqual(record['view'], 'geo:state-list')
+        self.assertEqual(record['status'], res.status_code)
+        self.assertGreater(record['queries'], 0)
+        for name in ('db_ms', 'serialize_ms', 'render_ms', 'total_ms'):
+            self.assertIn(name, record)
+
+    @override_settings(REQUEST_TIMING_HEADER=False)
+    def test_header_disabled(self):
+        """Test that the header can be turned off"""
+        res = self.client.get(STATES_URL)
+
+        self.assertNotIn('Server-Timing', res)
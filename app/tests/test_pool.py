@@ -0,0 +1,244 @@
+import threading
+import unittest
+
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase
+
+from app import metrics
+from app.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the connection pool"""
+
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection(len(self.opened))
+        self.opened.append(connection)
+
+        return connection
+
+    def test_reuse(self):
+        """Test that released connections are handed out again"""
+        pool = ConnectionPool(self.connect, max_size=2)
+
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_min_size(self):
+        """Test that min_size connections are opened on first use"""
+        pool = ConnectionPool(self.connect, min_size=3, max_size=5)
+
+        pool.acquire()
+
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(pool.stats()['idle'], 2)
+
+    def test_timeout(self):
+        """Test that acquire gives up when every connection is in use"""
+        pool = ConnectionPool(self.connect, max_size=1, timeout=0.01)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waits_for_release(self):
+        """Test that a waiting acquire gets the connection released"""
+        pool = ConnectionPool(self.connect, max_size=1, timeout=5)
+        first = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(
+            pool.acquire()))
+        waiter.start()
+
+        pool.release(first)
+        waiter.join(5)
+
+        self.assertEqual(acquired, [first])
+        self.assertEqual(pool.stats()['waited'], 1)
+
+    def test_reset_failure_discards(self):
+        """Test that connections that can't be reset are closed"""
+        pool = ConnectionPool(self.connect, max_size=1,
+                              reset=lambda connection: False)
+        first = pool.acquire()
+
+        pool.release(first)
+        second = pool.acquire()
+
+        self.assertTrue(first.closed)
+        self.assertIsNot(first, second)
+
+    def test_check_after_idle(self):
+        """Test that connections idle for too long are checked first"""
+        clock = FakeClock()
+        checked = []
+
+        def check(connection):
+            checked.append(connection)
+            return connection.number != 0
+
+        pool = ConnectionPool(self.connect, max_size=2, check=check,
+                              check_after=10, clock=clock)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(checked, [])
+        pool.release(first)
+
+        clock.now = 10
+        second = pool.acquire()
+
+        self.assertEqual(checked, [first])
+        self.assertTrue(first.closed)
+        self.assertEqual(second.number, 1)
+        self.assertEqual(pool.stats()['checks_failed'], 1)
+
+    def test_connect_failure_frees_slot(self):
+        """Test that a failed connect doesn't use up the pool"""
+        attempts = []
+
+        def connect():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError('refused')
+            return FakeConnection(len(attempts))
+
+        pool = ConnectionPool(connect, max_size=1, timeout=0.01)
+        with self.assertRaises(OSError):
+            pool.acquire()
+
+        self.assertIsNotNone(pool.acquire())
+
+    def test_stats(self):
+        """Test the pool stats"""
+        pool = ConnectionPool(self.connect, max_size=3)
+        first = pool.acquire()
+        pool.acquire()
+        pool.release(first)
+
+        stats = pool.stats()
+
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['in_use'], 1)
+        self.assertEqual(stats['acquired'], 2)
+        self.assertEqual(stats['connections_created'], 2)
+
+    def test_close(self):
+        """Test that closing the pool closes the idle connections"""
+        pool = ConnectionPool(self.connect, max_size=2)
+        first = pool.acquire()
+        pool.release(first)
+
+        pool.close()
+
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+@unittest.skipUnless(
+    connection.settings_dict['ENGINE'] == 'app.db.backends.postgresql',
+    'requires the app PostgreSQL backend')
+class PostgreSQLBackendTests(TestCase):
+    """Test the health checks and pooling of the PostgreSQL backend"""
+
+    def wrapper(self, **settings):
+        """Return a separate connection to the test database"""
+        default = connections['default']
+        wrapper = default.__class__(dict(default.settings_dict, **settings),
+                                    alias='default')
+        self.addCleanup(wrapper.close)
+
+        return wrapper
+
+    @staticmethod
+    def backend_pid(wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_dropped_connection_replaced(self):
+        """Test that a connection dropped by the server is replaced"""
+        persistent = self.wrapper(CONN_HEALTH_CHECKS=True, POOL={})
+        pid = self.backend_pid(persistent)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+        # as at the start of the next request
+        persistent.close_if_unusable_or_obsolete()
+
+        self.assertNotEqual(self.backend_pid(persistent), pid)
+
+    def test_pooled_connection_reused(self):
+        """Test that closed connections go back to the pool"""
+        # its own connection parameters, so not the pool of the test run
+        pooled = self.wrapper(POOL={'MAX_SIZE': 1, 'TIMEOUT': 1},
+                              OPTIONS={'application_name': 'pool-test'})
+        pid = self.backend_pid(pooled)
+        pool = pooled.pool
+
+        pooled.close()
+        self.assertEqual(pool.stats()['idle'], 1)
+
+        self.assertEqual(self.backend_pid(pooled), pid)
+        self.assertEqual(pool.stats()['connections_created'], 1)
+        pooled.close()
+        pool.close()
+
+    def test_pooled_connection_returned_after_request(self):
+        """Test that CONN_MAX_AGE doesn't keep pooled connections away"""
+        pooled = self.wrapper(CONN_MAX_AGE=60,
+                              POOL={'MAX_SIZE': 1, 'TIMEOUT': 1},
+                              OPTIONS={'application_name': 'pool-test-age'})
+        self.backend_pid(pooled)
+        pool = pooled.pool
+
+        # as at the end of the request
+        pooled.close_if_unusable_or_obsolete()
+
+        self.assertIsNone(pooled.connection)
+        self.assertEqual(pool.stats()['idle'], 1)
+        pool.close()
+
+    def test_pool_metrics(self):
+        """Test that the pool gauges and counters are exported"""
+        pooled = self.wrapper(POOL={'MAX_SIZE': 1, 'TIMEOUT': 1},
+                              OPTIONS={'application_name': 'pool-metrics'})
+        self.backend_pid(pooled)
+        pool = pooled.pool
+        self.addCleanup(pool.close)
+
+        lines = metrics.render(*metrics.collect()).splitlines()
+
+        labels = 'database="%s"' % pooled.settings_dict['NAME']
+        self.assertIn('brlegal_db_pool_connections{%s,state="in_use"} 1'
+                      % labels, lines)
+        self.assertIn('brlegal_db_pool_events_total'
+                      '{%s,event="acquired"} 1' % labels, lines)
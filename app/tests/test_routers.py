@@ -0,0 +1,145 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app.db.routers import PrimaryReplicaRouter, routing
+from geo.models import State
+
+STATES_URL = reverse('geo:state-list')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'],
+                   DATABASE_PRIMARY_STICKINESS=5)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test the routing of the reads to the replicas
+
+    The replica alias is a second connection to the test database. Not a
+    TestCase: the reads inside its transaction would all go to the primary.
+    """
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        connections.databases['replica'] = dict(
+            connections['default'].settings_dict)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        delattr(connections._connections, 'replica')
+        del connections.databases['replica']
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        caches['geo'].clear()
+        caches['default'].clear()
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test that commands and the shell read from the primary"""
+        self.assertEqual(self.router.db_for_read(State), 'default')
+
+    def test_write_pins_the_rest_of_the_request(self):
+        """Test that the reads following a write go to the primary"""
+        with routing(use_replica=True) as state:
+            self.assertEqual(self.router.db_for_read(State), 'replica')
+            self.assertEqual(self.router.db_for_write(State), 'default')
+            self.assertEqual(self.router.db_for_read(State), 'default')
+
+        self.assertTrue(state.wrote)
+
+    def test_reads_in_transaction_use_primary(self):
+        """Test that the reads inside a transaction go to the primary"""
+        with routing(use_replica=True), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(State), 'default')
+
+    def test_safe_request_reads_replica(self):
+        """Test that a GET reads from the replica"""
+        State.objects.create(user=self.user, name='Acre', initials='AC')
+
+        with CaptureQueriesContext(connections['replica']) as queries:
+            res = self.client.get(STATES_URL)
+
+        self.assertTrue(queries.captured_queries)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertNotIn('primary_until', res.cookies)
+
+    def test_write_sticks_client_to_primary(self):
+        """Test that a client reads its own writes after a POST"""
+        res = self.client.post(STATES_URL, {'name': 'Acre',
+                                            'initials': 'AC'})
+        self.assertIn('primary_until', res.cookies)
+
+        with CaptureQueriesContext(connections['replica']) as queries:
+            res = self.client.get(STATES_URL)
+
+        self.assertEqual(queries.captured_queries, [])
+        self.assertEqual([state['name'] for state in res.data['results']],
+                         ['Acre'])
+
+    def test_expired_pin_reads_replica(self):
+        """Test that the pin of the client only lasts the window"""
+        self.client.cookies['primary_until'] = '1'
+
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.client.get(STATES_URL)
+
+        self.assertTrue(queries.captured_queries)
+
+    def test_versions_read_from_primary(self):
+        """Test that the geo versions, which get cached, skip the replica"""
+        State.objects.create(user=self.user, name='Acre', initials='AC')
+        State.objects.create(name='Bahia', initials='BA')
+        caches['geo'].clear()
+
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            self.client.get(STATES_URL)
+
+        self.assertTrue(replica.captured_queries)
+        self.assertFalse([query for query in replica.captured_queries
+                          if 'geoversion' in query['sql']])
+        self.assertEqual(len([query for query in primary.captured_queries
+                              if 'geoversion' in query['sql']]), 2)
+
+    def test_write_sticks_user_to_primary(self):
+        """Test that a user reads its own writes from another client
+
+        Token clients usually don't keep cookies, the pin follows the user.
+        """
+        token = Token.objects.create(user=self.user)
+        writer = APIClient()
+        writer.credentials(HTTP_AUTHORIZATION='Token %s' % token.key)
+        res = writer.post(STATES_URL, {'name': 'Acre', 'initials': 'AC'})
+        self.assertEqual(res.status_code, 201)
+
+        reader = APIClient()
+        reader.credentials(HTTP_AUTHORIZATION='Token %s' % token.key)
+        with CaptureQueriesContext(connections['replica']) as queries:
+            res = reader.get(STATES_URL)
+
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'geo_' in query['sql']])
+        self.assertEqual([state['name'] for state in res.data['results']],
+                         ['Acre'])
+
+        # once the pin expires the reads go back to the replica
+        caches['default'].clear()
+        caches['geo'].clear()
+        with CaptureQueriesContext(connections['replica']) as queries:
+            reader.get(STATES_URL)
+
+        self.assertTrue(queries.captured_queries)
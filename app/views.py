@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from app import metrics as app_metrics
+
+
+@require_GET
+def metrics(request):
+    """Expose the request metrics of every worker to Prometheus"""
+    if settings.METRICS_TOKEN and not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            'Bearer %s' % settings.METRICS_TOKEN):
+        return HttpResponse(status=401)
+
+    return HttpResponse(app_metrics.render(*app_metrics.collect()),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
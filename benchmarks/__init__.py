@@ -0,0 +1,11 @@
+"""Benchmarks of the API
+
+    python -m benchmarks.api --mode inprocess --output base.json
+    python -m benchmarks.api --mode http --output new.json
+    python -m benchmarks.compare base.json new.json
+
+Each run creates a throwaway test database, fills it with benchmarks.data and
+drops it at the end. The settings come from DJANGO_SETTINGS_MODULE
+(app.settings by default), so point the DB_* variables at a PostgreSQL
+server as in docker-compose.
+"""
@@ -0,0 +1,299 @@
+"""Throughput and latency of the main API endpoints
+
+    python -m benchmarks.api [--mode inprocess|http] [--users 2]
+                             [--requests 200] [--output results.json]
+
+inprocess goes through the Django test client: the whole middleware and
+view stack without sockets. http starts a local threaded server on the
+same test database and sends real requests to it.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.core.servers.basehttp import ThreadedWSGIServer  # noqa: E402
+from django.test.testcases import LiveServerThread, \
+    QuietWSGIRequestHandler, _StaticFilesHandler  # noqa: E402
+from django.test.utils import setup_databases, setup_test_environment, \
+    teardown_databases, teardown_test_environment  # noqa: E402
+
+from benchmarks import data  # noqa: E402
+from benchmarks.measure import run  # noqa: E402
+from geo.models import State  # noqa: E402
+
+ENDPOINTS = ('states', 'court_districts_by_state', 'token', 'me')
+
+
+class InProcessClient:
+    """Sends requests through the Django test client"""
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, body=None, headers=None):
+        extra = {'HTTP_%s' % name.upper().replace('-', '_'): value
+                 for name, value in (headers or {}).items()}
+        if method == 'POST':
+            response = self.client.post(path, body,
+                                        content_type='application/json',
+                                        **extra)
+        else:
+            response = self.client.get(path, **extra)
+
+        return response.status_code, response.content
+
+    def close(self):
+        pass
+
+
+class HTTPClient:
+    """Sends requests to a running server, one connection per request"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            conn.request(method, path, body, headers)
+            response = conn.getresponse()
+
+            return response.status, response.read()
+        finally:
+            conn.close()
+
+    def close(self):
+        pass
+
+
+def authenticate(client, users):
+    """Return the Authorization header and the state ids of each user"""
+    keyword = 'Bearer' if settings.ACCOUNT_TOKEN_MODE == 'signed' \
+        else 'Token'
+    sessions = []
+    for user in users:
+        status, content = client.request('POST', '/api/user/token/', {
+            'email': user.email,
+            'password': data.PASSWORD,
+        })
+        if status != 200:
+            raise RuntimeError('Could not authenticate %s: %s %s' % (
+                user.email, status, content[:200]))
+        sessions.append({
+            'email': user.email,
+            'headers': {'Authorization': '%s %s' % (
+                keyword, json.loads(content.decode('utf-8'))['token'])},
+            'states': list(State.objects.visible_to(user)
+                           .order_by('id').values_list('id', flat=True)),
+        })
+
+    return sessions
+
+
+def endpoint_calls(client, sessions, clear_cache):
+    """Return a call(number) per endpoint, rotating users and states"""
+
+    def call(method, path, body=None, headers=None):
+        if clear_cache:
+            caches['geo'].clear()
+
+        return client.request(method, path, body, headers)[0]
+
+    def session(number):
+        return sessions[number % len(sessions)]
+
+    def states(number):
+        return call('GET', '/api/geo/states/',
+                    headers=session(number)['headers'])
+
+    def court_districts_by_state(number):
+        user = session(number)
+        state = user['states'][
+            (number // len(sessions)) % len(user['states'])]
+
+        return call('GET', '/api/geo/court-districts/?' + urlencode({
+            'state': state}), headers=user['headers'])
+
+    def token(number):
+        return call('POST', '/api/user/token/', {
+            'email': session(number)['email'],
+            'password': data.PASSWORD,
+        })
+
+    def me(number):
+        return call('GET', '/api/user/me/',
+                    headers=session(number)['headers'])
+
+    return {
+        'states': states,
+        'court_districts_by_state': court_districts_by_state,
+        'token': token,
+        'me': me,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class ClosingWSGIServer(ThreadedWSGIServer):
+    """Closes the connections of each request thread when it ends
+
+    The request threads would otherwise keep their connections open for
+    CONN_MAX_AGE, and the test database couldn't be dropped at the end.
+    """
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            connections.close_all()
+
+
+class ServerThread(LiveServerThread):
+
+    def _create_server(self):
+        return ClosingWSGIServer((self.host, self.port),
+                                 QuietWSGIRequestHandler,
+                                 allow_reuse_address=False)
+
+
+def start_server():
+    """Start a threaded server on the test database, as LiveServerTestCase"""
+    connections_override = {}
+    for conn in connections.all():
+        # in-memory SQLite databases only exist on this connection
+        if conn.vendor == 'sqlite' and conn.is_in_memory_db():
+            conn.inc_thread_sharing()
+            connections_override[conn.alias] = conn
+
+    server = ServerThread('localhost', _StaticFilesHandler,
+                          connections_override=connections_override)
+    server.daemon = True
+    server.start()
+    server.is_ready.wait()
+    if server.error:
+        raise server.error
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('inprocess', 'http'),
+                        default='inprocess')
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplies the court districts of each state')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='measured requests per endpoint')
+    parser.add_argument('--token-requests', type=int, default=50,
+                        help='measured requests to the token endpoint, '
+                             'which hashes the password every time')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='clear the geo cache before every request')
+    parser.add_argument('--endpoint', action='append', choices=ENDPOINTS,
+                        help='only run these endpoints')
+    parser.add_argument('--output', help='write the results to this file')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ['localhost']
+    old_config = setup_databases(verbosity=0, interactive=False)
+    server = None
+    try:
+        start = time.perf_counter()
+        users = data.generate(args.users, scale=args.scale)
+        generated = time.perf_counter() - start
+        print('generated %d users in %.1fs' % (len(users), generated),
+              file=sys.stderr)
+
+        if args.mode == 'http':
+            server = start_server()
+            client = HTTPClient(server.host, server.port)
+        else:
+            client = InProcessClient()
+        sessions = authenticate(client, users)
+        calls = endpoint_calls(client, sessions, args.clear_cache)
+
+        results = {}
+        for name in args.endpoint or ENDPOINTS:
+            requests = args.token_requests if name == 'token' \
+                else args.requests
+            results[name] = run(calls[name], requests,
+                                concurrency=args.concurrency,
+                                warmup=min(args.warmup, requests),
+                                # the test client keeps the connections
+                                finish=connections.close_all)
+            print('%-26s %8.1f req/s  p50 %7.2fms  p95 %7.2fms  '
+                  'p99 %7.2fms  errors %d' % (
+                      name, results[name]['throughput'],
+                      results[name]['p50_ms'], results[name]['p95_ms'],
+                      results[name]['p99_ms'], results[name]['errors']),
+                  file=sys.stderr)
+        client.close()
+    finally:
+        if server is not None:
+            server.terminate()
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'mode': args.mode,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'users': args.users,
+            'states': len(data.STATES),
+            'canonical_court_districts': sum(
+                max(1, round(count * args.scale))
+                for initials, count in data.STATES),
+            'concurrency': args.concurrency,
+            'clear_cache': args.clear_cache,
+            'token_mode': settings.ACCOUNT_TOKEN_MODE,
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
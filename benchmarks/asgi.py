@@ -0,0 +1,201 @@
+"""Slow clients against the threaded WSGI server and the ASGI adapter
+
+    python -m benchmarks.asgi [--connections 500] [--hold 2]
+
+Both servers run in a child process on a throwaway test database. The
+clients open --connections connections at once and send everything but
+the end of the request headers, like slow clients on a bad network. With
+every connection open the memory and threads of the server are sampled,
+then all the requests are completed and timed. The WSGI server is the one
+of runserver, a thread per connection; the ASGI one is uvicorn running
+app.asgi. Needs Linux (/proc) and uvicorn.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.test.utils import setup_databases, setup_test_environment, \
+    teardown_databases, teardown_test_environment  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from benchmarks import data  # noqa: E402
+from benchmarks.measure import percentile  # noqa: E402
+
+
+def serve(kind, port, database):
+    """Run a server on the benchmark database, in the child process"""
+    settings.DATABASES['default']['NAME'] = database
+    settings.ALLOWED_HOSTS = ['localhost', '127.0.0.1']
+    if kind == 'asgi':
+        import uvicorn
+        from app.asgi import application
+        uvicorn.run(application, host='127.0.0.1', port=port,
+                    log_level='warning')
+    else:
+        from django.core.servers.basehttp import WSGIServer, \
+            WSGIRequestHandler, run
+        from app.wsgi import application
+        WSGIRequestHandler.log_message = lambda *args: None
+        run('127.0.0.1', port, application, threading=True,
+            server_cls=WSGIServer)
+
+
+def process_status(pid):
+    """Return the resident memory in KiB and the threads of a process"""
+    status = {}
+    with open('/proc/%d/status' % pid) as status_file:
+        for line in status_file:
+            name, value = line.split(':', 1)
+            status[name] = value.strip()
+
+    return int(status['VmRSS'].split()[0]), int(status['Threads'])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return
+        except OSError:
+            time.sleep(.1)
+    raise RuntimeError('The server did not start on port %d' % port)
+
+
+async def slow_clients(port, count, hold, head, pid):
+    """Open count half-sent requests, sample the server, then finish them"""
+    opened = await asyncio.gather(*(
+        asyncio.open_connection('127.0.0.1', port) for i in range(count)))
+    for reader, writer in opened:
+        writer.write(head)
+    await asyncio.gather(*(writer.drain() for reader, writer in opened))
+    await asyncio.sleep(hold)
+    held = process_status(pid)
+
+    async def finish(reader, writer):
+        start = time.perf_counter()
+        writer.write(b'\r\n')
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        status = int(response.split(b' ', 2)[1]) if response else 0
+
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    finished = await asyncio.gather(*(
+        finish(reader, writer) for reader, writer in opened))
+    elapsed = time.perf_counter() - start
+
+    return held, finished, elapsed
+
+
+def run_server(kind, database, args, head):
+    port = free_port()
+    child = subprocess.Popen([
+        sys.executable, '-m', 'benchmarks.asgi', '--serve', kind,
+        '--port', str(port), '--database', database,
+    ])
+    try:
+        wait_for(port)
+        idle = process_status(child.pid)
+        held, finished, elapsed = asyncio.run(slow_clients(
+            port, args.connections, args.hold, head, child.pid))
+    finally:
+        child.terminate()
+        child.wait()
+
+    latencies = sorted(latency for latency, status in finished)
+    errors = sum(1 for latency, status in finished if status != 200)
+
+    return {
+        'idle_rss_kib': idle[0],
+        'idle_threads': idle[1],
+        'held_rss_kib': held[0],
+        'held_threads': held[1],
+        'rss_per_connection_kib': round(
+            (held[0] - idle[0]) / args.connections, 1),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(finished) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, .5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, .99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--hold', type=float, default=2,
+                        help='seconds the requests are left half sent')
+    parser.add_argument('--output')
+    parser.add_argument('--serve', choices=('wsgi', 'asgi'),
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.database)
+        return
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        user = data.generate(1, scale=.05)[0]
+        token = Token.objects.create(user=user)
+        database = settings.DATABASES['default']['NAME']
+        head = ('GET /api/geo/states/ HTTP/1.1\r\n'
+                'Host: localhost\r\n'
+                'Connection: close\r\n'
+                'Authorization: Token %s\r\n' % token.key).encode()
+        results = {kind: run_server(kind, database, args, head)
+                   for kind in ('wsgi', 'asgi')}
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+    for kind, result in results.items():
+        print('%s  %4d threads  %7.1f KiB/connection  %7.1f req/s  '
+              'p50 %8.2fms  p99 %8.2fms  errors %d' % (
+                  kind, result['held_threads'],
+                  result['rss_per_connection_kib'], result['throughput'],
+                  result['p50_ms'], result['p99_ms'], result['errors']),
+              file=sys.stderr)
+    report = json.dumps({
+        'meta': {
+            'connections': args.connections,
+            'hold': args.hold,
+            'asgi_threads': settings.ASGI_THREADS,
+        },
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Measure the autocomplete prefix index without a database
+
+    python -m benchmarks.autocomplete [--entries 5000] [--lookups 100000]
+
+Builds one synthetic partition (the largest Brazilian state has under 900
+court districts, so the default is generous), then reports the memory it
+takes and the latency of the lookups for prefixes of 1 to 4 letters.
+"""
+import argparse
+import os
+import random
+import string
+import time
+import tracemalloc
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from geo.autocomplete import Partition, PrefixIndex  # noqa: E402
+from geo.search import normalize  # noqa: E402
+
+
+def random_name(rng):
+    words = rng.randint(1, 4)
+
+    return ' '.join(
+        ''.join(rng.choice(string.ascii_lowercase)
+                for i in range(rng.randint(3, 10))).capitalize()
+        for i in range(words))
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = [random_name(rng) for i in range(args.entries)]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    index = PrefixIndex(max_entries=args.entries)
+    entries = sorted((normalize(name), name, pk)
+                     for pk, name in enumerate(names, 1))
+    index._partitions[(1, 1)] = Partition(0, entries)
+    index._size = len(entries)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    prefixes = [normalize(rng.choice(names))[:rng.randint(1, 4)]
+                for i in range(args.lookups)]
+    timings = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index._match(entries, prefix, args.limit)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    print('entries        %d' % len(entries))
+    print('memory         %.1f KiB (%d bytes/entry)' % (
+        used / 1024, used / len(entries)))
+    for label, fraction in (('p50', .5), ('p95', .95), ('p99', .99)):
+        print('lookup %s     %.2f us' % (
+            label, percentile(timings, fraction) * 1e6))
+    print('lookups/s      %d' % (len(timings) / sum(timings)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Compare two benchmark result files
+
+    python -m benchmarks.compare base.json new.json [--threshold 0.1]
+
+Prints the change of each figure and exits with 1 when the p95 or p99
+latency grew, or the throughput dropped, by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+# figure and whether a higher value is better
+FIGURES = (
+    ('throughput', True),
+    ('p50_ms', False),
+    ('p95_ms', False),
+    ('p99_ms', False),
+)
+# figures that fail the comparison when they regress
+CHECKED = ('throughput', 'p95_ms', 'p99_ms')
+
+
+def compare(base, new, threshold):
+    """Return the printed lines and the regressions between two reports"""
+    lines = []
+    regressions = []
+    for endpoint, figures in new['results'].items():
+        previous = base['results'].get(endpoint)
+        if previous is None:
+            lines.append('%-26s new' % endpoint)
+            continue
+        for figure, higher_is_better in FIGURES:
+            before, after = previous.get(figure), figures.get(figure)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > threshold:
+                flag = '  REGRESSION'
+                if figure in CHECKED:
+                    regressions.append((endpoint, figure, change))
+            lines.append('%-26s %-10s %10.2f -> %10.2f  %+6.1f%%%s' % (
+                endpoint, figure, before, after, change * 100, flag))
+
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='tolerated relative change, 0.1 is 10%%')
+    args = parser.parse_args()
+
+    with open(args.base) as base_file, open(args.new) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    for report in (base, new):
+        print('%(commit)s %(mode)s %(database)s users=%(users)s '
+              'concurrency=%(concurrency)s' % report['meta'])
+
+    for key in ('mode', 'database', 'users', 'concurrency', 'clear_cache',
+                'token_mode'):
+        if base['meta'].get(key) != new['meta'].get(key):
+            print('warning: the runs differ in %s' % key)
+
+    lines, regressions = compare(base, new, args.threshold)
+    print('\n'.join(lines))
+    if regressions:
+        print('%d regression(s) over %.0f%%' % (
+            len(regressions), args.threshold * 100))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""CPU time and bytes sent per request of the geo lists, compressed or not
+
+    python -m benchmarks.compression [--page-size 1000] [--requests 200]
+
+Loads one user in the test database and requests the same court district
+page over and over, as repeated reads are served from the response cache:
+
+- identity: no Accept-Encoding, what every client got before
+- gzip on every request: identity plus compressing the body each time, as
+  django.middleware.gzip.GZipMiddleware would
+- gzip, br: the bodies compressed once and cached
+
+and reports the process CPU time and the body size per request. The cost of
+the first request of a version, which compresses the body, is reported
+apart.
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.test.utils import setup_databases, setup_test_environment, \
+    teardown_databases, teardown_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils.text import compress_string  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from benchmarks import data  # noqa: E402
+from geo import compression  # noqa: E402
+
+
+def variants():
+    """Yield the name, Accept-Encoding and whether to compress per request
+    """
+    yield 'identity', '', False
+    yield 'gzip on every request', '', True
+    yield 'gzip, cached', 'gzip', False
+    if compression.brotli is not None:
+        yield 'br, cached', 'br', False
+
+
+def measure(client, url, accept_encoding, per_request, requests):
+    """Return the CPU ms per request and the bytes of the body"""
+    extra = {'HTTP_ACCEPT_ENCODING': accept_encoding} \
+        if accept_encoding else {}
+    size = 0
+    start = time.process_time()
+    for number in range(requests):
+        content = client.get(url, **extra).content
+        if per_request:
+            content = compress_string(content)
+        size = len(content)
+
+    return (time.process_time() - start) * 1000 / requests, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        user, = data.generate(1)
+        settings.API_MAX_PAGE_SIZE = max(settings.API_MAX_PAGE_SIZE,
+                                         args.page_size)
+        client = APIClient()
+        client.force_authenticate(user)
+        url = '%s?page_size=%d' % (reverse('geo:courtdistrict-list'),
+                                   args.page_size)
+
+        baseline = None
+        for name, accept_encoding, per_request in variants():
+            caches['geo'].clear()
+            first, size = measure(client, url, accept_encoding,
+                                  per_request, 1)
+            cpu, size = measure(client, url, accept_encoding, per_request,
+                                args.requests)
+            baseline = baseline or size
+            print('%-22s %7.3f ms CPU/request  %8d bytes (%5.1f%%)  '
+                  'first request %7.2f ms' % (
+                      name, cpu, size, size * 100 / baseline, first),
+                  file=sys.stderr)
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
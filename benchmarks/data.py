@@ -0,0 +1,99 @@
+"""Synthetic geo data shaped like the real one
+
+The canonical data has the 27 Brazilian states and about 5,570 court
+districts (one per municipality) spread over them as unevenly as the real
+ones. Every user sees it, with overrides of a few of its court districts.
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from geo.models import CourtDistrict, State
+from geo.search import normalize
+from geo.versions import bump_version
+
+PASSWORD = 'benchmark'
+
+# initials and number of municipalities of each state
+STATES = (
+    ('AC', 22), ('AL', 102), ('AP', 16), ('AM', 62), ('BA', 417),
+    ('CE', 184), ('DF', 1), ('ES', 78), ('GO', 246), ('MA', 217),
+    ('MT', 141), ('MS', 79), ('MG', 853), ('PA', 144), ('PB', 223),
+    ('PR', 399), ('PE', 185), ('PI', 224), ('RJ', 92), ('RN', 167),
+    ('RS', 497), ('RO', 52), ('RR', 15), ('SC', 295), ('SP', 645),
+    ('SE', 75), ('TO', 139),
+)
+COURT_DISTRICTS = sum(count for initials, count in STATES)
+
+SYLLABLES = ('ba', 'be', 'ca', 'ço', 'da', 'di', 'fé', 'ga', 'i', 'ja', 'jo',
+             'la', 'lân', 'ma', 'mi', 'na', 'nó', 'pa', 'po', 'ra', 'ri',
+             'sa', 'são', 'ta', 'tu', 'u', 'va', 'xi')
+PREFIXES = ('', '', '', 'São ', 'Santa ', 'Nova ', 'Porto ', 'Campo ')
+
+
+def user_email(number):
+    return 'bench%d@benchmark.test' % number
+
+
+def court_district_name(rng):
+    """Return a random municipality-like name"""
+    word = ''.join(rng.choice(SYLLABLES) for i in range(rng.randint(2, 4)))
+
+    return rng.choice(PREFIXES) + word.capitalize()
+
+
+def generate_canonical(rng, scale):
+    """Create the canonical states and court districts"""
+    State.objects.bulk_create(
+        State(name='State %s' % initials, initials=initials)
+        for initials, count in STATES)
+    states = dict(State.objects.filter(user__isnull=True)
+                  .values_list('initials', 'id'))
+
+    court_districts = []
+    for initials, count in STATES:
+        for position in range(max(1, round(count * scale))):
+            # names are unique across states
+            name = '%s %s-%d' % (court_district_name(rng), initials,
+                                 position)
+            court_districts.append(CourtDistrict(
+                state_id=states[initials], name=name,
+                search_name=normalize(name)))
+    CourtDistrict.objects.bulk_create(court_districts, batch_size=1000)
+    bump_version(None)
+
+
+def generate(users, scale=1.0, seed=0, overrides=.01):
+    """Create users and the canonical data they see
+
+    scale multiplies the number of court districts of each state; the
+    canonical data is only created once. Each user overrides the given
+    fraction of the canonical court districts. Returns the users; all of
+    them have PASSWORD as password.
+    """
+    rng = random.Random(seed)
+    if not State.objects.filter(user__isnull=True).exists():
+        with transaction.atomic():
+            generate_canonical(rng, scale)
+    canonical = list(CourtDistrict.objects.filter(user__isnull=True)
+                     .values_list('id', 'state_id', 'name'))
+
+    created = []
+    for number in range(users):
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                user_email(number), PASSWORD)
+            court_districts = []
+            for pk, state_id, name in rng.sample(
+                    canonical, round(len(canonical) * overrides)):
+                name = '%s (%d)' % (name, number)
+                court_districts.append(CourtDistrict(
+                    user=user, canonical_id=pk, state_id=state_id,
+                    name=name, search_name=normalize(name)))
+            CourtDistrict.objects.bulk_create(court_districts,
+                                              batch_size=1000)
+            bump_version(user.id)
+        created.append(user)
+
+    return created
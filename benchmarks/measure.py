@@ -0,0 +1,73 @@
+"""Timing of repeated requests and their latency percentiles"""
+import math
+import threading
+import time
+
+
+def percentile(ordered, fraction):
+    """Return the nearest-rank percentile of sorted values"""
+    if not ordered:
+        return None
+
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(latencies, errors, elapsed):
+    """Return the throughput and latency figures of a run, in ms"""
+    ordered = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, .50)),
+        'p95_ms': ms(percentile(ordered, .95)),
+        'p99_ms': ms(percentile(ordered, .99)),
+        'max_ms': ms(ordered[-1]) if ordered else None,
+    }
+
+
+def run(call, requests, concurrency=1, warmup=0, finish=None):
+    """Call call(number) requests times over concurrency threads
+
+    call returns the HTTP status; 4xx and 5xx are counted as errors. The
+    warmup calls aren't measured. finish() is called by each thread once
+    it's done, to release what it holds.
+    """
+    for number in range(warmup):
+        call(number)
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    numbers = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                number = next(numbers, None)
+            if number is None:
+                if finish is not None:
+                    finish()
+                return
+            start = time.perf_counter()
+            status = call(number)
+            latency = time.perf_counter() - start
+            with lock:
+                latencies.append(latency)
+                if status >= 400:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return summarize(latencies, errors[0], time.perf_counter() - start)
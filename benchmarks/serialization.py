@@ -0,0 +1,95 @@
+"""Latency of a large court district list with and without the serializer
+
+    python -m benchmarks.serialization [--rows 10000] [--requests 20]
+
+Loads one user with about --rows court districts in the test database and
+requests all of them in a single page, with the response cache cleared
+before every request, through the serializer, the fast list with the json
+module and the fast list with orjson (when installed). The bodies of the
+three must be the same.
+"""
+import argparse
+import os
+import sys
+from unittest import mock
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.test.utils import setup_databases, setup_test_environment, \
+    teardown_databases, teardown_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from benchmarks import data  # noqa: E402
+from benchmarks.measure import run  # noqa: E402
+from geo import fastlist  # noqa: E402
+from geo.views import CourtDistrictViewSet  # noqa: E402
+
+
+def variants():
+    """Yield the name and the patches of each way of listing"""
+    yield 'serializer', [
+        mock.patch.object(CourtDistrictViewSet, 'fast_list_fields', ())]
+    yield 'fast list, json', [mock.patch.object(fastlist, 'orjson', None)]
+    if fastlist.orjson is not None:
+        yield 'fast list, orjson', []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        user, = data.generate(1, scale=args.rows / data.COURT_DISTRICTS)
+        settings.API_MAX_PAGE_SIZE = args.rows * 2
+        client = APIClient()
+        client.force_authenticate(user)
+        url = '%s?page_size=%d' % (reverse('geo:courtdistrict-list'),
+                                   args.rows * 2)
+        bodies = {}
+
+        def call(number):
+            caches['geo'].clear()
+            response = client.get(url)
+            bodies[name] = response.content
+            return response.status_code
+
+        baseline = None
+        for name, patches in variants():
+            for patch in patches:
+                patch.start()
+            try:
+                result = run(call, args.requests, warmup=args.warmup,
+                             finish=connections.close_all)
+            finally:
+                for patch in patches:
+                    patch.stop()
+            baseline = baseline or result['p50_ms']
+            print('%-18s p50 %8.2fms  p95 %8.2fms  %5.1fx' % (
+                name, result['p50_ms'], result['p95_ms'],
+                baseline / result['p50_ms']), file=sys.stderr)
+
+        rows = bodies['serializer'].count(b'"state":')
+        print('%d rows, %d bytes, identical bodies: %s' % (
+            rows, len(bodies['serializer']),
+            len(set(bodies.values())) == 1), file=sys.stderr)
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
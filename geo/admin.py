@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import CourtDistrict, State
+from .search import normalize
 
 
 @admin.register(CourtDistrict)
@@ -8,7 +9,15 @@ class CourtDistrictAdmin(admin.ModelAdmin):
     ordering = ('state', 'name')
     list_filter = ['state__name']
     list_display = ['name', 'state']
-    search_fields = ['name', 'state__name']
+    search_fields = ['search_name']
+
+    def get_search_results(self, request, queryset, search_term):
+        """Accent-insensitive search served by the trigram index"""
+        term = normalize(search_term)
+        if not term:
+            return queryset, False
+
+        return queryset.filter(search_name__contains=term), False
 
 
 @admin.register(State)
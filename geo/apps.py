@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class GeoConfig(AppConfig):
     name = 'geo'
+
+    def ready(self):
+        # registers the signal receivers and the cache metrics
+        from geo import caching, signals  # noqa: F401
@@ -0,0 +1,200 @@
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from heapq import merge
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from geo.models import CourtDistrict
+from geo.versions import get_version
+
+# what a partition costs besides its entries, in entries: the partition,
+# its lists and its slot in the index take about as much as three
+PARTITION_OVERHEAD = 3
+
+
+class Partition:
+    """Sorted (search_name, name, id) entries of one user and state
+
+    The partitions of the canonical data (user None) are shared by every
+    user. The one of a user holds its custom court districts and overrides,
+    and excluded, the ids of the canonical ones it overrides or hides.
+    """
+    __slots__ = ('version', 'entries', 'excluded')
+
+    def __init__(self, version, entries, excluded=frozenset()):
+        self.version = version
+        self.entries = entries
+        self.excluded = excluded
+
+
+class PrefixIndex:
+    """In-process prefix index over the normalized court district names
+
+    Entries are kept in sorted lists, one per (user, state), and looked up
+    with bisect, so a warm lookup costs microseconds and no query: the only
+    check is the version of the geo data, read from the geo cache. A search
+    merges the canonical partition of the state, shared by every user, with
+    the one of the user.
+
+    A partition is loaded with one query the first time it is used. Saves and
+    deletes in this process patch the partitions in place (see
+    geo.signals); a version that moved on because of another process, a bulk
+    load or an evicted partition simply triggers a reload.
+
+    max_entries bounds the memory: the least recently used partitions are
+    dropped once the total number of entries, plus PARTITION_OVERHEAD per
+    partition, goes over it; empty partitions aren't free. An entry takes
+    about 200 bytes, names included.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._partitions = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def search(self, user_id, state_id, prefix, limit):
+        """Return up to limit (id, name) whose normalized name starts with
+        prefix, in alphabetical order"""
+        canonical = self._partition(None, state_id)
+        own = self._partition(user_id, state_id)
+
+        # enough canonical matches to make up for the excluded ones
+        shared = (entry for entry in self._match(
+            canonical.entries, prefix, limit + len(own.excluded))
+            if entry[2] not in own.excluded)
+        entries = merge(shared, self._match(own.entries, prefix, limit))
+
+        return [(pk, name) for search_name, name, pk in islice(entries, limit)]
+
+    def changed(self, user_id, version, court_district=None, deleted=False,
+                override=False):
+        """Move the partitions of a user to the version of a committed change
+
+        user_id None is the canonical data. Only partitions that were current
+        right before the change are moved; older ones are left alone and get
+        reloaded on their next search. court_district is the (id, state_id,
+        search_name, name) of the saved or deleted court district, if that's
+        what changed. The partitions of a user whose override changed are
+        reloaded as well.
+        """
+        with self._lock:
+            for (owner_id, state_id), partition in \
+                    list(self._partitions.items()):
+                if owner_id != user_id or partition.version != version - 1:
+                    continue
+                if override:
+                    del self._partitions[(owner_id, state_id)]
+                    self._size -= self._cost(partition)
+                    continue
+                if court_district is not None:
+                    self._patch(partition.entries, state_id, court_district,
+                                deleted)
+                partition.version = version
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'partitions': len(self._partitions),
+                'entries': self._size -
+                len(self._partitions) * PARTITION_OVERHEAD,
+                'max_entries': self.max_entries,
+            }
+
+    def loaded(self, user_id, state_id):
+        """Return whether the partition of the user and state is current
+
+        It was loaded for a state visible to the user, which the data didn't
+        change since.
+        """
+        partition = self._partitions.get((user_id, state_id))
+
+        return partition is not None and \
+            partition.version == get_version(user_id)
+
+    def _partition(self, user_id, state_id):
+        version = get_version(user_id)
+        key = (user_id, state_id)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is not None and partition.version == version:
+                self._partitions.move_to_end(key)
+                return partition
+
+        return self._load(user_id, state_id, version)
+
+    def _load(self, user_id, state_id, version):
+        entries = []
+        excluded = set()
+        rows = CourtDistrict.objects.filter(user_id=user_id)
+        if user_id is None:
+            rows = rows.filter(state_id=state_id)
+        else:
+            # the overrides may have moved their court district elsewhere
+            rows = rows.filter(Q(state_id=state_id) |
+                               Q(canonical__state_id=state_id))
+        for search_name, name, pk, row_state_id, hidden, canonical_id in \
+                rows.values_list('search_name', 'name', 'id', 'state_id',
+                                 'hidden', 'canonical_id'):
+            if canonical_id is not None:
+                excluded.add(canonical_id)
+            if row_state_id == state_id and not hidden:
+                entries.append((search_name, name, pk))
+        entries.sort()
+        partition = Partition(version, entries, frozenset(excluded))
+
+        with self._lock:
+            old = self._partitions.pop((user_id, state_id), None)
+            if old is not None:
+                self._size -= self._cost(old)
+            self._partitions[(user_id, state_id)] = partition
+            self._size += self._cost(partition)
+            self._evict()
+
+        return partition
+
+    def _patch(self, entries, state_id, court_district, deleted):
+        pk, new_state_id, search_name, name = court_district
+        # the name or the state may have changed, drop the old entry first
+        for position, entry in enumerate(entries):
+            if entry[2] == pk:
+                del entries[position]
+                self._size -= 1
+                break
+        if not deleted and state_id == new_state_id:
+            insort(entries, (search_name, name, pk))
+            self._size += 1
+
+    def _evict(self):
+        # never drop the partition that was just used
+        while self._size > self.max_entries and len(self._partitions) > 1:
+            key, partition = self._partitions.popitem(last=False)
+            self._size -= self._cost(partition)
+
+    @staticmethod
+    def _cost(partition):
+        return len(partition.entries) + PARTITION_OVERHEAD
+
+    @staticmethod
+    def _match(entries, prefix, limit):
+        """Return up to limit entries starting with prefix"""
+        matches = []
+        position = bisect_left(entries, (prefix,))
+        for entry in entries[position:position + limit]:
+            if not entry[0].startswith(prefix):
+                break
+            matches.append(entry)
+
+        return matches
+
+
+prefix_index = PrefixIndex(max_entries=settings.GEO_AUTOCOMPLETE_MAX_ENTRIES)
@@ -0,0 +1,155 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+
+from app import metrics
+from geo.compression import compress, negotiate
+from geo.versions import get_versions
+
+
+class ResponseCache:
+    """Thin wrapper over a Django cache that counts hits and misses
+
+    Eviction is left to the backend: LocMemCache drops the least recently
+    used entries once MAX_ENTRIES is reached, memcached does the same.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        value = self.cache.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+    def set(self, key, value):
+        self.cache.set(key, value)
+
+    def stats(self):
+        """Return the hit and miss counters of this process"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+        }
+
+
+response_cache = ResponseCache('geo')
+
+
+@metrics.register
+def response_cache_metrics():
+    stats = response_cache.stats()
+
+    return [
+        ('geo_response_cache_requests_total', (('result', 'hit'),),
+         stats['hits']),
+        ('geo_response_cache_requests_total', (('result', 'miss'),),
+         stats['misses']),
+    ]
+
+
+class CachedResponse(Exception):
+    """Raised to short-circuit a view with a response from the cache"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class CachedResponseMixin:
+    """Serves repeated reads of a geo viewset from the response cache
+
+    Rendered bodies are cached per user, versions of the canonical and of
+    the user's geo data, URL (so every query parameter, the cursor
+    included), negotiated media type and content coding. Any change bumps a
+    version (see geo.signals), which makes the older entries unreachable
+    right away; the backend evicts them later.
+
+    Bodies of at least GEO_COMPRESS_MIN_SIZE bytes are compressed with the
+    coding negotiated from Accept-Encoding (see geo.compression) before
+    being cached, so a body is compressed once per version and coding.
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def get_response_cache_key(self, request):
+        """Return the cache key of the current representation"""
+        digest = hashlib.sha1(('%s|%s|%s|%s' % (
+            self.action,
+            request.get_full_path(),
+            request.accepted_media_type,
+            self.content_coding,
+        )).encode('utf-8')).hexdigest()
+
+        return 'geo:response:%s:%d.%d:%s' % (
+            request.user.pk, *get_versions(request.user.pk), digest)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        self.response_cache_key = None
+        if request.method != 'GET' or \
+                self.action not in self.cached_actions:
+            return
+
+        self.content_coding = negotiate(request)
+        self.response_cache_key = self.get_response_cache_key(request)
+        cached = response_cache.get(self.response_cache_key)
+        if cached is not None:
+            self.response_cache_key = None
+            content, content_type, content_coding = cached
+            response = HttpResponse(content, content_type=content_type)
+            if content_coding:
+                response['Content-Encoding'] = content_coding
+            raise CachedResponse(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, CachedResponse):
+            return exc.response
+
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+
+        key = getattr(self, 'response_cache_key', None)
+        if key and response.status_code == status.HTTP_200_OK and \
+                not response.streaming:
+            if hasattr(response, 'render'):
+                response.render()
+            content_coding = None
+            if self.content_coding and \
+                    len(response.content) >= settings.GEO_COMPRESS_MIN_SIZE:
+                content_coding = self.content_coding
+                response.content = compress(response.content, content_coding)
+                response['Content-Encoding'] = content_coding
+            response_cache.set(key, (response.content,
+                                     response['Content-Type'],
+                                     content_coding))
+
+        if request.method == 'GET' and self.action in self.cached_actions:
+            patch_vary_headers(response, ('Accept-Encoding',))
+
+        return response
@@ -0,0 +1,57 @@
+import gzip
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encodings(header):
+    """Return {coding: q} for an Accept-Encoding header"""
+    encodings = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        encodings[coding.lower()] = q
+
+    return encodings
+
+
+def negotiate(request):
+    """Return the content coding to answer request with, None for identity
+
+    Prefers br (when brotli is installed) over gzip at equal weight.
+    """
+    encodings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING',
+                                                    ''))
+    wildcard = encodings.get('*', 0.0)
+    best, best_q = None, 0.0
+    for coding in ('gzip', 'br'):
+        if coding == 'br' and brotli is None:
+            continue
+        q = encodings.get(coding, wildcard)
+        if q > 0 and q >= best_q:
+            best, best_q = coding, q
+
+    return best
+
+
+def compress(content, coding):
+    """Return content compressed with coding, 'gzip' or 'br'"""
+    if coding == 'br':
+        return brotli.compress(content, quality=settings.GEO_BROTLI_QUALITY)
+
+    # mtime=0 so the same content always gives the same bytes
+    return gzip.compress(content, compresslevel=settings.GEO_GZIP_LEVEL,
+                         mtime=0)
@@ -0,0 +1,71 @@
+import hashlib
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from geo.compression import negotiate
+from geo.versions import get_versions
+
+
+class NotModified(Exception):
+    """Raised when the client already has the current representation"""
+
+
+class ConditionalGetMixin:
+    """Adds strong ETags and If-None-Match handling to a geo viewset
+
+    The ETag is derived from the versions of the canonical and of the user's
+    geo data (see geo.versions), the full URL, the negotiated media type and
+    content coding. When it matches If-None-Match the view answers 304 right
+    after authentication, with two lookups of versions and without querying
+    the geo tables or running the serializer.
+    """
+    conditional_actions = ('list', 'retrieve')
+
+    def get_etag(self, request):
+        """Return the ETag of the current representation"""
+        key = '%s:%d.%d:%s:%s:%s' % (
+            request.user.pk,
+            *get_versions(request.user.pk),
+            request.get_full_path(),
+            request.accepted_media_type,
+            negotiate(request),
+        )
+
+        return '"%s"' % hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        self.etag = None
+        if request.method not in ('GET', 'HEAD') or \
+                self.action not in self.conditional_actions:
+            return
+
+        self.etag = self.get_etag(request)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or self.etag in etags:
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+
+        etag = getattr(self, 'etag', None)
+        if etag and response.status_code in (status.HTTP_200_OK,
+                                             status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Accept', 'Accept-Encoding',
+                                          'Authorization'))
+
+        return response
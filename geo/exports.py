@@ -0,0 +1,114 @@
+import csv
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer
+
+
+class Echo:
+    """File-like object that hands back what is written to it
+
+    Lets csv.writer format a single row without buffering the whole file.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    """Yield the header and the rows of a CSV file"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(columns, rows):
+    """Yield one JSON object per line"""
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def chunked(lines, size):
+    """Join lines into blocks so the server doesn't write them one by one"""
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= size:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+class CSVRenderer(BaseRenderer):
+    """Negotiates text/csv for the export actions
+
+    The rows are streamed by the view, this only renders error responses.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+
+        return ''.join(csv_lines(['detail'], [[data]])).encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Negotiates application/x-ndjson for the export actions"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode(
+            self.charset)
+
+
+class ExportMixin:
+    """Adds a streaming export action to a geo viewset
+
+    export_fields maps the exported column names to model fields. The rows
+    are read with a server-side cursor and written as they arrive, so memory
+    stays flat whatever the size of the dataset.
+    """
+    export_fields = ()
+    # lines per chunk written to the client
+    export_block_size = 500
+
+    @action(detail=False, methods=['get'],
+            renderer_classes=(CSVRenderer, NDJSONRenderer))
+    def export(self, request):
+        """Stream every row the user can see as CSV or NDJSON
+
+        Pick the format with ?format=csv|ndjson or the Accept header.
+        """
+        columns = [column for column, field in self.export_fields]
+        fields = [field for column, field in self.export_fields]
+        rows = self.filter_queryset(self.get_queryset()) \
+            .order_by('name', 'id') \
+            .values_list(*fields) \
+            .iterator(chunk_size=settings.GEO_EXPORT_CHUNK_SIZE)
+
+        renderer = request.accepted_renderer
+        if renderer.format == 'ndjson':
+            lines = ndjson_lines(columns, rows)
+        else:
+            lines = csv_lines(columns, rows)
+
+        response = StreamingHttpResponse(
+            chunked(lines, self.export_block_size),
+            content_type='%s; charset=utf-8' % renderer.media_type)
+        response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (
+            self.basename, renderer.format)
+
+        return response
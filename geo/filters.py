@@ -0,0 +1,91 @@
+import re
+
+from django.conf import settings
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from geo.search import normalize
+
+# largest value of the integer primary keys
+MAX_ID = 2 ** 31 - 1
+
+INITIALS = re.compile(r'^[A-Z]{2}$')
+
+
+def parse_id(value, param):
+    """Return value as a primary key, 400 if it can't be one"""
+    try:
+        pk = int(value)
+    except (TypeError, ValueError):
+        pk = None
+    if pk is None or not 0 < pk <= MAX_ID:
+        raise ValidationError({param: [
+            _('"%(value)s" is not a valid id.') % {'value': value}]})
+
+    return pk
+
+
+def parse_list(value, param, parse):
+    """Split a comma separated list and parse its items
+
+    Blank items and repeated ones are dropped. At most GEO_FILTER_MAX_VALUES
+    items are accepted.
+    """
+    items = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        item = parse(item, param)
+        if item not in items:
+            items.append(item)
+    if len(items) > settings.GEO_FILTER_MAX_VALUES:
+        raise ValidationError({param: [
+            _('At most %(max)d values are accepted.')
+            % {'max': settings.GEO_FILTER_MAX_VALUES}]})
+
+    return items
+
+
+def parse_initials(value, param):
+    initials = value.upper()
+    if not INITIALS.match(initials):
+        raise ValidationError({param: [
+            _('"%(value)s" are not valid state initials.')
+            % {'value': value}]})
+
+    return initials
+
+
+class CourtDistrictFilter(BaseFilterBackend):
+    """Filters the court districts by state, state initials, ids and prefix
+
+    ?state=1,2 and ?ids=3,4 take lists of ids, ?state_initials=MG,SP a list
+    of initials and ?name_prefix= the start of the name, accents and case
+    ignored. The filters are combined, each is served by an index:
+    geo_court_state_name for the states, the primary key for the ids and
+    geo_court_search_prefix for the prefix.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        states = parse_list(params.get('state', ''), 'state', parse_id)
+        if states:
+            queryset = queryset.filter(state_id__in=states)
+
+        initials = parse_list(params.get('state_initials', ''),
+                              'state_initials', parse_initials)
+        if initials:
+            queryset = queryset.filter(state__initials__in=initials)
+
+        ids = parse_list(params.get('ids', ''), 'ids', parse_id)
+        if ids:
+            queryset = queryset.filter(id__in=ids)
+
+        prefix = normalize(params.get('name_prefix', ''))
+        if prefix:
+            queryset = queryset.filter(search_name__startswith=prefix)
+
+        return queryset
@@ -0,0 +1,141 @@
+import csv
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from geo.models import CourtDistrict, State
+from geo.search import normalize
+from geo.versions import bump_version
+
+
+class Command(BaseCommand):
+    """Bulk load states and court districts from a CSV file
+
+    The file is copied into a temporary staging table with COPY and merged
+    into the geo tables with two INSERT ... SELECT statements, so the cost
+    doesn't depend on saving one model at a time. Rows that already exist
+    are left untouched, which makes reseeding safe.
+
+    The rows are loaded for a user or, with --canonical, into the canonical
+    data shared by every user. A user only gets the states and court
+    districts the canonical data doesn't already have.
+
+    The CSV must have a header and the columns state, initials and
+    court_district (court_district may be empty to load just the state).
+    """
+    help = 'Bulk load states and court districts from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the CSV file')
+        owner = parser.add_mutually_exclusive_group()
+        owner.add_argument(
+            '--user',
+            help='Email of the user that will own the rows')
+        owner.add_argument(
+            '--canonical',
+            action='store_true',
+            help='Load the rows into the canonical data')
+
+    def handle(self, *args, **options):
+        # call_command doesn't handle required groups, check here instead
+        if not options['canonical'] and not options['user']:
+            raise CommandError('Either --user or --canonical is required.')
+        user_id = None
+        if not options['canonical']:
+            try:
+                user_id = get_user_model().objects \
+                    .values_list('id', flat=True) \
+                    .get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(
+                    'User "%s" does not exist.' % options['user'])
+
+        if connection.vendor != 'postgresql':
+            raise CommandError('load_geo requires PostgreSQL (it uses COPY).')
+
+        qn = connection.ops.quote_name
+        state_table = qn(State._meta.db_table)
+        district_table = qn(CourtDistrict._meta.db_table)
+
+        start = time.monotonic()
+        with open(options['csv_file'], encoding='utf-8', newline='') as \
+                csv_file, self.staged(csv_file) as staged, \
+                transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS geo_load')
+            cursor.execute(
+                'CREATE TEMPORARY TABLE geo_load ('
+                ' state varchar(255) NOT NULL,'
+                ' initials varchar(2) NOT NULL,'
+                ' court_district varchar(255),'
+                ' search_name varchar(255)'
+                ') ON COMMIT DROP')
+            cursor.copy_expert(
+                'COPY geo_load FROM STDIN WITH (FORMAT csv)', staged)
+            rows = cursor.rowcount
+
+            # user_id = NULL is never true, so with user_id None the
+            # conditions below only match the canonical rows
+            cursor.execute(
+                'INSERT INTO %s (name, initials, user_id)'
+                ' SELECT DISTINCT ON (state) state, initials,'
+                '  CAST(%%s AS integer)'
+                ' FROM geo_load l'
+                ' WHERE NOT EXISTS (SELECT 1 FROM %s c'
+                '  WHERE c.name = l.state AND c.user_id IS NULL)'
+                ' ORDER BY state'
+                ' ON CONFLICT DO NOTHING' % (state_table, state_table),
+                [user_id])
+            states = cursor.rowcount
+
+            cursor.execute(
+                'INSERT INTO %s'
+                ' (name, search_name, state_id, user_id, hidden)'
+                ' SELECT DISTINCT l.court_district, l.search_name, s.id,'
+                '  CAST(%%s AS integer), false'
+                ' FROM geo_load l'
+                ' JOIN %s s ON s.name = l.state'
+                '  AND (s.user_id = %%s OR s.user_id IS NULL)'
+                " WHERE coalesce(l.court_district, '') <> ''"
+                ' AND NOT EXISTS (SELECT 1 FROM %s c'
+                '  WHERE c.state_id = s.id AND c.name = l.court_district'
+                '  AND c.user_id IS NULL)'
+                ' ON CONFLICT DO NOTHING' % (
+                    district_table, state_table, district_table),
+                [user_id, user_id])
+            court_districts = cursor.rowcount
+
+            # the INSERTs skip the model signals
+            if states or court_districts:
+                bump_version(user_id)
+        elapsed = time.monotonic() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            'Loaded %d rows in %.2fs (%d rows/s): %d new states, '
+            '%d new court districts' % (
+                rows, elapsed, rows / elapsed if elapsed else rows,
+                states, court_districts)))
+
+    def staged(self, csv_file):
+        """Return a copy of the CSV rows with the normalized district name
+
+        The names are normalized here rather than in SQL so they match
+        geo.search.normalize exactly. Large files spill to disk.
+        """
+        staged = tempfile.SpooledTemporaryFile(
+            max_size=64 * 1024 * 1024, mode='w+', encoding='utf-8',
+            newline='')
+        reader = csv.reader(csv_file)
+        writer = csv.writer(staged)
+        next(reader, None)
+        for row in reader:
+            if len(row) != 3:
+                raise CommandError(
+                    'Line %d: expected state, initials and court_district.'
+                    % reader.line_num)
+            writer.writerow(row + [normalize(row[2])])
+        staged.seek(0)
+
+        return staged
@@ -0,0 +1,32 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from geo import snapshots
+
+
+class Command(BaseCommand):
+    """Publish a snapshot of the canonical states and court districts
+
+    Writes the content-hashed JSON file, its gzip and br copies and the
+    manifest to GEO_SNAPSHOT_DIR (see geo.snapshots). Run it after changing
+    the canonical data, e.g. after load_geo --canonical; publishing data
+    that didn't change only touches the manifest. Another --directory must
+    be served at GEO_SNAPSHOT_URL, Django only serves GEO_SNAPSHOT_DIR.
+    """
+    help = 'Publish a snapshot of the canonical geo data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            help='Write to this directory instead of GEO_SNAPSHOT_DIR, '
+                 'requires GEO_SNAPSHOT_URL')
+
+    def handle(self, *args, **options):
+        try:
+            manifest = snapshots.publish(options['directory'])
+        except ImproperlyConfigured as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Published %s (%d bytes, version %d)' % (
+                manifest['url'], manifest['size'], manifest['version'])))
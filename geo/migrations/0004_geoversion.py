@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('geo', '0003_auto_20191128_0158'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeoVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='geo_version', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
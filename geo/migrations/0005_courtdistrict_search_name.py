@@ -0,0 +1,43 @@
+import re
+import unicodedata
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def normalize(value):
+    """Copy of geo.search.normalize as of this migration"""
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+
+    return re.sub(r'[\W_]+', ' ', value.lower()).strip()
+
+
+def fill_search_name(apps, schema_editor):
+    CourtDistrict = apps.get_model('geo', 'CourtDistrict')
+    for court_district in CourtDistrict.objects.only('id', 'name').iterator():
+        CourtDistrict.objects.filter(id=court_district.id).update(
+            search_name=normalize(court_district.name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0004_geoversion'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='courtdistrict',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='courtdistrict',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='geo_court_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
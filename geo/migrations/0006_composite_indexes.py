@@ -0,0 +1,37 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0005_courtdistrict_search_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='courtdistrict',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='CourtDistrict'),
+        ),
+        migrations.AlterField(
+            model_name='state',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='State'),
+        ),
+        migrations.AddIndex(
+            model_name='courtdistrict',
+            index=models.Index(fields=['user', 'state', 'name', 'id'], name='geo_court_user_state_name'),
+        ),
+        migrations.AddIndex(
+            model_name='courtdistrict',
+            index=models.Index(fields=['user', 'name', 'id'], name='geo_court_user_name'),
+        ),
+        migrations.AddIndex(
+            model_name='state',
+            index=models.Index(fields=['user', 'name', 'id'], name='geo_state_user_name'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0006_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='courtdistrict',
+            index=models.Index(fields=['user', 'search_name'], name='geo_court_user_search_prefix', opclasses=['int4_ops', 'varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0007_court_district_prefix_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalGeoVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='courtdistrict',
+            name='geo_court_user_state_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='courtdistrict',
+            name='geo_court_user_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='courtdistrict',
+            name='geo_court_user_search_prefix',
+        ),
+        migrations.RemoveIndex(
+            model_name='state',
+            name='geo_state_user_name',
+        ),
+        migrations.AddField(
+            model_name='courtdistrict',
+            name='canonical',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='overrides', to='geo.CourtDistrict', verbose_name='Canonical court district'),
+        ),
+        migrations.AddField(
+            model_name='courtdistrict',
+            name='hidden',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='courtdistrict',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='courtdistrict',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='CourtDistrict'),
+        ),
+        migrations.AlterField(
+            model_name='state',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='state',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='State'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='courtdistrict',
+            unique_together=set(),
+        ),
+        migrations.AddIndex(
+            model_name='courtdistrict',
+            index=models.Index(fields=['state', 'name', 'id'], name='geo_court_state_name'),
+        ),
+        migrations.AddIndex(
+            model_name='courtdistrict',
+            index=models.Index(fields=['name', 'id'], name='geo_court_name'),
+        ),
+        migrations.AddIndex(
+            model_name='courtdistrict',
+            index=models.Index(fields=['search_name'], name='geo_court_search_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='state',
+            index=models.Index(fields=['name', 'id'], name='geo_state_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='courtdistrict',
+            constraint=models.UniqueConstraint(fields=('user', 'state', 'name'), name='geo_court_user_state_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='courtdistrict',
+            constraint=models.UniqueConstraint(condition=models.Q(user__isnull=True), fields=('state', 'name'), name='geo_court_canonical_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='courtdistrict',
+            constraint=models.UniqueConstraint(fields=('user', 'canonical'), name='geo_court_user_canonical_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='state',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='geo_state_user_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='state',
+            constraint=models.UniqueConstraint(condition=models.Q(user__isnull=True), fields=('name',), name='geo_state_canonical_name_uniq'),
+        ),
+    ]
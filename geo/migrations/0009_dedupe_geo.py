@@ -0,0 +1,129 @@
+from collections import Counter, defaultdict
+
+from django.core.cache import caches
+from django.db import migrations
+from django.db.models import F
+
+
+# rows deleted or updated per query
+BATCH_SIZE = 1000
+
+
+def most_common(names):
+    """Return the most common name, the first one seen on a tie"""
+    return Counter(names).most_common(1)[0][0]
+
+
+def batches(ids):
+    """Split ids in lists of at most BATCH_SIZE"""
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def dedupe(apps, schema_editor):
+    """Move the geo rows several users have a copy of to the canonical data
+
+    A state is the same for every user with the same initials, a court
+    district with the same state and normalized name. Rows only one user has
+    stay custom rows of that user. The copies of a promoted state are
+    deleted after their court districts are moved to the canonical state;
+    the copies of a promoted court district are deleted when they have its
+    name and kept as overrides of it otherwise.
+    """
+    State = apps.get_model('geo', 'State')
+    CourtDistrict = apps.get_model('geo', 'CourtDistrict')
+    CanonicalGeoVersion = apps.get_model('geo', 'CanonicalGeoVersion')
+    GeoVersion = apps.get_model('geo', 'GeoVersion')
+
+    changed_users = set()
+
+    copies = defaultdict(list)
+    for state in State.objects.filter(user__isnull=False).order_by('id'):
+        copies[state.initials.upper()].append(state)
+    canonical_states = {}
+    for initials, states in copies.items():
+        if len(set(state.user_id for state in states)) < 2:
+            continue
+        canonical = State.objects.create(
+            name=most_common(state.name for state in states),
+            initials=initials)
+        for state in states:
+            canonical_states[state.id] = canonical.id
+            changed_users.add(state.user_id)
+
+    taken = set()
+    duplicates = []
+    moved = defaultdict(list)
+    for pk, user_id, state_id, name in CourtDistrict.objects \
+            .filter(state_id__in=canonical_states) \
+            .order_by('id') \
+            .values_list('id', 'user_id', 'state_id', 'name') \
+            .iterator(chunk_size=BATCH_SIZE):
+        state_id = canonical_states[state_id]
+        key = (user_id, state_id, name)
+        if key in taken:
+            # the user had the court district in two copies of the state
+            duplicates.append(pk)
+            continue
+        taken.add(key)
+        moved[state_id].append(pk)
+    for ids in batches(duplicates):
+        CourtDistrict.objects.filter(id__in=ids).delete()
+    for state_id, court_district_ids in moved.items():
+        for ids in batches(court_district_ids):
+            CourtDistrict.objects.filter(id__in=ids).update(state_id=state_id)
+    State.objects.filter(id__in=canonical_states).delete()
+
+    copies = defaultdict(list)
+    for pk, user_id, state_id, search_name, name in CourtDistrict.objects \
+            .filter(user__isnull=False, state__user__isnull=True) \
+            .order_by('id') \
+            .values_list('id', 'user_id', 'state_id', 'search_name',
+                         'name') \
+            .iterator(chunk_size=BATCH_SIZE):
+        copies[(state_id, search_name)].append((pk, user_id, name))
+    deleted = []
+    overrides = defaultdict(list)
+    for (state_id, search_name), court_districts in copies.items():
+        if len(set(user_id for pk, user_id, name in court_districts)) < 2:
+            continue
+        # one per distinct court district, not per user
+        canonical = CourtDistrict.objects.create(
+            name=most_common(name for pk, user_id, name in court_districts),
+            search_name=search_name, state_id=state_id)
+        overriding = set()
+        for pk, user_id, name in court_districts:
+            changed_users.add(user_id)
+            if name == canonical.name:
+                deleted.append(pk)
+            elif user_id not in overriding:
+                overriding.add(user_id)
+                overrides[canonical.id].append(pk)
+    for ids in batches(deleted):
+        CourtDistrict.objects.filter(id__in=ids).delete()
+    for canonical_id, court_district_ids in overrides.items():
+        CourtDistrict.objects.filter(id__in=court_district_ids) \
+            .update(canonical_id=canonical_id)
+
+    if not changed_users:
+        return
+
+    # the ETags and cached responses of the users have to change
+    if not CanonicalGeoVersion.objects.filter(pk=1) \
+            .update(version=F('version') + 1):
+        CanonicalGeoVersion.objects.create(pk=1, version=1)
+    GeoVersion.objects.filter(user_id__in=changed_users) \
+        .update(version=F('version') + 1)
+    caches['geo'].clear()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0008_canonical_dataset'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe, migrations.RunPython.noop),
+    ]
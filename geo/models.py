@@ -1,33 +1,101 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models import Q
 from django.utils.translation import ugettext_lazy as _
 
+from geo.search import normalize
+
+
+class StateQuerySet(models.QuerySet):
+
+    def visible_to(self, user):
+        """Filter the canonical states and the custom ones of user"""
+        return self.filter(Q(user=user) | Q(user__isnull=True))
+
 
 class State(models.Model):
-    """State from the court district"""
-    name = models.CharField(max_length=255, null=False, blank=False, unique=True)
+    """State from the court district
+
+    States without a user are canonical, shared by every user; the others
+    are custom states of their user. Canonical states can't be overridden.
+    """
+    name = models.CharField(max_length=255, null=False, blank=False)
     initials = models.CharField(max_length=2, null=False, blank=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
-        null=False,
-        blank=False,
+        null=True,
+        blank=True,
+        # covered by the (user, name) constraint
+        db_index=False,
         verbose_name=_('State'))
 
+    objects = StateQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'],
+                                    name='geo_state_user_name_uniq'),
+            models.UniqueConstraint(fields=['name'],
+                                    condition=Q(user__isnull=True),
+                                    name='geo_state_canonical_name_uniq'),
+        ]
+        indexes = [
+            # the viewset lists the visible states ordered by name
+            models.Index(fields=['name', 'id'], name='geo_state_name'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class CourtDistrictQuerySet(models.QuerySet):
+
+    def visible_to(self, user):
+        """Filter the court districts user sees
+
+        The canonical ones user didn't override or hide, plus the custom
+        ones and the overrides of user. The overridden ids are excluded with
+        a NOT IN (subquery), which PostgreSQL hashes once per query.
+        """
+        overridden = CourtDistrict.objects \
+            .filter(user=user, canonical__isnull=False) \
+            .values('canonical_id')
+
+        return self \
+            .filter(Q(user=user) | Q(user__isnull=True), hidden=False) \
+            .exclude(id__in=overridden)
+
+
 class CourtDistrict(models.Model):
-    """Court district object"""
-    name = models.CharField(max_length=255, null=False, blank=False, unique=True)
+    """Court district object
+
+    Like the states, court districts without a user are canonical and the
+    others belong to their user: custom ones, or overrides of a canonical
+    court district (canonical), which replace it for their user. A hidden
+    override removes it.
+    """
+    name = models.CharField(max_length=255, null=False, blank=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
-        null=False,
-        blank=False,
+        null=True,
+        blank=True,
+        # covered by the (user, ...) constraints
+        db_index=False,
         verbose_name=_('CourtDistrict'),
     )
+    canonical = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='overrides',
+        # covered by the (user, canonical) constraint
+        db_index=False,
+        verbose_name=_('Canonical court district'))
+    hidden = models.BooleanField(default=False)
     state = models.ForeignKey(
         State,
         on_delete=models.CASCADE,
@@ -35,10 +103,72 @@ class CourtDistrict(models.Model):
         blank=False,
         related_name='court_districts',
         verbose_name=_('State'))
+    # unaccented, lower-cased name used by the search (see geo.search)
+    search_name = models.CharField(max_length=255, editable=False)
+
+    objects = CourtDistrictQuerySet.as_manager()
 
     class Meta:
-        unique_together = ['state', 'name']
         ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'state', 'name'],
+                                    name='geo_court_user_state_name_uniq'),
+            models.UniqueConstraint(fields=['state', 'name'],
+                                    condition=Q(user__isnull=True),
+                                    name='geo_court_canonical_name_uniq'),
+            # a user overrides a canonical court district at most once
+            models.UniqueConstraint(fields=['user', 'canonical'],
+                                    name='geo_court_user_canonical_uniq'),
+        ]
+        indexes = [
+            # the viewset lists the visible court districts, optionally of
+            # some states, ordered by name. The rows of the other users are
+            # only their overrides and custom court districts, which the
+            # scans skip
+            models.Index(fields=['state', 'name', 'id'],
+                         name='geo_court_state_name'),
+            models.Index(fields=['name', 'id'], name='geo_court_name'),
+            # ?name_prefix=, a LIKE 'prefix%' range on PostgreSQL whatever
+            # the collation
+            models.Index(fields=['search_name'],
+                         name='geo_court_search_prefix',
+                         opclasses=['varchar_pattern_ops']),
+            GinIndex(fields=['search_name'], name='geo_court_search_trgm',
+                     opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.search_name = normalize(self.name)
+        super().save(*args, **kwargs)
+
+
+class CanonicalGeoVersion(models.Model):
+    """Change counter of the canonical geo data, a single row
+
+    Part of the ETags and cache keys of every user (see geo.versions).
+    """
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.version)
+
+
+class GeoVersion(models.Model):
+    """Change counter of the geo data of a user
+
+    Bumped whenever one of the user's states or court districts changes and
+    used to build the ETags of the geo endpoints (see geo.versions).
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='geo_version',
+        verbose_name=_('User'))
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return '%s: %d' % (self.user_id, self.version)
@@ -0,0 +1,49 @@
+import re
+import unicodedata
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Q
+from rest_framework.filters import BaseFilterBackend
+
+NON_ALPHANUMERIC = re.compile(r'[\W_]+')
+
+
+def normalize(value):
+    """Return value unaccented, lower-cased and with single spaces
+
+    "São João del-Rei" and "Sao Joao del Rei" both become
+    "sao joao del rei".
+    """
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+
+    return NON_ALPHANUMERIC.sub(' ', value.lower()).strip()
+
+
+def search_court_districts(queryset, term):
+    """Filter court districts matching the normalized term, best first
+
+    On PostgreSQL the match is a substring or trigram similarity on
+    search_name, both served by its trigram GIN index, ranked by similarity.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(search_name__contains=term)
+
+    return queryset \
+        .filter(Q(search_name__contains=term) |
+                Q(search_name__trigram_similar=term)) \
+        .annotate(similarity=TrigramSimilarity('search_name', term)) \
+        .order_by('-similarity', 'name', 'id')
+
+
+class CourtDistrictSearchFilter(BaseFilterBackend):
+    """Accent-insensitive ?search= on the court district names"""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        term = normalize(request.query_params.get(self.search_param, ''))
+        if not term:
+            return queryset
+
+        return search_court_districts(queryset, term)
@@ -1,9 +1,28 @@
+from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 
 from geo.models import CourtDistrict, State
 
 
-class StateSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """Lets the view pick the fields of a serializer and expand relations
+
+    fields keeps only the given fields, in the declared order. expand
+    replaces the related fields named by Meta.expandable with their nested
+    serializer. Both are passed by geo.sparse.SparseFieldsMixin.
+    """
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+
+        for name in expand:
+            self.fields[name] = self.Meta.expandable[name](read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class StateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for state objects"""
 
     class Meta:
@@ -11,8 +30,22 @@ class StateSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'initials')
         read_only_fields = ('id',)
 
+    def validate_name(self, value):
+        """The name can't be taken by a state visible to the user"""
+        states = State.objects \
+            .visible_to(self.context['request'].user) \
+            .filter(name=value)
+        if self.instance is not None:
+            states = states.exclude(pk=self.instance.pk)
+        if states.exists():
+            raise serializers.ValidationError(
+                _('A state with this name already exists.'))
+
+        return value
 
-class CourtDistrictSerializer(serializers.ModelSerializer):
+
+class CourtDistrictSerializer(DynamicFieldsMixin,
+                              serializers.ModelSerializer):
     """Serialize a court district"""
 
     state = serializers.PrimaryKeyRelatedField(
@@ -24,3 +57,66 @@ class CourtDistrictSerializer(serializers.ModelSerializer):
         model = CourtDistrict
         fields = ('id', 'name', 'state')
         read_only_fields = ('id',)
+        expandable = {'state': StateSerializer}
+
+    def validate_state(self, value):
+        """The state must be visible to the user"""
+        user = self.context['request'].user
+        if not State.objects.visible_to(user).filter(pk=value.pk).exists():
+            raise serializers.ValidationError(
+                _('Invalid pk "%(pk)s" - object does not exist.')
+                % {'pk': value.pk})
+
+        return value
+
+    def validate(self, attrs):
+        """The name can't be taken in the state by a court district of the
+        user or visible to it"""
+        user = self.context['request'].user
+        state = attrs.get('state', getattr(self.instance, 'state', None))
+        name = attrs.get('name', getattr(self.instance, 'name', None))
+        court_districts = CourtDistrict.objects.filter(state=state,
+                                                       name=name)
+        if self.instance is None:
+            # a court district the user deleted is brought back instead
+            # (see CourtDistrictViewSet.perform_create)
+            court_districts = court_districts.exclude(hidden=True)
+        else:
+            # an override can take the name of the court district it replaces
+            court_districts = court_districts.exclude(pk__in=[
+                pk for pk in (self.instance.pk, self.instance.canonical_id)
+                if pk is not None])
+        if court_districts.filter(user=user).exists() or \
+                court_districts.visible_to(user).exists():
+            raise serializers.ValidationError({'name': [
+                _('A court district with this name already exists in '
+                  'the state.')]})
+
+        return attrs
+
+
+class StateCourtDistrictSerializer(serializers.ModelSerializer):
+    """Serialize a court district nested in its state"""
+
+    class Meta:
+        model = CourtDistrict
+        fields = ('id', 'name')
+        read_only_fields = ('id',)
+
+
+class StateWithCourtDistrictsSerializer(StateSerializer):
+    """Serialize a state with all of its court districts"""
+    court_districts = StateCourtDistrictSerializer(many=True, read_only=True)
+
+    class Meta(StateSerializer.Meta):
+        fields = StateSerializer.Meta.fields + ('court_districts',)
+
+
+class CourtDistrictRowSerializer(serializers.Serializer):
+    """Validate one row of a court district bulk load
+
+    The state is taken as a plain id so validating a row never queries the
+    database; the ids of the whole batch are checked at once by the view.
+    """
+    name = serializers.CharField(max_length=255)
+    state = serializers.IntegerField(min_value=1)
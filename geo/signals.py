@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from geo.autocomplete import prefix_index
+from geo.models import CourtDistrict, State
+from geo.versions import bump_version
+
+
+# covers the viewsets and the admin; bulk writes that skip the model signals
+# (bulk_create, load_geo) bump the version themselves
+@receiver(post_save, sender=State)
+@receiver(post_delete, sender=State)
+@receiver(post_save, sender=CourtDistrict)
+@receiver(post_delete, sender=CourtDistrict)
+def geo_changed(sender, instance, signal, **kwargs):
+    """Bump the version of the owner of a changed state or court district
+
+    The owner of canonical rows is None, their version is the one of the
+    canonical data. The autocomplete index is patched once the change is
+    committed, so a rollback never leaves it behind.
+    """
+    user_id = instance.user_id
+    version = bump_version(user_id)
+
+    court_district = None
+    override = False
+    if sender is CourtDistrict:
+        court_district = (instance.pk, instance.state_id,
+                          instance.search_name, instance.name)
+        override = instance.canonical_id is not None
+    deleted = signal is post_delete
+
+    transaction.on_commit(lambda: prefix_index.changed(
+        user_id, version, court_district, deleted, override))
@@ -0,0 +1,153 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+from django.utils import timezone
+
+from geo.compression import brotli, compress
+from geo.fastlist import dumps
+from geo.models import CourtDistrict, State
+from geo.versions import get_version
+
+MANIFEST = 'manifest.json'
+
+# suffix of the precompressed copies, as nginx gzip_static and
+# brotli_static look them up
+SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+
+def render():
+    """Return the canonical states, with their court districts, as JSON
+
+    Same shape as /api/geo/states/court-districts/ without the pagination:
+    the states ordered by name, each with its court districts ordered by
+    name. Two queries whatever the size of the data.
+    """
+    court_districts = {}
+    for state_id, pk, name in CourtDistrict.objects \
+            .filter(user__isnull=True) \
+            .order_by('name', 'id') \
+            .values_list('state_id', 'id', 'name'):
+        court_districts.setdefault(state_id, []).append(
+            {'id': pk, 'name': name})
+
+    return dumps([
+        {'id': pk, 'name': name, 'initials': initials,
+         'court_districts': court_districts.get(pk, [])}
+        for pk, name, initials in State.objects
+        .filter(user__isnull=True)
+        .order_by('name', 'id')
+        .values_list('id', 'name', 'initials')])
+
+
+def snapshot_url(filename, directory=None):
+    """Return the URL clients download a snapshot file from
+
+    GEO_SNAPSHOT_URL points at a static server or a CDN serving the
+    directory; without it the files are served by Django, which only reads
+    GEO_SNAPSHOT_DIR. Raises ImproperlyConfigured for any other directory.
+    """
+    directory = directory or settings.GEO_SNAPSHOT_DIR
+    if settings.GEO_SNAPSHOT_URL:
+        return settings.GEO_SNAPSHOT_URL + filename
+    if os.path.realpath(directory) == \
+            os.path.realpath(settings.GEO_SNAPSHOT_DIR):
+        return reverse('geo:snapshot-file', args=[filename])
+
+    raise ImproperlyConfigured(
+        'Set GEO_SNAPSHOT_URL to the URL serving %s.' % directory)
+
+
+def write_file(path, content):
+    """Write content to path atomically, readers never see half a file"""
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path),
+                                         prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(content)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def publish(directory=None):
+    """Render the canonical data and publish it as a snapshot
+
+    The snapshot is named after the hash of its content, so a file never
+    changes once published and can be cached forever. Copies compressed
+    with gzip and, when brotli is installed, br are written next to it, and
+    the manifest is replaced last to point at the new snapshot. Returns the
+    manifest.
+    """
+    directory = directory or settings.GEO_SNAPSHOT_DIR
+
+    version = get_version(None)
+    content = render()
+    digest = hashlib.sha256(content).hexdigest()[:20]
+    filename = 'states-%s.json' % digest
+    # before writing anything, a directory nothing serves is an error
+    url = snapshot_url(filename, directory)
+
+    os.makedirs(directory, exist_ok=True)
+
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    path = os.path.join(directory, filename)
+    if os.path.exists(path):
+        # published before, make it the most recent again for prune()
+        os.utime(path)
+    else:
+        for coding in encodings:
+            write_file(path + SUFFIXES[coding], compress(content, coding))
+        write_file(path, content)
+
+    manifest = {
+        'version': version,
+        'hash': digest,
+        'url': url,
+        'size': len(content),
+        'encodings': encodings,
+        'published': timezone.now().isoformat(),
+    }
+    write_file(os.path.join(directory, MANIFEST),
+               json.dumps(manifest, indent=2).encode('utf-8'))
+    prune(directory, keep=filename)
+
+    return manifest
+
+
+def prune(directory, keep):
+    """Delete all but the GEO_SNAPSHOT_KEEP most recent snapshots
+
+    The older ones stay around for the clients that read the previous
+    manifest. keep, the current snapshot, is never deleted.
+    """
+    snapshots = sorted(
+        glob.glob(os.path.join(directory, 'states-*.json')),
+        key=os.path.getmtime, reverse=True)
+    kept = 1
+    for path in snapshots:
+        if os.path.basename(path) == keep:
+            continue
+        if kept < settings.GEO_SNAPSHOT_KEEP:
+            kept += 1
+            continue
+        for suffix in [''] + list(SUFFIXES.values()):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def read_manifest(directory=None):
+    """Return the manifest of the current snapshot, None if there's none"""
+    directory = directory or settings.GEO_SNAPSHOT_DIR
+    try:
+        with open(os.path.join(directory, MANIFEST), 'rb') as manifest:
+            return json.loads(manifest.read().decode('utf-8'))
+    except FileNotFoundError:
+        return None
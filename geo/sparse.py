@@ -0,0 +1,87 @@
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(value, allowed, param):
+    """Split a comma separated list of names, all of them in allowed"""
+    names = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name or name in names:
+            continue
+        if name not in allowed:
+            raise ValidationError({param: [
+                _('Unknown field "%(name)s", expected one of: %(allowed)s.')
+                % {'name': name, 'allowed': ', '.join(allowed)}]})
+        names.append(name)
+
+    return names
+
+
+class SparseFieldsMixin:
+    """Adds ?fields= and ?expand= to the reads of a geo viewset
+
+    ?fields=id,name returns only these fields and only loads their columns
+    (plus the ones the pagination orders by). ?expand=state nests the state
+    instead of its id, loaded in the same query with select_related. The
+    serializer has to use geo.serializers.DynamicFieldsMixin, whose field
+    names must be the model field names.
+    """
+    sparse_actions = ('list', 'retrieve')
+    fields_param = 'fields'
+    expand_param = 'expand'
+    # None while every field is requested
+    requested_fields = None
+    expanded_fields = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if self.action not in self.sparse_actions:
+            return
+
+        meta = self.get_serializer_class().Meta
+        fields = request.query_params.get(self.fields_param)
+        if fields:
+            self.requested_fields = parse_names(
+                fields, meta.fields, self.fields_param) or None
+        expand = request.query_params.get(self.expand_param)
+        if expand:
+            self.expanded_fields = parse_names(
+                expand, tuple(getattr(meta, 'expandable', ())),
+                self.expand_param)
+        if self.requested_fields is not None:
+            self.expanded_fields = [name for name in self.expanded_fields
+                                    if name in self.requested_fields]
+
+    def loaded_fields(self):
+        """Return the requested fields followed by the ordering ones"""
+        fields = list(self.requested_fields)
+        for field in getattr(self.paginator, 'ordering', ()):
+            field = field.lstrip('-')
+            if field not in fields:
+                fields.append(field)
+
+        return fields
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        if self.expanded_fields:
+            queryset = queryset.select_related(*self.expanded_fields)
+        if self.requested_fields is not None:
+            meta = self.get_serializer_class().Meta
+            related = ['%s__%s' % (name, field)
+                       for name in self.expanded_fields
+                       for field in meta.expandable[name].Meta.fields]
+            queryset = queryset.only(*self.loaded_fields(), *related)
+
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.requested_fields is not None:
+            kwargs.setdefault('fields', self.requested_fields)
+        if self.expanded_fields:
+            kwargs.setdefault('expand', self.expanded_fields)
+
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,186 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo.autocomplete import PrefixIndex, prefix_index
+from geo.models import CourtDistrict, State
+from geo.versions import bump_version, get_version
+
+AUTOCOMPLETE_URL = reverse('geo:courtdistrict-autocomplete')
+
+
+class PrefixIndexTestMixin:
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        # ids may be reused between tests, don't serve their cached versions
+        caches['geo'].clear()
+        prefix_index.clear()
+        self.state = State.objects.create(user=self.user, name='Minas Gerais',
+                                          initials='MG')
+        for name in ('São João del-Rei', 'Uberaba', 'Uberlândia',
+                     'Ubá'):
+            CourtDistrict.objects.create(user=self.user, name=name,
+                                         state=self.state)
+
+
+class PrefixIndexTests(PrefixIndexTestMixin, TestCase):
+    """Test the in-process autocomplete index"""
+
+    def test_search_prefix(self):
+        """Test that names are matched by normalized prefix, in order"""
+        index = PrefixIndex(max_entries=100)
+
+        matches = index.search(self.user.pk, self.state.pk, 'uber', 10)
+
+        self.assertEqual([name for pk, name in matches],
+                         ['Uberaba', 'Uberlândia'])
+        self.assertEqual(index.search(self.user.pk, self.state.pk, 'x', 10),
+                         [])
+
+    def test_search_limit(self):
+        """Test that at most limit names are returned"""
+        index = PrefixIndex(max_entries=100)
+
+        matches = index.search(self.user.pk, self.state.pk, 'ub', 2)
+
+        self.assertEqual([name for pk, name in matches], ['Ubá', 'Uberaba'])
+
+    def test_warm_search_skips_database(self):
+        """Test that a loaded partition is searched without queries"""
+        index = PrefixIndex(max_entries=100)
+        index.search(self.user.pk, self.state.pk, 'uber', 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            index.search(self.user.pk, self.state.pk, 'sao', 10)
+
+        self.assertEqual(len(queries), 0)
+
+    def test_changed_patches_partition(self):
+        """Test that a committed change is applied in place"""
+        index = PrefixIndex(max_entries=100)
+        index.search(self.user.pk, self.state.pk, '', 10)
+        court_district = CourtDistrict.objects.get(name='Uberaba')
+        court_district.name = 'Uberabinha'
+        court_district.save()
+
+        index.changed(self.user.pk, get_version(self.user.pk),
+                      (court_district.pk, self.state.pk, 'uberabinha',
+                       'Uberabinha'))
+        with CaptureQueriesContext(connection) as queries:
+            matches = index.search(self.user.pk, self.state.pk, 'uber', 10)
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual([name for pk, name in matches],
+                         ['Uberabinha', 'Uberlândia'])
+
+        index.changed(self.user.pk, bump_version(self.user.pk),
+                      (court_district.pk, self.state.pk, 'uberabinha',
+                       'Uberabinha'), deleted=True)
+        matches = index.search(self.user.pk, self.state.pk, 'uber', 10)
+
+        self.assertEqual([name for pk, name in matches], ['Uberlândia'])
+
+    def test_stale_partition_reloaded(self):
+        """Test that a partition is reloaded when a change was missed"""
+        index = PrefixIndex(max_entries=100)
+        index.search(self.user.pk, self.state.pk, '', 10)
+
+        CourtDistrict.objects.create(user=self.user, name='Uberlandinha',
+                                     state=self.state)
+        matches = index.search(self.user.pk, self.state.pk, 'uberl', 10)
+
+        self.assertEqual([name for pk, name in matches],
+                         ['Uberlândia', 'Uberlandinha'])
+
+    def test_memory_budget(self):
+        """Test that least recently used partitions are dropped"""
+        state2 = State.objects.create(user=self.user, name='Bahia',
+                                      initials='BA')
+        CourtDistrict.objects.create(user=self.user, name='Salvador',
+                                     state=state2)
+        index = PrefixIndex(max_entries=4)
+
+        index.search(self.user.pk, self.state.pk, '', 10)
+        index.search(self.user.pk, state2.pk, '', 10)
+
+        # only the user's partition of the last state fits
+        self.assertEqual(index.stats(), {
+            'partitions': 1,
+            'entries': 1,
+            'max_entries': 4,
+        })
+
+    def test_empty_partitions_evicted(self):
+        """Test that empty partitions count against the budget"""
+        index = PrefixIndex(max_entries=10)
+
+        for state_id in range(1000, 1200):
+            index.search(self.user.pk, state_id, '', 10)
+
+        self.assertEqual(index.stats()['partitions'], 3)
+
+
+class AutocompleteApiTests(PrefixIndexTestMixin, TestCase):
+    """Test the court district autocomplete endpoint"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_autocomplete(self):
+        """Test suggesting court districts of a state"""
+        res = self.client.get(AUTOCOMPLETE_URL,
+                              {'state': self.state.pk, 'q': 'Uber'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['name'] for row in res.data],
+                         ['Uberaba', 'Uberlândia'])
+        self.assertEqual(res.data[0]['state'], self.state.pk)
+
+    def test_autocomplete_requires_state(self):
+        """Test that the state is required"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'uber'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_limited_to_user(self):
+        """Test that other users' court districts are not suggested"""
+        user2 = get_user_model().objects.create_user('teste2@teste.com',
+                                                     '123')
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(AUTOCOMPLETE_URL,
+                              {'state': self.state.pk, 'q': 'uber'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('state', res.data)
+
+    def test_autocomplete_unknown_state(self):
+        """Test that unknown states are rejected before loading anything"""
+        res = self.client.get(AUTOCOMPLETE_URL,
+                              {'state': self.state.pk + 1000, 'q': 'uber'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(prefix_index.stats()['partitions'], 0)
+
+    def test_warm_autocomplete_skips_state_check(self):
+        """Test that a loaded state is searched without queries"""
+        self.client.get(AUTOCOMPLETE_URL, {'state': self.state.pk})
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(AUTOCOMPLETE_URL,
+                                  {'state': self.state.pk, 'q': 'uber'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
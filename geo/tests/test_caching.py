@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo.caching import response_cache
+from geo.models import CourtDistrict, State
+
+COURT_DISTRICT_URL = reverse('geo:courtdistrict-list')
+
+
+class ResponseCacheTests(TestCase):
+    """Test the response cache of the geo endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        # ids may be reused between tests, don't serve their cached versions
+        caches['geo'].clear()
+        self.mg = State.objects.create(user=self.user, name='Minas Gerais',
+                                       initials='MG')
+        self.ba = State.objects.create(user=self.user, name='Bahia',
+                                       initials='BA')
+        CourtDistrict.objects.create(user=self.user, name='Uberaba',
+                                     state=self.mg)
+        CourtDistrict.objects.create(user=self.user, name='Salvador',
+                                     state=self.ba)
+
+    def test_repeated_read_served_from_cache(self):
+        """Test that an identical request doesn't hit the database"""
+        first = self.client.get(COURT_DISTRICT_URL)
+        stats = response_cache.stats()
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(COURT_DISTRICT_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response_cache.stats()['hits'], stats['hits'] + 1)
+
+    def test_key_includes_params_and_format(self):
+        """Test that query params and formats are cached separately"""
+        all_rows = self.client.get(COURT_DISTRICT_URL).json()
+        mg_rows = self.client.get(COURT_DISTRICT_URL,
+                                  {'state': self.mg.id}).json()
+        html = self.client.get(COURT_DISTRICT_URL, HTTP_ACCEPT='text/html')
+
+        self.assertEqual(len(all_rows['results']), 2)
+        self.assertEqual([row['name'] for row in mg_rows['results']],
+                         ['Uberaba'])
+        self.assertTrue(html['Content-Type'].startswith('text/html'))
+
+    def test_key_includes_user(self):
+        """Test that users never see each other's cached responses"""
+        self.client.get(COURT_DISTRICT_URL)
+        user2 = get_user_model().objects.create_user('teste2@teste.com',
+                                                     '123')
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(COURT_DISTRICT_URL)
+
+        self.assertEqual(res.json()['results'], [])
+
+    def test_invalidated_on_save_and_delete(self):
+        """Test that writes are visible on the next read"""
+        self.client.get(COURT_DISTRICT_URL)
+        court_district = CourtDistrict.objects.create(
+            user=self.user, name='Uberlândia', state=self.mg)
+        after_save = self.client.get(COURT_DISTRICT_URL).json()
+        court_district.delete()
+        after_delete = self.client.get(COURT_DISTRICT_URL).json()
+
+        self.assertEqual(len(after_save['results']), 3)
+        self.assertEqual(len(after_delete['results']), 2)
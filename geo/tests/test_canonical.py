@@ -0,0 +1,236 @@
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo.autocomplete import prefix_index
+from geo.models import CourtDistrict, GeoVersion, State
+
+STATE_URL = reverse('geo:state-list')
+COURT_DISTRICT_URL = reverse('geo:courtdistrict-list')
+AUTOCOMPLETE_URL = reverse('geo:courtdistrict-autocomplete')
+BULK_URL = reverse('geo:courtdistrict-bulk')
+
+dedupe = import_module('geo.migrations.0009_dedupe_geo').dedupe
+
+
+def state_url(state_id):
+    return reverse('geo:state-detail', args=[state_id])
+
+
+def court_district_url(court_district_id):
+    return reverse('geo:courtdistrict-detail', args=[court_district_id])
+
+
+class CanonicalDataTests(TestCase):
+    """Test the canonical geo data and the overrides of the users"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('teste@teste.com',
+                                                         '123')
+        self.user2 = get_user_model().objects.create_user(
+            'teste2@teste.com', '123')
+        self.client.force_authenticate(self.user)
+        # ids may be reused between tests, don't serve their cached versions
+        caches['geo'].clear()
+        prefix_index.clear()
+        self.mg = State.objects.create(name='Minas Gerais', initials='MG')
+        self.uberaba = CourtDistrict.objects.create(name='Uberaba',
+                                                    state=self.mg)
+        self.uberlandia = CourtDistrict.objects.create(name='Uberlândia',
+                                                       state=self.mg)
+
+    def names(self, user=None):
+        self.client.force_authenticate(user or self.user)
+        res = self.client.get(COURT_DISTRICT_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [row['name'] for row in res.data['results']]
+
+    def test_canonical_and_custom_rows_listed(self):
+        """Test that users see the canonical rows and their own only"""
+        CourtDistrict.objects.create(user=self.user, name='Araguari',
+                                     state=self.mg)
+        CourtDistrict.objects.create(user=self.user2, name='Araxá',
+                                     state=self.mg)
+
+        self.assertEqual(self.names(), ['Araguari', 'Uberaba', 'Uberlândia'])
+        self.assertEqual(self.names(self.user2),
+                         ['Araxá', 'Uberaba', 'Uberlândia'])
+
+    def test_update_canonical_court_district(self):
+        """Test that updating a canonical court district overrides it"""
+        res = self.client.patch(court_district_url(self.uberaba.id),
+                                {'name': 'Uberaba (Fórum)'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        override = CourtDistrict.objects.get(id=res.data['id'])
+        self.assertEqual(override.user, self.user)
+        self.assertEqual(override.canonical, self.uberaba)
+        self.uberaba.refresh_from_db()
+        self.assertEqual(self.uberaba.name, 'Uberaba')
+        self.assertEqual(self.names(), ['Uberaba (Fórum)', 'Uberlândia'])
+        self.assertEqual(self.names(self.user2), ['Uberaba', 'Uberlândia'])
+
+    def test_delete_canonical_court_district(self):
+        """Test that deleting a canonical court district hides it"""
+        res = self.client.delete(court_district_url(self.uberaba.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(CourtDistrict.objects.filter(
+            id=self.uberaba.id).exists())
+        self.assertEqual(self.names(), ['Uberlândia'])
+        self.assertEqual(self.names(self.user2), ['Uberaba', 'Uberlândia'])
+
+    def test_delete_override(self):
+        """Test that deleting an override doesn't bring the original back"""
+        override = CourtDistrict.objects.create(
+            user=self.user, canonical=self.uberaba, name='Uberaba (Fórum)',
+            state=self.mg)
+
+        res = self.client.delete(court_district_url(override.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.names(), ['Uberlândia'])
+
+    def test_recreate_deleted_court_district(self):
+        """Test that a deleted canonical court district can be created"""
+        self.client.delete(court_district_url(self.uberaba.id))
+
+        res = self.client.post(COURT_DISTRICT_URL, {'name': 'Uberaba',
+                                                    'state': self.mg.id})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.names(), ['Uberaba', 'Uberlândia'])
+        self.assertEqual(CourtDistrict.objects.filter(
+            user=self.user, hidden=True).count(), 0)
+
+    def test_bulk_recreate_deleted_court_district(self):
+        """Test that the bulk load creates deleted court districts again"""
+        self.client.delete(court_district_url(self.uberaba.id))
+
+        res = self.client.post(BULK_URL, [{'name': 'Uberaba',
+                                           'state': self.mg.id}],
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['results'][0]['status'], 'created')
+        self.assertEqual(self.names(), ['Uberaba', 'Uberlândia'])
+
+    def test_canonical_state_read_only(self):
+        """Test that the canonical states can't be changed by a user"""
+        res = self.client.patch(state_url(self.mg.id), {'name': 'MG'})
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        res = self.client.delete(state_url(self.mg.id))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.mg.refresh_from_db()
+        self.assertEqual(self.mg.name, 'Minas Gerais')
+
+    def test_visible_names_taken(self):
+        """Test that a user can't duplicate a visible name"""
+        res = self.client.post(STATE_URL, {'name': 'Minas Gerais',
+                                           'initials': 'MG'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', res.data)
+
+        res = self.client.post(COURT_DISTRICT_URL, {'name': 'Uberaba',
+                                                    'state': self.mg.id})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', res.data)
+
+    def test_other_users_state_rejected(self):
+        """Test that court districts can't be added to others' states"""
+        state = State.objects.create(user=self.user2, name='Bahia',
+                                     initials='BA')
+
+        res = self.client.post(COURT_DISTRICT_URL, {'name': 'Salvador',
+                                                    'state': state.id})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('state', res.data)
+
+    def test_canonical_change_invalidates_etag(self):
+        """Test that a canonical change is seen by every user"""
+        res = self.client.get(COURT_DISTRICT_URL)
+
+        CourtDistrict.objects.create(name='Araguari', state=self.mg)
+        again = self.client.get(COURT_DISTRICT_URL,
+                                HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['name'] for row in again.data['results']],
+                         ['Araguari', 'Uberaba', 'Uberlândia'])
+
+    def test_autocomplete_merged(self):
+        """Test that suggestions merge the canonical and the user's rows"""
+        CourtDistrict.objects.create(user=self.user, name='Ubá',
+                                     state=self.mg)
+        CourtDistrict.objects.create(user=self.user, canonical=self.uberaba,
+                                     name='Uberaba (Fórum)', state=self.mg)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'state': self.mg.id,
+                                                 'q': 'ub'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['name'] for row in res.data],
+                         ['Ubá', 'Uberaba (Fórum)', 'Uberlândia'])
+
+
+class DedupeMigrationTests(TestCase):
+    """Test moving the copies of several users to the canonical data"""
+
+    def setUp(self):
+        caches['geo'].clear()
+        self.users = [
+            get_user_model().objects.create_user('teste%d@teste.com' % n,
+                                                 '123')
+            for n in range(3)]
+
+    def test_dedupe(self):
+        """Test that shared rows become canonical, the rest stays custom"""
+        for user, name, district in (
+                (self.users[0], 'Minas Gerais', 'Uberlândia'),
+                (self.users[1], 'MG', 'Uberlândia'),
+                (self.users[2], 'Minas', 'Uberlandia')):
+            state = State.objects.create(user=user, name=name,
+                                         initials='MG')
+            CourtDistrict.objects.create(user=user, name=district,
+                                         state=state)
+        bahia = State.objects.create(user=self.users[0], name='Bahia',
+                                     initials='BA')
+        CourtDistrict.objects.create(user=self.users[0], name='Salvador',
+                                     state=bahia)
+
+        versions = dict(GeoVersion.objects.values_list('user_id', 'version'))
+
+        # the models of the migration, which don't send the signals
+        apps = MigrationExecutor(connection).loader.project_state(
+            ('geo', '0009_dedupe_geo')).apps
+        dedupe(apps, None)
+
+        mg = State.objects.get(user__isnull=True)
+        self.assertEqual((mg.name, mg.initials), ('Minas Gerais', 'MG'))
+        self.assertEqual(
+            list(State.objects.filter(user__isnull=False)), [bahia])
+        canonical = CourtDistrict.objects.get(user__isnull=True)
+        self.assertEqual((canonical.name, canonical.state), ('Uberlândia',
+                                                             mg))
+        override = CourtDistrict.objects.get(canonical=canonical)
+        self.assertEqual((override.user, override.name),
+                         (self.users[2], 'Uberlandia'))
+        self.assertEqual(
+            CourtDistrict.objects.filter(user__isnull=False).count(), 2)
+        self.assertEqual(
+            dict(GeoVersion.objects.values_list('user_id', 'version')),
+            {user_id: version + 1 for user_id, version in versions.items()})
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from geo.models import CourtDistrict, State
+
+
+def write_csv(content):
+    """Write content to a temporary CSV file and return its path"""
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(handle, 'w', encoding='utf-8') as csv_file:
+        csv_file.write(content)
+
+    return path
+
+
+class LoadGeoCommandTests(TestCase):
+    """Test the load_geo management command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@test.com',
+                                                         '123')
+        self.path = write_csv(
+            'state,initials,court_district\n'
+            'Minas Gerais,MG,Belo Horizonte\n'
+            'Minas Gerais,MG,Uberaba\n'
+            'São Paulo,SP,Campinas\n'
+            'Acre,AC,\n'
+        )
+        self.addCleanup(os.remove, self.path)
+
+    def test_unknown_user(self):
+        """Test that the owner must exist"""
+        with self.assertRaises(CommandError):
+            call_command('load_geo', self.path, user='nobody@test.com')
+
+    @unittest.skipUnless(connection.vendor == 'postgresql',
+                         'COPY requires PostgreSQL')
+    def test_load_geo(self):
+        """Test loading states and court districts, twice"""
+        out = StringIO()
+        call_command('load_geo', self.path, user=self.user.email, stdout=out)
+        call_command('load_geo', self.path, user=self.user.email,
+                     stdout=StringIO())
+
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(
+            sorted(State.objects.filter(user=self.user)
+                   .values_list('name', 'initials')),
+            [('Acre', 'AC'), ('Minas Gerais', 'MG'), ('São Paulo', 'SP')])
+        self.assertEqual(
+            sorted(CourtDistrict.objects.filter(user=self.user)
+                   .values_list('state__initials', 'name')),
+            [('MG', 'Belo Horizonte'), ('MG', 'Uberaba'),
+             ('SP', 'Campinas')])
+
+    def test_owner_required(self):
+        """Test that either a user or the canonical data must be given"""
+        with self.assertRaises(CommandError):
+            call_command('load_geo', self.path)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql',
+                         'COPY requires PostgreSQL')
+    def test_load_canonical(self):
+        """Test that a user only gets what the canonical data lacks"""
+        call_command('load_geo', self.path, canonical=True,
+                     stdout=StringIO())
+        path = write_csv(
+            'state,initials,court_district\n'
+            'Minas Gerais,MG,Uberaba\n'
+            'Minas Gerais,MG,Uberlândia\n'
+            'Bahia,BA,Salvador\n'
+        )
+        self.addCleanup(os.remove, path)
+        call_command('load_geo', path, user=self.user.email,
+                     stdout=StringIO())
+
+        self.assertEqual(
+            sorted(State.objects.filter(user__isnull=True)
+                   .values_list('initials', flat=True)),
+            ['AC', 'MG', 'SP'])
+        self.assertEqual(
+            list(State.objects.filter(user=self.user)
+                 .values_list('initials', flat=True)),
+            ['BA'])
+        self.assertEqual(
+            sorted(CourtDistrict.objects.filter(user=self.user)
+                   .values_list('state__initials', 'name')),
+            [('BA', 'Salvador'), ('MG', 'Uberlândia')])
+        self.assertEqual(
+            CourtDistrict.objects.get(name='Uberlândia').state.user_id,
+            None)
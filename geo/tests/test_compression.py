@@ -0,0 +1,107 @@
+import gzip
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from geo import caching, compression
+from geo.models import CourtDistrict, State
+
+COURT_DISTRICT_URL = reverse('geo:courtdistrict-list')
+
+
+def detail_url(court_district_id):
+    """Return court district detail URL"""
+    return reverse('geo:courtdistrict-detail', args=[court_district_id])
+
+
+class NegotiationTests(SimpleTestCase):
+    """Test the choice of the content coding"""
+
+    def negotiate(self, header):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header)
+        return compression.negotiate(request)
+
+    @mock.patch.object(compression, 'brotli', None)
+    def test_gzip(self):
+        """Test the codings accepted without brotli"""
+        self.assertEqual(self.negotiate('gzip, deflate, br'), 'gzip')
+        self.assertEqual(self.negotiate('*'), 'gzip')
+        self.assertIsNone(self.negotiate(''))
+        self.assertIsNone(self.negotiate('br'))
+        self.assertIsNone(self.negotiate('gzip;q=0, identity'))
+        self.assertIsNone(self.negotiate('*;q=0'))
+
+    @mock.patch.object(compression, 'brotli', object())
+    def test_brotli_preferred(self):
+        """Test that br wins unless gzip has a higher weight"""
+        self.assertEqual(self.negotiate('gzip, deflate, br'), 'br')
+        self.assertEqual(self.negotiate('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(self.negotiate('gzip;q=0.5, *'), 'br')
+
+
+class CompressedResponseTests(TestCase):
+    """Test the compressed responses of the geo endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        caches['geo'].clear()
+        state = State.objects.create(user=self.user, name='Minas Gerais',
+                                     initials='MG')
+        for number in range(50):
+            self.court_district = CourtDistrict.objects.create(
+                user=self.user, name='Comarca %d' % number, state=state)
+
+    @mock.patch.object(compression, 'brotli', None)
+    def test_gzip_compressed_once(self):
+        """Test that the gzip body is cached and not compressed again"""
+        identity = self.client.get(COURT_DISTRICT_URL)
+        with mock.patch.object(caching, 'compress',
+                               wraps=compression.compress) as compress:
+            first = self.client.get(COURT_DISTRICT_URL,
+                                    HTTP_ACCEPT_ENCODING='gzip')
+            with CaptureQueriesContext(connection) as queries:
+                second = self.client.get(COURT_DISTRICT_URL,
+                                         HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(len(queries), 0)
+        for res in (first, second):
+            self.assertEqual(res['Content-Encoding'], 'gzip')
+            self.assertIn('Accept-Encoding', res['Vary'])
+            self.assertEqual(gzip.decompress(res.content), identity.content)
+        self.assertLess(len(first.content), len(identity.content))
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', identity['Vary'])
+        self.assertNotEqual(first['ETag'], identity['ETag'])
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_small_response_not_compressed(self):
+        """Test that bodies under the threshold are sent as they are"""
+        res = self.client.get(detail_url(self.court_district.id),
+                              HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.data['name'], 'Comarca 49')
+
+    @skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        """Test the br coding"""
+        identity = self.client.get(COURT_DISTRICT_URL)
+        res = self.client.get(COURT_DISTRICT_URL,
+                              HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(res.content),
+                         identity.content)
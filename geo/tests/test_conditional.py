@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo.models import CourtDistrict, State
+
+STATE_URL = reverse('geo:state-list')
+COURT_DISTRICT_URL = reverse('geo:courtdistrict-list')
+BULK_URL = reverse('geo:courtdistrict-bulk')
+
+
+def sample_state(user, name='Minas Gerais', initials='MG'):
+    """Create and return a sample state"""
+    return State.objects.create(user=user, name=name, initials=initials)
+
+
+class ConditionalGetTests(TestCase):
+    """Test the ETags of the geo endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        # ids may be reused between tests, don't serve their cached versions
+        caches['geo'].clear()
+        self.state = sample_state(user=self.user)
+
+    def test_etag_not_modified(self):
+        """Test that a matching If-None-Match gets a 304 without touching
+        the geo tables"""
+        res = self.client.get(STATE_URL)
+        etag = res['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(STATE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertFalse(res.content)
+        self.assertFalse([q for q in queries if 'geo_state' in q['sql']])
+
+    def test_etag_depends_on_url_and_user(self):
+        """Test that each URL and user gets its own ETag"""
+        etag = self.client.get(STATE_URL)['ETag']
+        other_url = self.client.get(STATE_URL, {'page_size': 1})['ETag']
+        user2 = get_user_model().objects.create_user('teste2@teste.com',
+                                                     '123')
+        self.client.force_authenticate(user2)
+        other_user = self.client.get(STATE_URL)['ETag']
+
+        self.assertEqual(len({etag, other_url, other_user}), 3)
+
+    def test_etag_changes_on_write(self):
+        """Test that creating, updating and deleting rows changes the ETag"""
+        etags = [self.client.get(COURT_DISTRICT_URL)['ETag']]
+
+        court_district = CourtDistrict.objects.create(
+            user=self.user, name='Uberaba', state=self.state)
+        etags.append(self.client.get(COURT_DISTRICT_URL)['ETag'])
+        court_district.name = 'Uberlândia'
+        court_district.save()
+        etags.append(self.client.get(COURT_DISTRICT_URL)['ETag'])
+        court_district.delete()
+        etags.append(self.client.get(COURT_DISTRICT_URL)['ETag'])
+        self.client.post(BULK_URL, [{'name': 'Uberaba',
+                                     'state': self.state.id}],
+                         format='json')
+        etags.append(self.client.get(COURT_DISTRICT_URL)['ETag'])
+
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_stale_etag_returns_data(self):
+        """Test that an outdated If-None-Match gets the full response"""
+        etag = self.client.get(STATE_URL)['ETag']
+        sample_state(user=self.user, name='Bahia', initials='BA')
+
+        res = self.client.get(STATE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertNotEqual(res['ETag'], etag)
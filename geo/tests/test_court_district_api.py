@@ -1,16 +1,26 @@
+import base64
+from unittest import mock
+from urllib.parse import urlencode
+
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from geo.models import CourtDistrict, State
+from geo.views import CourtDistrictViewSet
 
 from geo.serializers import CourtDistrictSerializer
 
 # app:identifier for the url in the app
 COURT_DISTRICT_URL = reverse('geo:courtdistrict-list')
+BULK_URL = reverse('geo:courtdistrict-bulk')
+EXPORT_URL = reverse('geo:courtdistrict-export')
 
 
 # /api/court-district/court-districts/1/
@@ -52,6 +62,8 @@ class PrivateCourtDistrictAPITests(TestCase):
             '123'
         )
         self.client.force_authenticate(self.user)
+        # ids may be reused between tests, don't serve their cached versions
+        caches['geo'].clear()
 
     def test_retrieve_court_districts(self):
         """Test retrieving a list of court districts"""
@@ -66,12 +78,13 @@ class PrivateCourtDistrictAPITests(TestCase):
 
         res = self.client.get(COURT_DISTRICT_URL)
 
-        court_districts = CourtDistrict.objects.all().order_by('-id')
+        court_districts = CourtDistrict.objects.all().order_by('name', 'id')
         # many=True - returns results as a list
-        serializer = CourtDistrictSerializer(court_districts, many=False)
+        serializer = CourtDistrictSerializer(court_districts, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        # list responses are paginated, the rows come under 'results'
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_court_districts_limited_to_user(self):
         """Test retrieving court districts for user"""
@@ -94,8 +107,8 @@ class PrivateCourtDistrictAPITests(TestCase):
         court_districts = CourtDistrict.objects.filter(user=self.user)
         serializer = CourtDistrictSerializer(court_districts, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_court_district_detail(self):
         """Test a viewing a court district detail"""
@@ -127,3 +140,141 @@ class PrivateCourtDistrictAPITests(TestCase):
         for key in payload.keys():
             self.assertEqual(payload[key], getattr(court_district, key))
 
+    def test_court_districts_paginated_by_cursor(self):
+        """Test walking the court district list forwards and backwards"""
+        state = sample_state(user=self.user)
+        names = ['Comarca %02d' % i for i in range(7)]
+        for name in reversed(names):
+            sample_court_district(user=self.user, name=name, state=state)
+
+        res = self.client.get(COURT_DISTRICT_URL, {'page_size': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['name'] for row in res.data['results']],
+                         names[:3])
+        self.assertIsNone(res.data['previous'])
+        self.assertNotIn('count', res.data)
+
+        seen = []
+        url = COURT_DISTRICT_URL + '?page_size=3'
+        while url:
+            # repeated reads may come from the response cache, which only
+            # keeps the rendered body
+            page = self.client.get(url).json()
+            seen.extend(row['name'] for row in page['results'])
+            url = page['next']
+        self.assertEqual(seen, names)
+
+        res = self.client.get(page['previous'])
+        self.assertEqual([row['name'] for row in res.json()['results']],
+                         names[3:6])
+
+    def test_court_districts_invalid_cursor(self):
+        """Test that a tampered cursor is rejected"""
+        res = self.client.get(COURT_DISTRICT_URL, {'cursor': 'cD1ub3Rqc29u'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_court_districts_cursor_wrong_types(self):
+        """Test that a cursor with values of the wrong type is rejected"""
+        for position in ('[{"a":1},"x"]', '["Uberaba","1"]', '[1,2]',
+                         '["Uberaba",true]'):
+            cursor = base64.b64encode(
+                urlencode({'p': position}).encode('ascii')).decode('ascii')
+
+            res = self.client.get(COURT_DISTRICT_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_create_court_districts(self):
+        """Test loading many court districts in one request"""
+        state = sample_state(user=self.user)
+        existing = sample_court_district(user=self.user, name='Uberaba',
+                                         state=state)
+        payload = [
+            {'name': 'Belo Horizonte', 'state': state.id},
+            {'name': 'Uberaba', 'state': state.id},
+            {'name': 'Belo Horizonte', 'state': state.id},
+            {'name': '', 'state': state.id},
+            {'name': 'Contagem', 'state': state.id + 100},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        statuses = [row['status'] for row in res.data['results']]
+        self.assertEqual(statuses, ['created', 'exists', 'duplicate',
+                                    'invalid', 'invalid'])
+        created = CourtDistrict.objects.get(name='Belo Horizonte')
+        self.assertEqual(created.user, self.user)
+        self.assertEqual(res.data['results'][0]['id'], created.id)
+        self.assertEqual(res.data['results'][1]['id'], existing.id)
+        self.assertIn('state', res.data['results'][4]['errors'])
+
+    def test_bulk_create_rejects_other_users_state(self):
+        """Test that rows can't reference states from another user"""
+        user2 = get_user_model().objects.create_user('teste2@teste.com',
+                                                     '123')
+        state = sample_state(user=user2)
+
+        res = self.client.post(BULK_URL, [{'name': 'Uberaba',
+                                           'state': state.id}],
+                               format='json')
+
+        self.assertEqual(res.data['results'][0]['status'], 'invalid')
+        self.assertFalse(CourtDistrict.objects.exists())
+
+    def test_bulk_create_query_count_independent_of_size(self):
+        """Test that the bulk load doesn't issue queries per row"""
+        state = sample_state(user=self.user)
+        small = [{'name': 'Comarca %d' % i, 'state': state.id}
+                 for i in range(3)]
+        large = [{'name': 'Comarca %d' % i, 'state': state.id}
+                 for i in range(100, 400)]
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.post(BULK_URL, small, format='json')
+        with CaptureQueriesContext(connection) as large_queries:
+            self.client.post(BULK_URL, large, format='json')
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(CourtDistrict.objects.count(), 303)
+
+    def test_bulk_create_lost_race(self):
+        """Test that a row skipped by ON CONFLICT is reported as a conflict"""
+        state = sample_state(user=self.user)
+
+        # as when the conflicting row isn't visible once the insert ran
+        with mock.patch.object(CourtDistrictViewSet, '_existing_ids',
+                               return_value={}):
+            res = self.client.post(BULK_URL, [{'name': 'Uberaba',
+                                               'state': state.id}],
+                                   format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 0)
+        self.assertEqual(res.data['results'][0]['status'], 'conflict')
+        self.assertNotIn('id', res.data['results'][0])
+
+    def test_bulk_create_requires_list(self):
+        """Test that the bulk payload must be a list"""
+        res = self.client.post(BULK_URL, {'name': 'Uberaba'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_court_districts_by_state(self):
+        """Test that the export honours the state filter"""
+        mg = sample_state(user=self.user)
+        ba = sample_state(user=self.user, name='Bahia', initials='BA')
+        uberaba = sample_court_district(user=self.user, name='Uberaba',
+                                        state=mg)
+        sample_court_district(user=self.user, name='Salvador', state=ba)
+
+        res = self.client.get(EXPORT_URL, {'state': mg.id},
+                              HTTP_ACCEPT='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        content = b''.join(res.streaming_content).decode('utf-8')
+        self.assertEqual(content, '{"id":%d,"name":"Uberaba","state":%d}\n'
+                         % (uberaba.id, mg.id))
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from geo import fastlist
+from geo.models import CourtDistrict, State
+from geo.views import CourtDistrictViewSet, StateViewSet
+
+STATES_URL = reverse('geo:state-list')
+COURT_DISTRICT_URL = reverse('geo:courtdistrict-list')
+
+NAMES = ('São João del-Rei', 'Aspas "duplas" e \\barra', 'Linha\u2028nova',
+         'Parágrafo\u2029', 'Tab\tcontrole\x01', 'Emoji \U0001f600')
+
+
+class FastListTests(TestCase):
+    """Test the list endpoints served without the serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        caches['geo'].clear()
+        for index, name in enumerate(NAMES):
+            state = State.objects.create(user=self.user, name=name,
+                                         initials='%02d' % index)
+            CourtDistrict.objects.create(user=self.user, name=name,
+                                         state=state)
+
+    def get_both(self, url, params=None):
+        """Return the bodies of the fast and of the serializer list"""
+        fast = self.client.get(url, params)
+        caches['geo'].clear()
+        with mock.patch.object(StateViewSet, 'fast_list_fields', ()), \
+                mock.patch.object(CourtDistrictViewSet, 'fast_list_fields',
+                                  ()):
+            slow = self.client.get(url, params)
+        caches['geo'].clear()
+
+        self.assertEqual(fast['Content-Type'], slow['Content-Type'])
+        return fast.content, slow.content
+
+    def test_same_bytes_as_serializer(self):
+        """Test that both lists are byte for byte the same"""
+        for url in (STATES_URL, COURT_DISTRICT_URL):
+            fast, slow = self.get_both(url)
+
+            self.assertEqual(fast, slow)
+            self.assertIn(b'\\u2028', fast)
+
+    def test_same_bytes_without_orjson(self):
+        """Test the fallback on the json module"""
+        with mock.patch.object(fastlist, 'orjson', None):
+            fast, slow = self.get_both(COURT_DISTRICT_URL)
+
+        self.assertEqual(fast, slow)
+
+    def test_same_pages_as_serializer(self):
+        """Test that the cursors of both lists are the same"""
+        fast, slow = self.get_both(COURT_DISTRICT_URL, {'page_size': 2})
+        self.assertEqual(fast, slow)
+
+        res = self.client.get(COURT_DISTRICT_URL, {'page_size': 2})
+        fast, slow = self.get_both(res.data['next'])
+        self.assertEqual(fast, slow)
+
+    def test_indented_json_uses_serializer(self):
+        """Test that other JSON settings are left to the serializer"""
+        res = self.client.get(COURT_DISTRICT_URL,
+                              HTTP_ACCEPT='application/json; indent=2')
+
+        self.assertIn(b'\n  "results"', res.content)
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo.models import CourtDistrict, State
+
+COURT_DISTRICT_URL = reverse('geo:courtdistrict-list')
+
+
+class CourtDistrictFilterTests(TestCase):
+    """Test the filters of the court district list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        caches['geo'].clear()
+        self.mg = State.objects.create(user=self.user, name='Minas Gerais',
+                                       initials='MG')
+        self.sp = State.objects.create(user=self.user, name='São Paulo',
+                                       initials='SP')
+        self.ba = State.objects.create(user=self.user, name='Bahia',
+                                       initials='BA')
+        self.court_districts = {}
+        for name, state in (('Uberaba', self.mg), ('Uberlândia', self.mg),
+                            ('São Carlos', self.sp), ('Santos', self.sp),
+                            ('Salvador', self.ba)):
+            self.court_districts[name] = CourtDistrict.objects.create(
+                user=self.user, name=name, state=state)
+
+    def names(self, params):
+        res = self.client.get(COURT_DISTRICT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [row['name'] for row in res.data['results']]
+
+    def test_filter_by_states(self):
+        """Test ?state= with one or more states"""
+        self.assertEqual(self.names({'state': self.mg.id}),
+                         ['Uberaba', 'Uberlândia'])
+        self.assertEqual(
+            self.names({'state': '%d, %d' % (self.sp.id, self.ba.id)}),
+            ['Salvador', 'Santos', 'São Carlos'])
+
+    def test_filter_by_state_initials(self):
+        """Test ?state_initials= in any case"""
+        self.assertEqual(self.names({'state_initials': 'ba,sp'}),
+                         ['Salvador', 'Santos', 'São Carlos'])
+
+    def test_filter_by_ids(self):
+        """Test fetching a batch of court districts by id"""
+        ids = [self.court_districts[name].id for name in ('Santos', 'Uberaba')]
+
+        self.assertEqual(self.names({'ids': ','.join(map(str, ids))}),
+                         ['Santos', 'Uberaba'])
+
+    def test_filter_by_name_prefix(self):
+        """Test ?name_prefix= ignoring accents and case"""
+        self.assertEqual(self.names({'name_prefix': 'SAO'}), ['São Carlos'])
+        self.assertEqual(self.names({'name_prefix': 'uberl'}),
+                         ['Uberlândia'])
+
+    def test_filters_combined(self):
+        """Test that the filters narrow each other down"""
+        self.assertEqual(
+            self.names({'state_initials': 'MG,SP', 'name_prefix': 's'}),
+            ['Santos', 'São Carlos'])
+        self.assertEqual(self.names({'state': self.mg.id,
+                                     'state_initials': 'SP'}), [])
+
+    def test_invalid_values_rejected(self):
+        """Test that malformed values return 400 instead of failing"""
+        for params in ({'state': 'MG'}, {'state': '1,x'}, {'ids': '-1'},
+                       {'ids': str(2 ** 31)}, {'state_initials': 'MGX'}):
+            res = self.client.get(COURT_DISTRICT_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST,
+                             params)
+            self.assertIn(list(params)[0], res.data)
+
+    @override_settings(GEO_FILTER_MAX_VALUES=3)
+    def test_list_size_capped(self):
+        """Test that overly long lists are rejected"""
+        res = self.client.get(COURT_DISTRICT_URL, {'ids': '1,2,3,4'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,220 @@
+import json
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo.models import CourtDistrict, State
+
+# a large canonical dataset and, on top, a few users with their custom
+# states and court districts and some overrides and hidden court districts.
+# The names start with their rank, so the range of a cursor is as selective
+# for every state
+STATES = 1000
+COURT_DISTRICTS_PER_STATE = 40
+USERS = 20
+STATES_PER_USER = 20
+OVERRIDES_PER_USER = 50
+
+GEO_TABLES = (State._meta.db_table, CourtDistrict._meta.db_table)
+
+
+def plan_nodes(plan):
+    """Yield every node of a JSON query plan"""
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql',
+                     'query plans are checked on PostgreSQL')
+class GeoQueryPlanTests(TestCase):
+    """Test that the geo endpoints are served by indexes
+
+    Every query the endpoints run on the geo tables is explained against a
+    canonical dataset of thousands of states and tens of thousands of court
+    districts with the custom rows and overrides of several users on top; a
+    sequential scan, a sort or a state filter applied after the scan means
+    an index is missing or isn't usable for that access pattern. A user
+    filter is expected: the rows of the other users are only their
+    overlays, a small fraction of what is scanned.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email='user%d@test.com' % number, password='!')
+            for number in range(USERS))
+        cls.user = users[USERS // 2]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO geo_state (name, initials) '
+                "SELECT 'State ' || n, 'XX' "
+                'FROM generate_series(1, %s) n',
+                [STATES])
+            cursor.execute(
+                'INSERT INTO geo_state (name, initials, user_id) '
+                "SELECT 'State ' || n || '-' || u.id, 'YY', u.id "
+                'FROM account_user u, generate_series(1, %s) n',
+                [STATES_PER_USER])
+            cursor.execute(
+                'INSERT INTO geo_courtdistrict '
+                '(name, search_name, user_id, state_id, hidden) '
+                "SELECT 'Court District ' || n || '-' || s.id, "
+                "'court district ' || s.id || ' ' || n, s.user_id, s.id, "
+                'false '
+                'FROM geo_state s, generate_series(1, %s) n',
+                [COURT_DISTRICTS_PER_STATE])
+            # every user overrides some canonical court districts and hides
+            # every other one of them
+            cursor.execute(
+                'INSERT INTO geo_courtdistrict '
+                '(name, search_name, user_id, state_id, canonical_id, '
+                'hidden) '
+                "SELECT c.name || ' (' || u.id || ')', c.search_name, u.id, "
+                'c.state_id, c.id, c.id %% 2 = 0 '
+                'FROM account_user u, LATERAL ('
+                ' SELECT * FROM geo_courtdistrict c'
+                ' WHERE c.user_id IS NULL ORDER BY random() LIMIT %s) c',
+                [OVERRIDES_PER_USER])
+            cursor.execute('ANALYZE geo_state, geo_courtdistrict')
+
+        cls.state = State.objects.filter(user__isnull=True).first()
+        cls.court_district = CourtDistrict.objects.visible_to(cls.user) \
+            .filter(user__isnull=True).first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        caches['geo'].clear()
+
+    def assertIndexed(self, url, params=None, allow_sort=False):
+        """Request url and check the plans of its queries on the geo tables
+
+        Returns the response so paginated tests can follow the links.
+        """
+        forbidden = ('Seq Scan',) if allow_sort else ('Seq Scan', 'Sort')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+            if res.streaming:
+                b''.join(res.streaming_content)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        explained = 0
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                # the exports DECLARE a server-side cursor, which is planned
+                # for a fast start; explain that as is
+                sql = query['sql']
+                if not sql.startswith(('SELECT', 'DECLARE')) or \
+                        not any('"%s"' % table in sql for table in GEO_TABLES):
+                    continue
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                for node in plan_nodes(plan[0]['Plan']):
+                    self.assertNotIn(
+                        node['Node Type'], forbidden,
+                        '%s on %s\n%s' % (node['Node Type'], url, sql))
+                    # rows of other states read and thrown away, harmless
+                    # only after a primary key lookup. A bitmap scan over
+                    # the canonical and the user's rows repeats the state
+                    # condition of its index scans as a filter
+                    if node.get('Index Name', '').endswith('_pkey') or \
+                            'state_id' in node.get('Recheck Cond', ''):
+                        continue
+                    self.assertNotIn('state_id', node.get('Filter', ''),
+                                     'Filter on %s\n%s' % (url, sql))
+                explained += 1
+        self.assertGreater(explained, 0)
+
+        return res
+
+    def test_state_list(self):
+        """Test listing and paging the states"""
+        url = reverse('geo:state-list')
+
+        res = self.assertIndexed(url, {'page_size': 10})
+        self.assertIndexed(res.json()['next'])
+
+    def test_state_detail(self):
+        """Test retrieving a state"""
+        self.assertIndexed(reverse('geo:state-detail', args=[self.state.id]))
+
+    def test_state_court_districts(self):
+        """Test listing the states with their court districts
+
+        The court districts are prefetched with state_id IN (<page>), which
+        a btree can't return in name order before PostgreSQL 17: only the
+        districts of the page get sorted.
+        """
+        self.assertIndexed(reverse('geo:state-court-districts'),
+                           {'page_size': 5}, allow_sort=True)
+
+    def test_state_export(self):
+        """Test exporting the states"""
+        self.assertIndexed(reverse('geo:state-export'), {'format': 'csv'})
+
+    def test_court_district_list(self):
+        """Test listing and paging the court districts"""
+        url = reverse('geo:courtdistrict-list')
+
+        res = self.assertIndexed(url, {'page_size': 50})
+        self.assertIndexed(res.json()['next'])
+
+    def test_court_district_list_by_state(self):
+        """Test listing and paging the court districts of a state"""
+        url = reverse('geo:courtdistrict-list')
+
+        res = self.assertIndexed(url, {'state': self.state.id,
+                                       'page_size': 5})
+        self.assertIndexed(res.json()['next'])
+
+    def test_court_district_list_by_states(self):
+        """Test listing the court districts of a few states
+
+        Each state is an index range, merged by a sort of their districts.
+        """
+        states = State.objects.filter(user__isnull=True) \
+            .values_list('id', flat=True)[:3]
+
+        self.assertIndexed(reverse('geo:courtdistrict-list'),
+                           {'state': ','.join(map(str, states))},
+                           allow_sort=True)
+        self.assertIndexed(reverse('geo:courtdistrict-list'),
+                           {'state_initials': 'XX', 'page_size': 5},
+                           allow_sort=True)
+
+    def test_court_district_list_by_ids(self):
+        """Test fetching a batch of court districts by id"""
+        ids = CourtDistrict.objects.visible_to(self.user) \
+            .values_list('id', flat=True)[:20]
+
+        self.assertIndexed(reverse('geo:courtdistrict-list'),
+                           {'ids': ','.join(map(str, ids))},
+                           allow_sort=True)
+
+    def test_court_district_list_by_name_prefix(self):
+        """Test listing the court districts starting with a prefix"""
+        self.assertIndexed(reverse('geo:courtdistrict-list'),
+                           {'name_prefix': 'court district %d' %
+                            self.state.id}, allow_sort=True)
+
+    def test_court_district_detail(self):
+        """Test retrieving a court district"""
+        self.assertIndexed(reverse('geo:courtdistrict-detail',
+                                   args=[self.court_district.id]))
+
+    def test_court_district_export(self):
+        """Test exporting the court districts"""
+        self.assertIndexed(reverse('geo:courtdistrict-export'),
+                           {'format': 'csv'})
@@ -0,0 +1,102 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo.models import CourtDistrict, State
+from geo.search import normalize
+
+COURT_DISTRICT_URL = reverse('geo:courtdistrict-list')
+
+
+class NormalizeTests(TestCase):
+    """Test the normalization of names for searching"""
+
+    def test_normalize(self):
+        """Test that accents, case and punctuation are ignored"""
+        self.assertEqual(normalize('São João del-Rei'), 'sao joao del rei')
+        self.assertEqual(normalize('  Sao  Joao DEL Rei '),
+                         'sao joao del rei')
+        self.assertEqual(normalize("Olho-d'Água das Flores"),
+                         'olho d agua das flores')
+
+
+class CourtDistrictSearchTests(TestCase):
+    """Test searching court districts"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        # ids may be reused between tests, don't serve their cached versions
+        caches['geo'].clear()
+        state = State.objects.create(user=self.user, name='Minas Gerais',
+                                     initials='MG')
+        for name in ('São João del-Rei', 'Uberaba', 'Uberlândia'):
+            CourtDistrict.objects.create(user=self.user, name=name,
+                                         state=state)
+
+    def test_search_name_saved(self):
+        """Test that the normalized name is kept up to date"""
+        court_district = CourtDistrict.objects.get(name='Uberlândia')
+
+        self.assertEqual(court_district.search_name, 'uberlandia')
+
+    def test_search_ignores_accents(self):
+        """Test searching without accents or punctuation"""
+        res = self.client.get(COURT_DISTRICT_URL,
+                              {'search': 'Sao Joao del Rei'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['name'] for row in res.data['results']],
+                         ['São João del-Rei'])
+        self.assertIsNone(res.data['next'])
+
+    def test_blank_search_paged(self):
+        """Test that a blank search keeps the whole list paged"""
+        res = self.client.get(COURT_DISTRICT_URL,
+                              {'search': ' - ', 'page_size': 2})
+
+        self.assertEqual([row['name'] for row in res.data['results']],
+                         ['São João del-Rei', 'Uberaba'])
+        self.assertIsNotNone(res.data['next'])
+
+    @override_settings(API_MAX_PAGE_SIZE=2)
+    def test_search_page_size_too_large(self):
+        """Test that asking more than the single page is rejected"""
+        res = self.client.get(COURT_DISTRICT_URL,
+                              {'search': 'uber', 'page_size': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('page_size', res.data)
+
+    def test_search_limited_to_user(self):
+        """Test that other users' court districts are not searched"""
+        user2 = get_user_model().objects.create_user('teste2@teste.com',
+                                                     '123')
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(COURT_DISTRICT_URL, {'search': 'uberaba'})
+
+        self.assertEqual(res.data['results'], [])
+
+    @unittest.skipUnless(connection.vendor == 'postgresql',
+                         'trigram similarity requires PostgreSQL')
+    def test_search_ranked_by_similarity(self):
+        """Test that misspelled terms match and the closest comes first"""
+        res = self.client.get(COURT_DISTRICT_URL,
+                              {'search': 'sao joao del rey'})
+        ranked = self.client.get(COURT_DISTRICT_URL, {'search': 'uberab'})
+
+        self.assertEqual([row['name'] for row in res.data['results']],
+                         ['São João del-Rei'])
+        self.assertEqual(ranked.data['results'][0]['name'], 'Uberaba')
@@ -0,0 +1,145 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo import snapshots
+from geo.models import CourtDistrict, State
+
+MANIFEST_URL = reverse('geo:snapshot-manifest')
+
+
+class SnapshotTests(TestCase):
+    """Test publishing and serving the snapshots of the canonical data"""
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['geo'].clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(GEO_SNAPSHOT_DIR=self.directory,
+                                     GEO_SNAPSHOT_URL='', GEO_SNAPSHOT_KEEP=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.mg = State.objects.create(name='Minas Gerais', initials='MG')
+        self.uberaba = CourtDistrict.objects.create(name='Uberaba',
+                                                    state=self.mg)
+        self.ac = State.objects.create(name='Acre', initials='AC')
+
+    def publish(self):
+        call_command('publish_geo_snapshot', stdout=StringIO())
+
+        return self.client.get(MANIFEST_URL).json()
+
+    def test_publish(self):
+        """Test the snapshot of the canonical states and court districts"""
+        user = get_user_model().objects.create_user('teste@teste.com',
+                                                    '123')
+        CourtDistrict.objects.create(user=user, name='Custom', state=self.mg)
+
+        manifest = self.publish()
+
+        filename = os.path.basename(manifest['url'])
+        with open(os.path.join(self.directory, filename), 'rb') as snapshot:
+            content = snapshot.read()
+        self.assertIn(manifest['hash'], filename)
+        self.assertEqual(manifest['size'], len(content))
+        self.assertEqual(json.loads(content.decode('utf-8')), [
+            {'id': self.ac.id, 'name': 'Acre', 'initials': 'AC',
+             'court_districts': []},
+            {'id': self.mg.id, 'name': 'Minas Gerais', 'initials': 'MG',
+             'court_districts': [{'id': self.uberaba.id,
+                                  'name': 'Uberaba'}]},
+        ])
+        with open(os.path.join(self.directory, filename + '.gz'), 'rb') as \
+                compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), content)
+
+    def test_same_data_same_snapshot(self):
+        """Test that publishing again without changes keeps the file"""
+        first = self.publish()
+        second = self.publish()
+
+        self.assertEqual(first['url'], second['url'])
+
+    def test_old_snapshots_pruned(self):
+        """Test that only the GEO_SNAPSHOT_KEEP latest snapshots are kept"""
+        urls = []
+        for name in ('Uberlândia', 'Ubá'):
+            urls.append(self.publish()['url'])
+            CourtDistrict.objects.create(name=name, state=self.mg)
+        urls.append(self.publish()['url'])
+
+        self.assertEqual(len(set(urls)), 3)
+        self.assertEqual(
+            self.client.get(urls[0]).status_code, status.HTTP_404_NOT_FOUND)
+        for url in urls[1:]:
+            self.assertEqual(self.client.get(url).status_code,
+                             status.HTTP_200_OK)
+
+    def test_served_without_queries(self):
+        """Test the manifest and file responses, anonymous and query free"""
+        url = self.publish()['url']
+
+        with self.assertNumQueries(0):
+            manifest = self.client.get(MANIFEST_URL)
+            res = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(manifest.status_code, status.HTTP_200_OK)
+        self.assertIn('max-age=60', manifest['Cache-Control'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('Accept-Encoding', res['Vary'])
+        content = gzip.decompress(b''.join(res.streaming_content))
+        self.assertEqual(json.loads(content.decode('utf-8'))[1]['name'],
+                         'Minas Gerais')
+
+    @override_settings(GEO_SNAPSHOT_URL='https://cdn.example.com/geo/')
+    def test_cdn_url(self):
+        """Test that the manifest points at the CDN when there's one"""
+        manifest = snapshots.publish()
+
+        self.assertTrue(manifest['url'].startswith(
+            'https://cdn.example.com/geo/states-'))
+
+    def test_not_published(self):
+        """Test the manifest before anything is published"""
+        res = self.client.get(MANIFEST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_served_by_django_under_static_root(self):
+        """Test that without GEO_SNAPSHOT_URL Django serves the files"""
+        with override_settings(STATIC_ROOT=os.path.dirname(self.directory)):
+            url = snapshots.publish()['url']
+
+        self.assertEqual(self.client.get(url).status_code,
+                         status.HTTP_200_OK)
+
+    def test_other_directory_needs_url(self):
+        """Test that --directory is refused when nothing would serve it"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        with self.assertRaises(CommandError):
+            call_command('publish_geo_snapshot', directory=directory,
+                         stdout=StringIO())
+        self.assertEqual(os.listdir(directory), [])
+
+        with override_settings(GEO_SNAPSHOT_URL='https://cdn.example.com/'):
+            call_command('publish_geo_snapshot', directory=directory,
+                         stdout=StringIO())
+        self.assertIn(snapshots.MANIFEST, os.listdir(directory))
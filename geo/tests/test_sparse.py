@@ -0,0 +1,116 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo.models import CourtDistrict, State
+from geo.views import CourtDistrictViewSet
+
+COURT_DISTRICT_URL = reverse('geo:courtdistrict-list')
+STATES_URL = reverse('geo:state-list')
+
+
+def detail_url(court_district_id):
+    """Return court district detail URL"""
+    return reverse('geo:courtdistrict-detail', args=[court_district_id])
+
+
+def court_district_queries(queries):
+    """Return the SQL of the queries reading the court districts"""
+    return [query['sql'] for query in queries.captured_queries
+            if 'FROM "geo_courtdistrict"' in query['sql']]
+
+
+class SparseFieldsTests(TestCase):
+    """Test ?fields= and ?expand= on the geo resources"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        caches['geo'].clear()
+        self.state = State.objects.create(user=self.user, name='Minas Gerais',
+                                          initials='MG')
+        for name in ('Belo Horizonte', 'Contagem', 'Uberaba'):
+            self.court_district = CourtDistrict.objects.create(
+                user=self.user, name=name, state=self.state)
+
+    def test_fields_trim_payload_and_columns(self):
+        """Test that only the requested fields are selected and returned"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(COURT_DISTRICT_URL, {'fields': 'name'})
+
+        self.assertEqual(res.data['results'], [
+            {'name': 'Belo Horizonte'}, {'name': 'Contagem'},
+            {'name': 'Uberaba'},
+        ])
+        sql, = court_district_queries(queries)
+        self.assertNotIn('"state_id"', sql.split(' FROM ')[0])
+
+    def test_fields_same_bytes_as_serializer(self):
+        """Test that the fast list trims the fields like the serializer"""
+        fast = self.client.get(COURT_DISTRICT_URL, {'fields': 'state,id'})
+        caches['geo'].clear()
+        with mock.patch.object(CourtDistrictViewSet, 'fast_list_fields', ()):
+            slow = self.client.get(COURT_DISTRICT_URL,
+                                   {'fields': 'state,id'})
+
+        self.assertEqual(fast.content, slow.content)
+        self.assertEqual(list(fast.data['results'][0]), ['id', 'state'])
+
+    def test_fields_on_retrieve(self):
+        """Test ?fields= on a single court district"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(detail_url(self.court_district.id),
+                                  {'fields': 'id,name'})
+
+        self.assertEqual(res.data, {'id': self.court_district.id,
+                                    'name': 'Uberaba'})
+        sql, = court_district_queries(queries)
+        self.assertNotIn('"state_id"', sql.split(' FROM ')[0])
+
+    def test_expand_state_in_same_query(self):
+        """Test that ?expand=state inlines the state with a join"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(COURT_DISTRICT_URL, {'expand': 'state'})
+
+        state = {'id': self.state.id, 'name': 'Minas Gerais',
+                 'initials': 'MG'}
+        self.assertEqual([row['state'] for row in res.data['results']],
+                         [state] * 3)
+        sql, = court_district_queries(queries)
+        self.assertIn('JOIN "geo_state"', sql)
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith('SELECT') and
+                          'FROM "geo_state"' in query['sql']])
+
+    def test_expand_with_fields(self):
+        """Test that expansion only applies to the requested fields"""
+        res = self.client.get(detail_url(self.court_district.id),
+                              {'fields': 'name,state', 'expand': 'state'})
+        self.assertEqual(res.data['state']['initials'], 'MG')
+        self.assertNotIn('id', res.data)
+
+        res = self.client.get(detail_url(self.court_district.id),
+                              {'fields': 'name', 'expand': 'state'})
+        self.assertEqual(res.data, {'name': 'Uberaba'})
+
+    def test_unknown_fields_rejected(self):
+        """Test that unknown fields and expansions return 400"""
+        res = self.client.get(COURT_DISTRICT_URL, {'fields': 'id,user'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+        res = self.client.get(STATES_URL, {'expand': 'state'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expand', res.data)
@@ -0,0 +1,136 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from geo.models import CourtDistrict, State
+
+STATE_URL = reverse('geo:state-list')
+EXPORT_URL = reverse('geo:state-export')
+NESTED_URL = reverse('geo:state-court-districts')
+
+
+def sample_state(user, name='Minas Gerais', initials='MG'):
+    """Create and return a sample state"""
+    return State.objects.create(user=user, name=name, initials=initials)
+
+
+class PublicStateAPITests(TestCase):
+    """Test unauthenticated state API access"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test that authentication is required"""
+        res = self.client.get(STATE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_auth_required(self):
+        """Test that authentication is required to export"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStateAPITests(TestCase):
+    """Test authenticated state API access"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'teste@teste.com',
+            '123'
+        )
+        self.client.force_authenticate(self.user)
+        # ids may be reused between tests, don't serve their cached versions
+        caches['geo'].clear()
+
+    def test_export_states_csv(self):
+        """Test streaming the user's states as CSV"""
+        user2 = get_user_model().objects.create_user('teste2@teste.com',
+                                                     '123')
+        sample_state(user=user2, name='Bahia', initials='BA')
+        mg = sample_state(user=self.user)
+        sp = sample_state(user=self.user, name='São Paulo', initials='SP')
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertTrue(res['Content-Type'].startswith('text/csv'))
+        content = b''.join(res.streaming_content).decode('utf-8')
+        self.assertEqual(content.splitlines(), [
+            'id,name,initials',
+            '%d,Minas Gerais,MG' % mg.id,
+            '%d,São Paulo,SP' % sp.id,
+        ])
+
+    def test_export_states_ndjson(self):
+        """Test streaming the user's states as NDJSON"""
+        mg = sample_state(user=self.user)
+
+        res = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lines = b''.join(res.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': mg.id, 'name': 'Minas Gerais', 'initials': 'MG'},
+        ])
+
+    def test_states_with_court_districts(self):
+        """Test listing states with their court districts nested"""
+        mg = sample_state(user=self.user)
+        ac = sample_state(user=self.user, name='Acre', initials='AC')
+        uberaba = CourtDistrict.objects.create(user=self.user, name='Uberaba',
+                                               state=mg)
+        bh = CourtDistrict.objects.create(user=self.user,
+                                          name='Belo Horizonte', state=mg)
+
+        res = self.client.get(NESTED_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'id': ac.id, 'name': 'Acre', 'initials': 'AC',
+             'court_districts': []},
+            {'id': mg.id, 'name': 'Minas Gerais', 'initials': 'MG',
+             'court_districts': [
+                 {'id': bh.id, 'name': 'Belo Horizonte'},
+                 {'id': uberaba.id, 'name': 'Uberaba'},
+             ]},
+        ])
+
+    def test_states_with_court_districts_query_count(self):
+        """Test that the nested list query count doesn't grow with the data"""
+        def add_states(first, count):
+            for i in range(first, first + count):
+                state = sample_state(user=self.user, name='State %d' % i,
+                                     initials='S%d' % (i % 10))
+                for j in range(3):
+                    CourtDistrict.objects.create(
+                        user=self.user, state=state,
+                        name='Court district %d-%d' % (i, j))
+
+        add_states(0, 2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(NESTED_URL)
+        add_states(2, 10)
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.get(NESTED_URL)
+
+        # the versions of the user and of the canonical data are cached
+        # apart, so only the geo queries are comparable
+        def geo_queries(queries):
+            return [q for q in queries if 'geoversion' not in q['sql']]
+
+        self.assertEqual(len(res.data['results']), 12)
+        self.assertEqual(len(geo_queries(small)), len(geo_queries(large)))
+        self.assertEqual(len(geo_queries(large)), 2)
@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 
 from geo import views
@@ -28,5 +28,8 @@ router.register('court-districts', views.CourtDistrictViewSet)
 app_name = 'geo'
 
 urlpatterns = [
+    path('snapshot/', views.snapshot_manifest, name='snapshot-manifest'),
+    re_path(r'^snapshot/(?P<filename>states-[0-9a-f]{20}\.json)$',
+            views.snapshot_file, name='snapshot-file'),
     path('', include(router.urls)),
 ]
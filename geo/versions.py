@@ -0,0 +1,78 @@
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+
+from geo.models import CanonicalGeoVersion, GeoVersion
+
+# pk of the single CanonicalGeoVersion row
+CANONICAL = 1
+
+
+def _cache_key(user_id):
+    return 'geo:version:%s' % user_id
+
+
+def _versions(user_id):
+    # always the primary: a version read from a lagging replica would be
+    # cached for everyone and keep serving the data from before the change
+    if user_id is None:
+        return CanonicalGeoVersion.objects.using(DEFAULT_DB_ALIAS) \
+            .filter(pk=CANONICAL)
+
+    return GeoVersion.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id)
+
+
+def get_version(user_id):
+    """Return the current version of the geo data of a user
+
+    user_id None is the canonical data. The version is kept in the geo
+    cache so the ETag and response cache checks usually don't need the
+    database at all.
+    """
+    cache = caches['geo']
+    version = cache.get(_cache_key(user_id))
+    if version is not None:
+        return version
+
+    version = _versions(user_id) \
+        .values_list('version', flat=True) \
+        .first() or 0
+    cache.add(_cache_key(user_id), version)
+
+    return version
+
+
+def get_versions(user_id):
+    """Return the versions of the canonical and of the user's geo data,
+    which together identify what the user sees"""
+    return get_version(None), get_version(user_id)
+
+
+def bump_version(user_id):
+    """Record a change to the geo data of a user and return the new version
+
+    user_id None is the canonical data. The new version is read from the
+    database on the current connection, it isn't cached until the change is
+    committed.
+    """
+    updated = _versions(user_id).update(version=F('version') + 1)
+    if not updated:
+        try:
+            with transaction.atomic():
+                if user_id is None:
+                    CanonicalGeoVersion.objects.create(pk=CANONICAL,
+                                                       version=1)
+                else:
+                    GeoVersion.objects.create(user_id=user_id, version=1)
+        except IntegrityError:
+            # another request created the row in the meantime
+            _versions(user_id).update(version=F('version') + 1)
+
+    # drop the cached version now and again once the change is visible to
+    # other connections, so nobody caches the old one in between
+    caches['geo'].delete(_cache_key(user_id))
+    transaction.on_commit(lambda: caches['geo'].delete(_cache_key(user_id)))
+
+    return _versions(user_id) \
+        .values_list('version', flat=True) \
+        .get()
@@ -1,48 +1,364 @@
-from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import FileResponse, Http404, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
+from account.authentication import API_AUTHENTICATION_CLASSES
+from app.pagination import KeysetPagination, RankedPagination
+from geo import snapshots
+from geo.autocomplete import prefix_index
+from geo.caching import CachedResponseMixin
+from geo.compression import negotiate
+from geo.conditional import ConditionalGetMixin
+from geo.exports import ExportMixin
+from geo.fastlist import FastListMixin
+from geo.filters import CourtDistrictFilter, parse_id
 from geo.models import State, CourtDistrict
+from geo.search import CourtDistrictSearchFilter, normalize
+from geo.sparse import SparseFieldsMixin
+from geo.versions import bump_version
 from geo import serializers
 
 
-class StateViewSet(viewsets.ModelViewSet):
+class StateViewSet(CachedResponseMixin, ConditionalGetMixin, ExportMixin,
+                   FastListMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """Manage states in the database"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = API_AUTHENTICATION_CLASSES
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
     queryset = State.objects.all()
     serializer_class = serializers.StateSerializer
+    export_fields = (
+        ('id', 'id'), ('name', 'name'), ('initials', 'initials'),
+    )
+    fast_list_fields = export_fields
+    conditional_actions = ('list', 'retrieve', 'court_districts')
+    cached_actions = ('list', 'retrieve', 'court_districts')
 
     def get_queryset(self):
         """Retrieve the states for the authenticated user"""
         queryset = self.queryset
 
-        return queryset.filter(user=self.request.user)
+        return queryset.visible_to(self.request.user)
 
     def perform_create(self, serializer):
         """Create a new state"""
         serializer.save(user=self.request.user)
 
+    def perform_update(self, serializer):
+        """Update a state of the user, the canonical ones are read only"""
+        if serializer.instance.user_id is None:
+            raise PermissionDenied(_('Canonical states can\'t be changed.'))
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        """Delete a state of the user, the canonical ones are read only"""
+        if instance.user_id is None:
+            raise PermissionDenied(_('Canonical states can\'t be changed.'))
+        instance.delete()
+
+    @action(detail=False, url_path='court-districts',
+            serializer_class=serializers.StateWithCourtDistrictsSerializer)
+    def court_districts(self, request):
+        """List the states with their court districts nested
+
+        Runs two queries per page whatever the number of states or court
+        districts: one for the states and one prefetching their districts.
+        """
+        court_districts = CourtDistrict.objects \
+            .visible_to(request.user) \
+            .only('id', 'name', 'state_id') \
+            .order_by('name', 'id')
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(
+            Prefetch('court_districts', queryset=court_districts))
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+
+        return self.get_paginated_response(serializer.data)
 
-class CourtDistrictViewSet(viewsets.ModelViewSet):
+
+class CourtDistrictViewSet(CachedResponseMixin, ConditionalGetMixin,
+                           ExportMixin, FastListMixin, SparseFieldsMixin,
+                           viewsets.ModelViewSet):
     """Manage court districts in the database"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = API_AUTHENTICATION_CLASSES
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
     queryset = CourtDistrict.objects.all()
     serializer_class = serializers.CourtDistrictSerializer
+    filter_backends = (CourtDistrictFilter, CourtDistrictSearchFilter)
+    export_fields = (('id', 'id'), ('name', 'name'), ('state', 'state_id'))
+    fast_list_fields = export_fields
+    # rows per INSERT statement in the bulk action
+    bulk_batch_size = 1000
 
     def get_queryset(self):
         """Retrieve the court districts for the authenticated user"""
-
-        # filtra as comarcas pelo estado, se informado
-        state = self.request.query_params.get('state')
         queryset = self.queryset
-        if state:
-            state_id = [int(state)]
-            queryset = queryset.filter(state__id__in=state_id)
 
-        return queryset.filter(user=self.request.user)
+        return queryset.visible_to(self.request.user)
+
+    @property
+    def paginator(self):
+        """Search results are ranked by similarity, not keyset paged"""
+        # a blank search filters nothing, keep paging the whole list
+        if normalize(self.request.query_params.get('search', '')):
+            self.pagination_class = RankedPagination
+
+        return super().paginator
 
     def perform_create(self, serializer):
-        """Create a new court district"""
+        """Create a new court district
+
+        A court district the user deleted stays as a hidden row under its
+        name (see perform_destroy); creating it again shows that row again.
+        """
+        hidden = CourtDistrict.objects.filter(
+            user=self.request.user, hidden=True,
+            state=serializer.validated_data['state'],
+            name=serializer.validated_data['name']).first()
+        if hidden is not None:
+            hidden.hidden = False
+            serializer.instance = hidden
         serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """Update a court district
+
+        A canonical court district is copied on write: the user gets an
+        override, with a new id, that replaces it from now on.
+        """
+        canonical = serializer.instance
+        if canonical.user_id is None:
+            serializer.instance = CourtDistrict(
+                user=self.request.user, canonical=canonical,
+                state_id=canonical.state_id, name=canonical.name)
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        """Delete a court district
+
+        Canonical court districts and overrides are hidden from the user
+        instead, deleting an override doesn't bring the canonical one back.
+        """
+        if instance.user_id is None:
+            CourtDistrict.objects.create(
+                user=self.request.user, canonical=instance,
+                state_id=instance.state_id, name=instance.name, hidden=True)
+        elif instance.canonical_id is not None:
+            instance.hidden = True
+            instance.save()
+        else:
+            instance.delete()
+
+    @action(detail=False)
+    def autocomplete(self, request):
+        """Suggest the court districts of a state starting with ?q=
+
+        Served from the in-process prefix index (see geo.autocomplete), a warm
+        lookup doesn't touch the database. ?limit= caps the suggestions.
+        """
+        if not request.query_params.get('state'):
+            raise ValidationError({'state': [_('This field is required.')]})
+        state_id = parse_id(request.query_params['state'], 'state')
+        # checked before loading anything into the index, the partition of a
+        # state the user can't see would only take room in it
+        if not prefix_index.loaded(request.user.pk, state_id) and \
+                not State.objects.visible_to(request.user) \
+                .filter(pk=state_id).exists():
+            raise ValidationError({'state': [
+                _('Invalid pk "%(pk)s" - object does not exist.')
+                % {'pk': state_id}]})
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            raise ValidationError({'limit': [_('Must be an integer.')]})
+        limit = max(1, min(limit, settings.GEO_AUTOCOMPLETE_MAX_LIMIT))
+        prefix = normalize(request.query_params.get('q', ''))
+
+        matches = prefix_index.search(request.user.pk, state_id, prefix,
+                                      limit)
+
+        return Response([{'id': pk, 'name': name, 'state': state_id}
+                         for pk, name in matches])
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create many court districts at once, skipping the existing ones
+
+        The payload is a list of {"name", "state"} rows. Every row gets a
+        result in the same position: created, exists, duplicate (repeated in
+        the payload), invalid or conflict (the name is taken elsewhere). The
+        whole batch costs one query for the states, one for the existing rows,
+        two to show again the ones the user deleted (see perform_create), the
+        INSERT ... ON CONFLICT DO NOTHING batches and one to read the ids.
+        """
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError(_('Expected a list of court districts.'))
+        if len(rows) > settings.GEO_BULK_MAX_ROWS:
+            raise ValidationError(
+                _('At most %(max)d court districts per request.')
+                % {'max': settings.GEO_BULK_MAX_ROWS})
+
+        results = [None] * len(rows)
+        keys = {}
+        for index, row in enumerate(rows):
+            serializer = serializers.CourtDistrictRowSerializer(data=row)
+            if serializer.is_valid():
+                data = serializer.validated_data
+                keys[index] = (data['state'], data['name'])
+            else:
+                results[index] = {
+                    'status': 'invalid',
+                    'errors': serializer.errors,
+                }
+
+        # the referenced states must all be visible to the user
+        state_ids = set(state_id for state_id, name in keys.values())
+        owned = set(State.objects.visible_to(request.user).filter(
+            id__in=state_ids
+        ).values_list('id', flat=True))
+        for index, (state_id, name) in list(keys.items()):
+            if state_id not in owned:
+                results[index] = {
+                    'status': 'invalid',
+                    'errors': {'state': [_('Invalid pk "%(pk)s" - object '
+                                           'does not exist.') %
+                                         {'pk': state_id}]},
+                }
+                del keys[index]
+
+        existing = self._existing_ids(request.user, keys.values())
+        new = {}
+        for key in keys.values():
+            if key not in existing and key not in new:
+                new[key] = CourtDistrict(
+                    user=request.user, state_id=key[0], name=key[1],
+                    search_name=normalize(key[1]))
+        created = {}
+        if new:
+            restored = self._hidden_ids(request.user, new.keys())
+            with transaction.atomic():
+                if restored:
+                    CourtDistrict.objects.filter(
+                        id__in=restored.values()).update(hidden=False)
+                    for key in restored:
+                        del new[key]
+                CourtDistrict.objects.bulk_create(
+                    new.values(),
+                    batch_size=self.bulk_batch_size,
+                    ignore_conflicts=True)
+            created = self._existing_ids(request.user,
+                                         set(new) | set(restored))
+            if created:
+                bump_version(request.user.id)
+
+        seen = set()
+        for index, key in keys.items():
+            if key in seen:
+                result = {'status': 'duplicate'}
+            elif key in existing:
+                result = {'status': 'exists'}
+            elif key in created:
+                result = {'status': 'created'}
+            else:
+                result = {
+                    'status': 'conflict',
+                    'errors': {'name': [_('This name is already in use.')]},
+                }
+            pk = existing.get(key) or created.get(key)
+            if pk is not None and 'errors' not in result:
+                result['id'] = pk
+            seen.add(key)
+            results[index] = result
+
+        return Response({
+            'created': len(created),
+            'results': results,
+        })
+
+    def _existing_ids(self, user, keys):
+        """Map each (state_id, name) visible to the user to its id"""
+        keys = set(keys)
+        if not keys:
+            return {}
+
+        queryset = CourtDistrict.objects.visible_to(user).filter(
+            state_id__in=set(state_id for state_id, name in keys),
+            name__in=set(name for state_id, name in keys),
+        ).values_list('state_id', 'name', 'id')
+
+        return {(state_id, name): pk for state_id, name, pk in queryset
+                if (state_id, name) in keys}
+
+    def _hidden_ids(self, user, keys):
+        """Map each (state_id, name) the user deleted to its hidden row"""
+        keys = set(keys)
+        queryset = CourtDistrict.objects.filter(
+            user=user, hidden=True,
+            state_id__in=set(state_id for state_id, name in keys),
+            name__in=set(name for state_id, name in keys),
+        ).values_list('state_id', 'name', 'id')
+
+        return {(state_id, name): pk for state_id, name, pk in queryset
+                if (state_id, name) in keys}
+
+
+@require_safe
+def snapshot_manifest(request):
+    """Point at the current snapshot of the canonical geo data
+
+    Public and served without touching the database, clients poll it to
+    find out when to download a new snapshot.
+    """
+    manifest = snapshots.read_manifest()
+    if manifest is None:
+        raise Http404(_('No snapshot has been published.'))
+
+    response = JsonResponse(manifest)
+    patch_cache_control(response, public=True,
+                        max_age=settings.GEO_SNAPSHOT_MANIFEST_MAX_AGE)
+
+    return response
+
+
+@require_safe
+def snapshot_file(request, filename):
+    """Serve a snapshot, precompressed when the client accepts it
+
+    Snapshots never change once published, they are cached for a year. In
+    production a static server or a CDN should serve them instead (see
+    GEO_SNAPSHOT_URL).
+    """
+    path = os.path.join(settings.GEO_SNAPSHOT_DIR, filename)
+    coding = negotiate(request)
+    if coding is not None and \
+            os.path.exists(path + snapshots.SUFFIXES[coding]):
+        path += snapshots.SUFFIXES[coding]
+    else:
+        coding = None
+    try:
+        response = FileResponse(open(path, 'rb'),
+                                content_type='application/json')
+    except FileNotFoundError:
+        raise Http404(_('No such snapshot.'))
+
+    if coding is not None:
+        response['Content-Encoding'] = coding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60,
+                        immutable=True)
+
+    return response